@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional
+
+from agent.configuration import Configuration
+from core.ledger import call_cost, calls_cost
+from core.routing import route_model
+
+# Prior tokens of one web_research branch's summary call and of the final
+# answer, used until the run has made such calls itself.
+DEFAULT_BRANCH_TOKENS = {"input_tokens": 5000, "output_tokens": 800}
+DEFAULT_ANSWER_TOKENS = {"input_tokens": 12000, "output_tokens": 4000}
+
+
+def call_tokens(call: Dict[str, Any]) -> int:
+    return (call.get("input_tokens") or 0) + (call.get("output_tokens") or 0)
+
+
+class RunBudget:
+    """
+    The run's token and cost budgets (``max_tokens``, ``max_cost``) against
+    what its model calls and searches have used so far
+
+    Follow-up waves are sized so that they and the final answer fit the
+    budget; the final answer itself always runs, so a run ends with a report
+    once the budget is spent.
+    """
+
+    def __init__(self, state: Dict[str, Any], configurable: Configuration):
+        self.configurable = configurable
+        self.calls: List[Dict[str, Any]] = state.get("model_calls", [])
+        self.searches = sum(1 for search in state.get("search_calls", []) if search.get("paid"))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.configurable.max_tokens or self.configurable.max_cost)
+
+    def tokens_used(self) -> int:
+        return sum(call_tokens(call) for call in self.calls)
+
+    def cost_used(self) -> float:
+        return calls_cost(
+            self.calls, self.searches, self.configurable.model_prices, self.configurable.search_cost
+        )
+
+    def exhausted(self) -> Optional[str]:
+        """``token_budget`` or ``cost_budget`` once spent, else None."""
+        if self.configurable.max_tokens and self.tokens_used() >= self.configurable.max_tokens:
+            return "token_budget"
+        if self.configurable.max_cost and self.cost_used() >= self.configurable.max_cost:
+            return "cost_budget"
+        return None
+
+    def _estimate(self, node: str, prior: Dict[str, int]) -> Dict[str, Any]:
+        """A typical call of ``node``: the mean of the run's calls, else the prior on its routed model."""
+        observed = [call for call in self.calls if call["node"] == node]
+        if not observed:
+            return {"model": route_model(self.configurable, node).model, **prior}
+        mean = {
+            name: sum(call.get(name) or 0 for call in observed) / len(observed)
+            for name in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+        }
+        return {"model": observed[-1]["model"], **mean}
+
+    def _cost(self, call: Dict[str, Any]) -> float:
+        return call_cost(call, self.configurable.model_prices) or 0.0
+
+    def wave_width(self, requested: int, minimum: int = 0) -> int:
+        """
+        Widest wave, up to ``requested`` web_research branches, that leaves
+        enough budget for the final answer; never below ``minimum``.
+        """
+        if not self.enabled:
+            return requested
+        branch = self._estimate("web_research", DEFAULT_BRANCH_TOKENS)
+        answer = self._estimate("finalize_answer", DEFAULT_ANSWER_TOKENS)
+        width = requested
+        if self.configurable.max_tokens:
+            left = self.configurable.max_tokens - self.tokens_used() - call_tokens(answer)
+            width = min(width, int(left // max(call_tokens(branch), 1)))
+        if self.configurable.max_cost:
+            left = self.configurable.max_cost - self.cost_used() - self._cost(answer)
+            per_branch = self._cost(branch) + self.configurable.search_cost
+            if per_branch > 0:
+                width = min(width, int(left // per_branch))
+        return max(min(width, requested), minimum)
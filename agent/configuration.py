@@ -1,6 +1,7 @@
 import os
-from pydantic import BaseModel, Field
-from typing import Any, Optional
+import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Optional
 
 from langchain_core.runnables import RunnableConfig
 
@@ -21,6 +22,41 @@ class Configuration(BaseModel):
         }
     )
 
+    aws_regions: List[str] = Field(
+        default_factory=list,
+        metadata={
+            "description": "Ordered list of AWS regions for Bedrock calls (comma separated in the environment). Defaults to aws_region."
+        }
+    )
+
+    cross_region_inference: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to prefix bare Bedrock model ids with the region's cross-region inference profile geography."
+        }
+    )
+
+    bedrock_endpoint_url: Optional[str] = Field(
+        default=None,
+        metadata={
+            "description": "Override for the Bedrock runtime endpoint, e.g. a local stub. '{region}' is replaced with the target region."
+        }
+    )
+
+    region_failure_threshold: int = Field(
+        default=3,
+        metadata={
+            "description": "Consecutive failures after which a region's circuit opens."
+        }
+    )
+
+    region_cooldown_seconds: float = Field(
+        default=30.0,
+        metadata={
+            "description": "Seconds an open region circuit waits before letting a probe request through."
+        }
+    )
+
     temperature: float = Field(
         default=1.0,
         metadata={
@@ -63,6 +99,31 @@ class Configuration(BaseModel):
         },
     )
 
+    model_tiers: Dict[str, str] = Field(
+        default_factory=lambda: {
+            "fast": "eu.anthropic.claude-3-haiku-20240307-v1:0",
+            "standard": "eu.anthropic.claude-3-5-sonnet-20240620-v1:0",
+            "large": "eu.anthropic.claude-3-7-sonnet-20250219-v1:0",
+        },
+        metadata={
+            "description": "Model id (or Azure deployment) for each model tier."
+        },
+    )
+
+    node_model_tiers: Dict[str, str] = Field(
+        default_factory=dict,
+        metadata={
+            "description": "Per-node tier overrides, e.g. {'web_research': 'standard'}. Unlisted nodes use core.routing.NODE_TIERS."
+        },
+    )
+
+    node_models: Dict[str, str] = Field(
+        default_factory=dict,
+        metadata={
+            "description": "Per-node model overrides; values are a model id or a tier name."
+        },
+    )
+
     number_of_initial_queries: int = Field(
         default=1,
         metadata={"description": "The number of initial search queries to generate."},
@@ -73,6 +134,86 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    max_research_seconds: float = Field(
+        default=0,
+        metadata={"description": "Wall-clock budget in seconds of the research loop; no follow-up loop starts once it is spent. 0 disables it."},
+    )
+
+    max_tokens: int = Field(
+        default=0,
+        metadata={"description": "Budget of input plus output tokens over the run's model calls; follow-up waves are narrowed to fit it and no further loop starts once it is spent. 0 disables it."},
+    )
+
+    max_cost: float = Field(
+        default=0,
+        metadata={"description": "Budget in USD of the run's model calls and searches, priced with model_prices and search_cost; handled like max_tokens. 0 disables it."},
+    )
+
+    model_prices: Dict[str, Dict[str, float]] = Field(
+        default_factory=dict,
+        metadata={"description": "USD per million tokens by model id, e.g. {'my-model': {'input': 1.0, 'output': 5.0, 'cache_read': 0.1}}; added to core.ledger.DEFAULT_MODEL_PRICES."},
+    )
+
+    search_cost: float = Field(
+        default=0.016,
+        metadata={"description": "USD per web search sent to Tavily (an advanced search is two credits)."},
+    )
+
+    max_searches: int = Field(
+        default=0,
+        metadata={"description": "Maximum number of web searches per run; follow-up queries are cut to what is left. 0 disables it."},
+    )
+
+    job_timeout_seconds: float = Field(
+        default=0,
+        metadata={"description": "Seconds a research job may run before it is cancelled, including its uploads. 0 disables it."},
+    )
+
+    keep_partial_results: bool = Field(
+        default=False,
+        metadata={"description": "Whether a cancelled or timed-out job stores its research so far as partial.json; otherwise the artifacts it started uploading are deleted."},
+    )
+
+    profile_sample_interval_ms: float = Field(
+        default=10.0,
+        metadata={"description": "Milliseconds between stack samples of a job run with profile=true."},
+    )
+
+    profile_traceback_frames: int = Field(
+        default=1,
+        metadata={"description": "Frames tracemalloc keeps per allocation while a job is profiled; more frames cost more memory and time."},
+    )
+
+    profile_top_allocations: int = Field(
+        default=25,
+        metadata={"description": "Source lines listed in a profiled job's memory.json, by memory allocated during the job."},
+    )
+
+    deadline_at: float = Field(
+        default=0,
+        metadata={"description": "Unix time by which the run should finish; the graph narrows its fan-out, skips loops and switches to faster models to meet it. 0 disables it."},
+    )
+
+    deadline_margin_seconds: float = Field(
+        default=10.0,
+        metadata={"description": "Seconds kept in reserve before the deadline when planning the remaining work."},
+    )
+
+    deadline_min_samples: int = Field(
+        default=5,
+        metadata={"description": "Observed calls of a node and tier required before their latency replaces the planner's prior."},
+    )
+
+    topic_history_tokens: int = Field(
+        default=1000,
+        metadata={"description": "Token cap of the condensed earlier conversation in the research topic; the latest question is always kept verbatim."},
+    )
+
+    structured_output_retries: int = Field(
+        default=1,
+        metadata={"description": "Times a model call is repeated when its structured output cannot be repaired locally."}
+    )
+
     max_search_results: int = Field(
         default=2,
         metadata={"description": "The maximum number of search results returned from the Tavily Search API."}
@@ -83,6 +224,223 @@ class Configuration(BaseModel):
         metadata={"description": "The API key for the Tavily Search API."}
     )
 
+    tavily_base_url: str = Field(
+        default="https://api.tavily.com",
+        metadata={"description": "Base URL of the Tavily Search API."}
+    )
+
+    search_max_connections: int = Field(
+        default=32,
+        metadata={"description": "Maximum concurrent connections of the shared search client."}
+    )
+
+    search_max_keepalive_connections: int = Field(
+        default=16,
+        metadata={"description": "Idle keep-alive connections the shared search client holds on to."}
+    )
+
+    search_timeout: float = Field(
+        default=60.0,
+        metadata={"description": "Timeout in seconds of a single search request."}
+    )
+
+    search_connect_timeout: float = Field(
+        default=10.0,
+        metadata={"description": "Timeout in seconds for opening a search connection."}
+    )
+
+    search_coalesce: bool = Field(
+        default=True,
+        metadata={"description": "Whether concurrent identical searches, across branches and jobs, share one request."}
+    )
+
+    answer_passage_retrieval: bool = Field(
+        default=True,
+        metadata={"description": "Whether finalize_answer retrieves passages per report section when the summaries exceed the context budget."}
+    )
+
+    answer_passage_top_k: int = Field(
+        default=6,
+        metadata={"description": "Maximum passages retrieved per report section for the final answer."}
+    )
+
+    answer_context_token_budget: int = Field(
+        default=12000,
+        metadata={"description": "Approximate token budget of the research context given to finalize_answer."}
+    )
+
+    batch_id: str = Field(
+        default="",
+        metadata={"description": "Batch the run belongs to; runs of one batch share identical searches and model calls."}
+    )
+
+    run_id: str = Field(
+        default="",
+        metadata={"description": "Identifier of the run; the run's state blobs are released under it when it ends."}
+    )
+
+    blob_state: bool = Field(
+        default=True,
+        metadata={"description": "Whether research summaries and sources are kept in the blob store, with only references in graph state. Only applies to runs with a run_id, which release their blobs when they end."}
+    )
+
+    blob_memory_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        metadata={"description": "Size budget in bytes of the in-memory blob tier."}
+    )
+
+    blob_spill_dir: str = Field(
+        default="",
+        metadata={"description": "Directory blobs spill to once the in-memory tier is full. Empty keeps every blob in memory."}
+    )
+
+    wiki_enabled: bool = Field(
+        default=False,
+        metadata={"description": "Whether runs also convert the report into wiki pages (wiki.json), alongside the report upload."}
+    )
+
+    wiki_timeout_seconds: float = Field(
+        default=900.0,
+        metadata={"description": "Seconds the wiki conversion may take before the run gives up on it."}
+    )
+
+    wiki_max_concurrency: int = Field(
+        default=4,
+        metadata={"description": "Report sections converted to wiki pages concurrently."}
+    )
+
+    wiki_streaming: bool = Field(
+        default=True,
+        metadata={"description": "Whether wiki conversion streams the model output and publishes each page as soon as it is complete. Calls go unstreamed while the LLM response cache is on."}
+    )
+
+    knowledge_store_enabled: bool = Field(
+        default=False,
+        metadata={"description": "Whether web_research answers queries from past runs' sources before calling Tavily."}
+    )
+
+    knowledge_min_score: float = Field(
+        default=4.0,
+        metadata={"description": "Minimum BM25 score for a stored passage to count as relevant."}
+    )
+
+    knowledge_min_passages: int = Field(
+        default=2,
+        metadata={"description": "Number of relevant stored passages required to skip the web search."}
+    )
+
+    knowledge_min_coverage: float = Field(
+        default=0.8,
+        metadata={"description": "Fraction of query terms the relevant passages must contain to skip the web search."}
+    )
+
+    knowledge_max_age_days: float = Field(
+        default=30.0,
+        metadata={"description": "Stored passages older than this are not reused."}
+    )
+
+    knowledge_max_passages: int = Field(
+        default=100_000,
+        metadata={"description": "Passages kept in the process-wide knowledge store; the oldest are dropped beyond it."}
+    )
+
+    prompt_caching: bool = Field(
+        default=False,
+        metadata={"description": "Whether prompts' static instructions are cached by the provider: a cache point on Bedrock (the model must support prompt caching), a prompt_cache_key on OpenAI."}
+    )
+
+    prompt_cache_min_tokens: int = Field(
+        default=1024,
+        metadata={"description": "Minimum estimated tokens of a prompt's static prefix for it to be cached; shorter prefixes are below the providers' minimum."}
+    )
+
+    max_retries: int = Field(
+        default=3,
+        metadata={"description": "The maximum number of attempts for a model call, including the first."}
+    )
+
+    retry_base_delay: float = Field(
+        default=1.0,
+        metadata={"description": "Base delay in seconds for jittered exponential backoff between model call retries."}
+    )
+
+    retry_max_delay: float = Field(
+        default=30.0,
+        metadata={"description": "Upper bound in seconds for a single retry backoff."}
+    )
+
+    hedge_requests: bool = Field(
+        default=False,
+        metadata={"description": "Whether to fire a duplicate model request when the first one is slower than usual."}
+    )
+
+    hedge_quantile: float = Field(
+        default=0.95,
+        metadata={"description": "Latency quantile of the model's histogram after which a hedged request is fired."}
+    )
+
+    hedge_min_samples: int = Field(
+        default=20,
+        metadata={"description": "Number of observed calls required before the hedge delay follows the latency histogram."}
+    )
+
+    hedge_default_delay: float = Field(
+        default=60.0,
+        metadata={"description": "Hedge delay in seconds used until enough latency samples have been observed."}
+    )
+
+    hedge_min_delay: float = Field(
+        default=2.0,
+        metadata={"description": "Lower bound in seconds for the hedge delay."}
+    )
+
+    llm_cache_mode: str = Field(
+        default="off",
+        metadata={
+            "description": "Model response cache mode. Options are 'off', 'auto' (only temperature 0 calls), 'record' (read and write) and 'replay' (serve only from the cache)."
+        }
+    )
+
+    llm_cache_nodes: List[str] = Field(
+        default_factory=list,
+        metadata={"description": "Nodes whose model calls are cached (comma separated in the environment). Empty caches every node."}
+    )
+
+    llm_cache_dir: str = Field(
+        default=".cache/llm",
+        metadata={"description": "Directory of the disk cache tier. Empty keeps the cache in memory only."}
+    )
+
+    llm_cache_max_entries: int = Field(
+        default=1024,
+        metadata={"description": "Number of responses kept in the in-memory LRU tier."}
+    )
+
+    llm_cache_max_bytes: int = Field(
+        default=512 * 1024 * 1024,
+        metadata={"description": "Size budget in bytes of the disk cache tier."}
+    )
+
+    @field_validator("aws_regions", "llm_cache_nodes", mode="before")
+    @classmethod
+    def split_list(cls, v):
+        if isinstance(v, str):
+            return [item.strip() for item in v.split(",") if item.strip()]
+        return v
+
+    @field_validator("model_tiers", "node_model_tiers", "node_models", "model_prices", mode="before")
+    @classmethod
+    def parse_mapping(cls, v):
+        # environment values arrive as JSON strings
+        if isinstance(v, str):
+            return json.loads(v) if v.strip() else {}
+        return v
+
+    @property
+    def bedrock_regions(self) -> List[str]:
+        """Regions to spread Bedrock calls over, in order of preference."""
+        return self.aws_regions or [self.aws_region]
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
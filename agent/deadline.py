@@ -0,0 +1,125 @@
+import time
+from typing import Dict, Optional
+
+from agent.configuration import Configuration
+from core.metrics import metrics
+from core.routing import route_model
+
+
+# Tiers from fastest to most capable; the planner only ever moves a node down this list
+TIER_ORDER = ["fast", "standard", "large"]
+
+# Prior latencies in seconds of a node's model call on the standard tier, used
+# until enough calls have been observed, and how much slower or faster the
+# other tiers are.
+DEFAULT_NODE_SECONDS: Dict[str, float] = {
+    "generate_query": 5.0,
+    "web_research": 15.0,
+    "reflection": 8.0,
+    "finalize_answer": 60.0,
+}
+TIER_LATENCY_FACTORS: Dict[str, float] = {"fast": 0.4, "standard": 1.0, "large": 1.6}
+DEFAULT_SEARCH_SECONDS = 4.0
+
+
+def node_histogram(node: str, tier: str):
+    """Latency histogram of ``node``'s model calls on ``tier``, filled by ModelManager."""
+    return metrics.histogram(f"llm.node.{node}.{tier}")
+
+
+class DeadlinePlanner:
+    """
+    Predicts the run's remaining work against its deadline
+
+    Predictions use the mean observed latency of each node's model calls per
+    tier, and of searches, once ``deadline_min_samples`` calls have been seen;
+    before that the priors above. A wave of parallel web_research branches
+    lasts as long as its slowest branch, estimated from the latency quantile
+    k / (k + 1) for k branches.
+    """
+
+    def __init__(self, configurable: Configuration):
+        self.configurable = configurable
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.configurable.deadline_at)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, less the safety margin; None without a deadline."""
+        if not self.enabled:
+            return None
+        return self.configurable.deadline_at - time.time() - self.configurable.deadline_margin_seconds
+
+    def _routed_tier(self, node: str) -> str:
+        return route_model(self.configurable, node).tier
+
+    def _mean(self, name: str, default: float) -> float:
+        histogram = metrics.histogram(name)
+        if histogram.count < self.configurable.deadline_min_samples:
+            return default
+        return histogram.total / histogram.count
+
+    def node_seconds(self, node: str, tier: Optional[str] = None) -> float:
+        """Predicted latency of one call of ``node`` on ``tier`` (default: its routed tier)."""
+        tier = tier or self._routed_tier(node)
+        default = DEFAULT_NODE_SECONDS.get(node, 10.0) * TIER_LATENCY_FACTORS.get(tier, 1.0)
+        seconds = self._mean(f"llm.node.{node}.{tier}", default)
+        if node == "web_research":
+            seconds += self._mean("search.latency", DEFAULT_SEARCH_SECONDS)
+        return seconds
+
+    def wave_seconds(self, width: int) -> float:
+        """Predicted duration of ``width`` web_research branches running in parallel."""
+        if width <= 0:
+            return 0.0
+        tier = self._routed_tier("web_research")
+        histogram = node_histogram("web_research", tier)
+        mean = self.node_seconds("web_research", tier)
+        if histogram.count < self.configurable.deadline_min_samples:
+            return mean
+        # the slowest of k branches sits around the k / (k + 1) quantile
+        slowest = histogram.quantile(width / (width + 1)) or 0.0
+        return max(mean, slowest + self._mean("search.latency", DEFAULT_SEARCH_SECONDS))
+
+    def wave_width(self, requested: int, minimum: int = 0) -> int:
+        """
+        Widest wave, up to ``requested`` branches, that still leaves time for
+        the final answer; never below ``minimum``.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return requested
+        after = self.node_seconds("finalize_answer")
+        width = requested
+        while width > minimum and self.wave_seconds(width) + after > remaining:
+            width -= 1
+        return max(width, minimum)
+
+    def loop_fits(self) -> bool:
+        """Whether reflecting, one more wave and the final answer fit before the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return True
+        needed = self.node_seconds("reflection") + self.wave_seconds(1) + self.node_seconds("finalize_answer")
+        return needed <= remaining
+
+    def tier_for(self, node: str, reserve: float = 0.0) -> Optional[str]:
+        """
+        Tier ``node`` should run on to finish in time, leaving ``reserve``
+        seconds for the steps after it: the most capable tier below its routed
+        one that fits. None when the routed tier fits.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        available = remaining - reserve
+        routed = self._routed_tier(node)
+        if routed not in TIER_ORDER or self.node_seconds(node, routed) <= available:
+            return None
+        faster = TIER_ORDER[:TIER_ORDER.index(routed)]
+        for tier in reversed(faster):
+            if self.node_seconds(node, tier) <= available:
+                return tier
+        # nothing fits, the fastest tier gets closest
+        return faster[0] if faster else None
@@ -1,8 +1,10 @@
 import os
+import time
 import logging
+import threading
+from typing import Optional
 
 from agent.tools_and_schemas import SearchQueryList, Reflection, KeyConceptsList
-from dotenv import load_dotenv
 from langchain_core.messages import AIMessage
 from langgraph.types import Send
 from langgraph.graph import StateGraph
@@ -19,30 +21,38 @@ from agent.state import (
     ReflectionState,
     WebSearchState,
 )
+from agent.budget import RunBudget
 from agent.configuration import Configuration
+from agent.deadline import DeadlinePlanner
 from agent.prompts import (
     get_current_date,
     query_writer_instructions,
     web_searcher_instructions,
     reflection_instructions,
     answer_instructions,
-    web_researcher_summariser_instructions
+    web_researcher_summariser_instructions,
+    REPORT_SECTIONS,
 )
 
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_aws import ChatBedrockConverse
-
+from core.cancellation import find_cancel_token
 from core.model_manager import ModelManager
+from core.metrics import metrics
+from core.search import get_search_client
+from core.shared import get_batch_scope
+
+from agent.knowledge import find_covering_passages, get_knowledge_store
+from agent.passages import PassageIndex, build_run_passages, estimate_tokens, select_section_context
 
 from agent.utils import (
+    gathered_sources,
     get_citations,
     get_research_topic,
     insert_citation_markers,
+    research_summaries,
     resolve_urls,
+    state_blob_store,
 )
 
-load_dotenv()
-
 
 # Nodes
 def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
@@ -64,32 +74,110 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     if state.get("initial_search_query_count") is None:
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
-    if configurable.llm_provider == "bedrock":
-        llm = ModelManager(config).configure_bedrock_client(
-            model_id=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "azure":
-        llm = ModelManager(config).configure_azure_client(
-            deployment_name=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "openai":
-        llm = ModelManager(config).configure_openai_client()
-
-    structured_llm = llm.with_structured_output(SearchQueryList)
+    # the topic condenses the whole conversation; later nodes read it from state
+    research_topic = get_research_topic(state["messages"], configurable.topic_history_tokens)
+    metrics.histogram("research_topic.tokens").observe(estimate_tokens(research_topic))
 
     # Format the prompt
     current_date = get_current_date()
     formatted_prompt = query_writer_instructions.format(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
+        research_topic=research_topic,
         number_queries=state["initial_search_query_count"],
     )
     # Generate the search queries
-    result = structured_llm.invoke(formatted_prompt)
+    planner = DeadlinePlanner(configurable)
+    tier = planner.tier_for(
+        "generate_query", reserve=planner.wave_seconds(1) + planner.node_seconds("finalize_answer")
+    )
+    model_manager = ModelManager(config)
+    result = model_manager.invoke(
+        formatted_prompt,
+        node="generate_query",
+        schema=SearchQueryList,
+        tier=tier,
+    )
     logger.info(f"Generated search queries: {result.query}")
-    return {"search_query": result.query}
+
+    # only fan out as wide as the deadline and the budget allow
+    adjustments = [deadline_adjustment("generate_query", "tier", tier)] if tier else []
+    queries = result.query[:planner.wave_width(len(result.query), minimum=1)]
+    if len(queries) < len(result.query):
+        adjustments.append(deadline_adjustment("generate_query", "fan_out", len(queries)))
+    budget_adjustments = []
+    budget = RunBudget({**state, "model_calls": state.get("model_calls", []) + model_manager.calls}, configurable)
+    width = budget.wave_width(len(queries), minimum=1)
+    if width < len(queries):
+        queries = queries[:width]
+        budget_adjustments.append(budget_adjustment("generate_query", "fan_out", width))
+    return {
+        "search_query": queries,
+        "deadline_adjustments": adjustments,
+        "budget_adjustments": budget_adjustments,
+        "research_topic": research_topic,
+        "model_calls": model_manager.calls,
+        # plan the loop budget up front so later steps can tell when no loop is left
+        "max_research_loops": max_research_loops(state, configurable),
+        "research_started_at": time.time(),
+    }
+
+
+def max_research_loops(state: OverallState, configurable: Configuration) -> int:
+    """Loop budget of the run: the state's override, else the configured maximum."""
+    if state.get("max_research_loops") is not None:
+        return state["max_research_loops"]
+    return configurable.max_research_loops
+
+
+def deadline_adjustment(node: str, kind: str, value) -> dict:
+    """Record of a change the deadline planner made, counted in the ``deadline.<kind>`` metric."""
+    metrics.incr(f"deadline.{kind}")
+    logger.info(f"Deadline planner: {node} {kind} -> {value}")
+    return {"node": node, "kind": kind, "value": value}
+
+
+def budget_adjustment(node: str, kind: str, value) -> dict:
+    """Record of a change made to stay within the run's budget, counted in the ``budget.<kind>`` metric."""
+    metrics.incr(f"budget.{kind}")
+    logger.info(f"Run budget: {node} {kind} -> {value}")
+    return {"node": node, "kind": kind, "value": value}
+
+
+def run_research_topic(state: OverallState, configurable: Configuration) -> str:
+    """The research topic computed by generate_query, else computed from the messages."""
+    return state.get("research_topic") or get_research_topic(state["messages"], configurable.topic_history_tokens)
+
+
+def remaining_searches(state: OverallState, configurable: Configuration) -> Optional[int]:
+    """Web searches left in the run's budget, or None without a search budget."""
+    if not configurable.max_searches:
+        return None
+    return max(configurable.max_searches - state.get("searches_run", 0), 0)
+
+
+def reflection_skip_reason(state: OverallState, configurable: Configuration) -> Optional[str]:
+    """
+    Why reflecting is pointless because no further research loop can run, if it is.
+
+    Checked before the reflection model call: its follow-up queries would be
+    discarded once the loop, time, token or search budget is spent, or when
+    another loop would not finish before the deadline.
+    """
+    if state.get("research_loop_count", 0) + 1 >= max_research_loops(state, configurable):
+        return "loop_budget"
+    if (
+        configurable.max_research_seconds
+        and time.time() - state.get("research_started_at", time.time()) >= configurable.max_research_seconds
+    ):
+        return "time_budget"
+    spent = RunBudget(state, configurable).exhausted()
+    if spent:
+        return spent
+    if remaining_searches(state, configurable) == 0:
+        return "search_budget"
+    if not DeadlinePlanner(configurable).loop_fits():
+        return "deadline"
+    return None
 
 
 def continue_to_web_research(state: QueryGenerationState):
@@ -104,7 +192,7 @@ def continue_to_web_research(state: QueryGenerationState):
 
 
 def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
-    """LangGraph node that performs web research using the TavilySearchResults tool
+    """LangGraph node that performs web research using the Tavily Search API
 
 
     Args:
@@ -117,30 +205,46 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     # Configure
     configurable = Configuration.from_runnable_config(config)
 
-    # configure Tavily
-    search_tool = TavilySearchResults(
-        max_results=configurable.max_search_results,
-        search_depth="advanced",
-        include_answer=True,
-        include_raw_content=False,
-        tavily_api_key=configurable.tavily_api_key,
-    )
+    # reuse passages from past runs when they already cover the query
+    search_results = None
+    if configurable.knowledge_store_enabled:
+        store = get_knowledge_store(configurable.knowledge_max_age_days, configurable.knowledge_max_passages)
+        search_results = find_covering_passages(store, state["search_query"], configurable)
+        metrics.incr("knowledge.hit" if search_results else "knowledge.miss")
+
+    knowledge_hit = search_results is not None
+    search_started = time.monotonic()
+    shared = False
+    if not knowledge_hit:
+        # shared keep-alive client, see core.search
+        search_client = get_search_client(
+            configurable.tavily_base_url,
+            configurable.search_max_connections,
+            configurable.search_max_keepalive_connections,
+            configurable.search_connect_timeout,
+            configurable.search_coalesce,
+        )
 
-    # perform search 
-    search_results = search_tool.invoke({"query": state["search_query"]})
+        # perform search, once per batch for identical queries
+        def search():
+            return search_client.search(
+                state["search_query"],
+                api_key=configurable.tavily_api_key,
+                max_results=configurable.max_search_results,
+                search_depth="advanced",
+                include_answer=True,
+                include_raw_content=False,
+                timeout=configurable.search_timeout,
+                cancel_token=find_cancel_token(configurable.run_id),
+            )
 
-    if configurable.llm_provider == "bedrock":
-        llm = ModelManager(config).configure_bedrock_client(
-            model_id=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "azure":
-        llm = ModelManager(config).configure_azure_client(
-            deployment_name=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "openai":
-        llm = ModelManager(config).configure_openai_client()
+        if configurable.batch_id:
+            search_results, shared = get_batch_scope(configurable.batch_id).searches.do(
+                f"{configurable.max_search_results}:{state['search_query']}", search
+            )
+        else:
+            search_results = search()
+    search_seconds = time.monotonic() - search_started
 
     # format prompt
     formatted_prompt = web_researcher_summariser_instructions.format(
@@ -150,16 +254,40 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     )
 
     # generate summary of the research
-    research_summary = llm.invoke(formatted_prompt)
+    planner = DeadlinePlanner(configurable)
+    tier = planner.tier_for("web_research", reserve=planner.node_seconds("finalize_answer"))
+    model_manager = ModelManager(config)
+    research_summary = model_manager.invoke(formatted_prompt, node="web_research", tier=tier)
 
     citations = generate_citations_from_tavily(search_results, state["search_query"])
     cited_text = create_cited_text(search_results, state["search_query"])
     sources_gathered = [item for citation in citations for item in citation["segments"]]
+    summary = research_summary.content
+
+    # keep the large payloads out of the state that every step and fan-out carries; only a
+    # run with a run_id releases its blobs, other runs (graph.invoke, LangGraph server) keep
+    # the payloads in state
+    if configurable.blob_state and configurable.run_id:
+        store = state_blob_store(configurable)
+        summary = store.put(summary, owner=configurable.run_id)
+        sources_gathered = [store.put(sources_gathered, owner=configurable.run_id)]
 
     return {
         "sources_gathered": sources_gathered,
         "search_query": [state["search_query"]],
-        "web_research_result": [research_summary.content],
+        "web_research_result": [summary],
+        "model_calls": model_manager.calls,
+        "knowledge_lookups": [{"query": state["search_query"], "hit": knowledge_hit}]
+        if configurable.knowledge_store_enabled else [],
+        "searches_run": 0 if knowledge_hit else 1,
+        "search_calls": [{
+            "node": "web_research",
+            "source": "knowledge" if knowledge_hit else "batch" if shared else "tavily",
+            # only searches sent to Tavily by this run are billed to it
+            "paid": not (knowledge_hit or shared),
+            "latency_s": round(search_seconds, 3),
+        }],
+        "deadline_adjustments": [deadline_adjustment("web_research", "tier", tier)] if tier else [],
     }
 
 
@@ -179,32 +307,35 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
         Dictionary with state update, including search_query key containing the generated follow-up query
     """
     configurable = Configuration.from_runnable_config(config)
+    skip_reason = reflection_skip_reason(state, configurable)
+
     # Increment the research loop count and get the reasoning model
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
-    reasoning_model = state.get("reasoning_model", configurable.reflection_model)
+
+    if skip_reason:
+        # no follow-up loop can run, so the reflection result would be discarded
+        metrics.incr("reflection.skipped")
+        metrics.incr(f"reflection.skipped.{skip_reason}")
+        logger.info(f"Skipping reflection: {skip_reason} spent")
+        return {
+            "is_sufficient": True,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+            "skipped_calls": [{"node": "reflection", "reason": skip_reason}],
+        }
 
     # Format the prompt
     current_date = get_current_date()
     formatted_prompt = reflection_instructions.format(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
+        research_topic=run_research_topic(state, configurable),
+        summaries="\n\n---\n\n".join(research_summaries(state, state_blob_store(configurable))),
     )
 
-    if configurable.llm_provider == "bedrock":
-        llm = ModelManager(config).configure_bedrock_client(
-            model_id=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "azure":
-        llm = ModelManager(config).configure_azure_client(
-            deployment_name=configurable.query_generator_model
-        )
-    
-    if configurable.llm_provider == "openai":
-        llm = ModelManager(config).configure_openai_client()
-
-    result = llm.with_structured_output(Reflection).invoke(formatted_prompt)
+    model_manager = ModelManager(config)
+    result = model_manager.invoke(formatted_prompt, node="reflection", schema=Reflection)
 
     return {
         "is_sufficient": result.is_sufficient,
@@ -212,6 +343,7 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
         "follow_up_queries": result.follow_up_queries,
         "research_loop_count": state["research_loop_count"],
         "number_of_ran_queries": len(state["search_query"]),
+        "model_calls": model_manager.calls,
     }
 
 
@@ -232,23 +364,39 @@ def evaluate_research(
         String literal indicating the next node to visit ("web_research" or "finalize_summary")
     """
     configurable = Configuration.from_runnable_config(config)
-    max_research_loops = (
-        state.get("max_research_loops")
-        if state.get("max_research_loops") is not None else configurable.max_research_loops
-    )
-    if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
+    if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops(state, configurable):
         return "finalize_answer"
-    else:
-        return [
-            Send(
-                "web_research",
-                {
-                    "search_query": follow_up_query,
-                    "id": state["number_of_ran_queries"] + int(idx),
-                },
-            )
-            for idx, follow_up_query in enumerate(state["follow_up_queries"])
-        ]
+
+    budget = RunBudget(state, configurable)
+    spent = budget.exhausted()
+    if spent:
+        budget_adjustment("evaluate_research", "stopped", spent)
+        return "finalize_answer"
+
+    follow_up_queries = state["follow_up_queries"]
+    remaining = remaining_searches(state, configurable)
+    if remaining is not None:
+        follow_up_queries = follow_up_queries[:remaining]
+    width = DeadlinePlanner(configurable).wave_width(len(follow_up_queries))
+    if width < len(follow_up_queries):
+        deadline_adjustment("evaluate_research", "fan_out", width)
+        follow_up_queries = follow_up_queries[:width]
+    width = budget.wave_width(len(follow_up_queries))
+    if width < len(follow_up_queries):
+        budget_adjustment("evaluate_research", "fan_out", width)
+        follow_up_queries = follow_up_queries[:width]
+    if not follow_up_queries:
+        return "finalize_answer"
+    return [
+        Send(
+            "web_research",
+            {
+                "search_query": follow_up_query,
+                "id": state["number_of_ran_queries"] + int(idx),
+            },
+        )
+        for idx, follow_up_query in enumerate(follow_up_queries)
+    ]
     
 
 def finalize_answer(state: OverallState, config: RunnableConfig):
@@ -256,55 +404,100 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     import json
     
     configurable = Configuration.from_runnable_config(config)
-    reasoning_model = state.get("reasoning_model") or configurable.answer_model
     current_date = get_current_date()
+    research_topic = run_research_topic(state, configurable)
+
+    store = state_blob_store(configurable)
+    summaries = "\n---\n\n".join(research_summaries(state, store))
+    if (
+        configurable.answer_passage_retrieval
+        and estimate_tokens(summaries) > configurable.answer_context_token_budget
+    ):
+        # large runs: keep only the passages relevant to each report section
+        index = PassageIndex(
+            build_run_passages(research_summaries(state, store), gathered_sources(state, store))
+        )
+        summaries = select_section_context(
+            index,
+            research_topic,
+            REPORT_SECTIONS,
+            top_k=configurable.answer_passage_top_k,
+            token_budget=configurable.answer_context_token_budget,
+        )
+        logger.info(
+            f"Selected {estimate_tokens(summaries)} of "
+            f"{sum(estimate_tokens(p) for p in index.passages)} context tokens for the final answer"
+        )
 
     formatted_prompt = answer_instructions.format(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]),
+        research_topic=research_topic,
+        summaries=summaries,
     )
 
-    if configurable.llm_provider == "bedrock":
-        llm = ModelManager(config).configure_bedrock_client(
-            model_id=reasoning_model
-        )
-    if configurable.llm_provider == "azure":
-        llm = ModelManager(config).configure_azure_client(
-            deployment_name=reasoning_model
-        )
-
-    # get final report result
-    result = llm.invoke(formatted_prompt)
+    # get final report result, on a faster model if the deadline requires it
+    # an explicit reasoning_model wins over the planner
+    tier = None if state.get("reasoning_model") else DeadlinePlanner(configurable).tier_for("finalize_answer")
+    model_manager = ModelManager(config)
+    result = model_manager.invoke(
+        formatted_prompt,
+        node="finalize_answer",
+        model_id=state.get("reasoning_model"),
+        tier=tier,
+    )
 
     return {
         "messages": [AIMessage(content=result.content)],
+        "model_calls": model_manager.calls,
+        "deadline_adjustments": [deadline_adjustment("finalize_answer", "tier", tier)] if tier else [],
     }
 
 
-# Create our Agent Graph
-builder = StateGraph(OverallState, config_schema=Configuration)
+def build_graph(checkpointer=None):
+    """Build and compile the research agent graph, optionally with a checkpointer."""
+    builder = StateGraph(OverallState, config_schema=Configuration)
 
-# Define the nodes we will cycle between
-builder.add_node("generate_query", generate_query)
-builder.add_node("web_research", web_research)
-builder.add_node("reflection", reflection)
-builder.add_node("finalize_answer", finalize_answer)
+    # Define the nodes we will cycle between
+    builder.add_node("generate_query", generate_query)
+    builder.add_node("web_research", web_research)
+    builder.add_node("reflection", reflection)
+    builder.add_node("finalize_answer", finalize_answer)
+
+    # Set the entrypoint as `generate_query`
+    # This means that this node is the first one called
+    builder.add_edge(START, "generate_query")
+    # Add conditional edge to continue with search queries in a parallel branch
+    builder.add_conditional_edges(
+        "generate_query", continue_to_web_research, ["web_research"]
+    )
+    # Reflect on the web research
+    builder.add_edge("web_research", "reflection")
+    # Evaluate the research
+    builder.add_conditional_edges(
+        "reflection", evaluate_research, ["web_research", "finalize_answer"]
+    )
+    # Finalize the answer
+    builder.add_edge("finalize_answer", END)
+
+    return builder.compile(name="pro-search-agent", checkpointer=checkpointer)
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """Return the compiled graph, compiling it on first use only."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
 
-# Set the entrypoint as `generate_query`
-# This means that this node is the first one called
-builder.add_edge(START, "generate_query")
-# Add conditional edge to continue with search queries in a parallel branch
-builder.add_conditional_edges(
-    "generate_query", continue_to_web_research, ["web_research"]
-)
-# Reflect on the web research
-builder.add_edge("web_research", "reflection")
-# Evaluate the research
-builder.add_conditional_edges(
-    "reflection", evaluate_research, ["web_research", "finalize_answer"]
-)
-# Finalize the answer
-builder.add_edge("finalize_answer", END)
 
-graph = builder.compile(name="pro-search-agent")
+def __getattr__(name):
+    # keeps `from agent.graph import graph` working without compiling at import time
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,74 @@
+from typing import List, Optional
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for streamed JSON of the form ``{"<key>": [{...}, ...]}``
+    or a bare array of objects
+
+    ``feed`` takes the next fragment of the text and returns the source text
+    of each array element that closed within it, so callers can use an
+    element long before the whole document has arrived. Only structure is
+    tracked here (nesting, strings and escapes); elements are parsed by the
+    caller. Text before the opening brace, e.g. prose around a text answer,
+    is skipped.
+    """
+    def __init__(self, key: str = "pages"):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether the outermost object or array has been closed."""
+        return self._started and self._depth == 0
+
+    def feed(self, fragment: str) -> List[str]:
+        self.text += fragment
+        items = []
+        text = self.text
+        for idx in range(self._pos, len(text)):
+            char = text[idx]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:idx]
+                continue
+            if self.complete:
+                break
+
+            if char == '"' and self._depth > 0:
+                self._in_string = True
+                self._string_start = idx
+            elif char in "{[":
+                if char == "[" and self._array_depth is None and (
+                    self._depth == 0 or (self._depth == 1 and self._last_key == self.key)
+                ):
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._depth == self._array_depth:
+                    self._item_start = idx
+                self._depth += 1
+                self._started = True
+            elif char in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == self._array_depth and self._item_start is not None and char == "}":
+                    items.append(text[self._item_start:idx + 1])
+                    self._item_start = None
+                elif self._array_depth is not None and self._depth < self._array_depth:
+                    # the array itself closed
+                    self._array_depth = -1
+        self._pos = len(text)
+        return items
@@ -0,0 +1,200 @@
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agent.configuration import Configuration
+from agent.utils import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeStore:
+    """
+    In-process BM25 index over sources and summaries of past research runs
+
+    Passages are added incrementally and never need an external vector
+    database; postings are plain term -> [(passage id, term frequency)] lists.
+    Beyond ``max_passages`` the index is rebuilt without the oldest passages
+    and those older than ``max_age_seconds``, down to 90% of the bound so
+    the rebuild is amortised over many additions.
+    """
+    def __init__(
+            self,
+            k1: float = 1.2,
+            b: float = 0.75,
+            max_passages: Optional[int] = None,
+            max_age_seconds: Optional[float] = None,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.max_passages = max_passages
+        self.max_age_seconds = max_age_seconds
+        self.passages: List[Dict[str, Any]] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        self.total_length = 0
+        self._seen = set()
+        self._lock = threading.RLock()
+
+    def add(self, url: str, title: str, content: str, created_at: float, topic: str = ""):
+        """Index one passage, ignoring exact duplicates."""
+        fingerprint = hashlib.sha1(f"{url}\n{content}".encode("utf-8")).hexdigest()
+        terms = Counter(tokenize(f"{title} {content}"))
+        if not terms:
+            return
+
+        with self._lock:
+            if fingerprint in self._seen:
+                return
+            self._index(fingerprint, terms, {
+                "url": url,
+                "title": title,
+                "content": content,
+                "created_at": created_at,
+                "topic": topic,
+            })
+            if self.max_passages and len(self.passages) > self.max_passages:
+                self._compact()
+
+    def _index(self, fingerprint: str, terms: Counter, passage: Dict[str, Any]):
+        self._seen.add(fingerprint)
+        passage_id = len(self.passages)
+        self.passages.append({**passage, "fingerprint": fingerprint})
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings[term].append((passage_id, frequency))
+
+    def _compact(self):
+        """Rebuild the index without expired passages and, beyond the bound, the oldest ones."""
+        passages = self.passages
+        if self.max_age_seconds is not None:
+            now = time.time()
+            passages = [p for p in passages if now - p["created_at"] <= self.max_age_seconds]
+        if self.max_passages:
+            passages = sorted(passages, key=lambda p: p["created_at"])[-(self.max_passages * 9 // 10):]
+        dropped = len(self.passages) - len(passages)
+
+        self.passages, self.lengths, self.total_length = [], [], 0
+        self.postings = defaultdict(list)
+        self._seen = set()
+        for passage in passages:
+            terms = Counter(tokenize(f"{passage['title']} {passage['content']}"))
+            self._index(passage["fingerprint"], terms, passage)
+        logger.info(f"Dropped {dropped} old passages from the knowledge store, {len(self.passages)} kept")
+
+    def add_records(self, records: Iterable[Dict[str, Any]], max_age_seconds: Optional[float] = None):
+        """Index archive records (see ``services.archive.run_records``) of type source or summary."""
+        now = time.time()
+        for record in records:
+            if record["type"] not in ("source", "summary") or not record.get("text"):
+                continue
+            created_at = datetime.fromisoformat(record["created_at"]).timestamp()
+            if max_age_seconds is not None and now - created_at > max_age_seconds:
+                continue
+            url = record.get("url") or f"archive://{record['research_id']}/summary/{record.get('position', 0)}"
+            self.add(url, record.get("title") or record["topic"], record["text"], created_at, record["topic"])
+
+    def search(
+            self,
+            query: str,
+            k: int = 5,
+            max_age_seconds: Optional[float] = None,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Return the top ``k`` (score, passage) pairs for ``query`` ranked by BM25."""
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return []
+
+        now = time.time()
+        with self._lock:
+            count = len(self.passages)
+            if count == 0:
+                return []
+            average_length = self.total_length / count
+
+            scores: Dict[int, float] = defaultdict(float)
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, frequency in postings:
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[passage_id] / average_length)
+                    scores[passage_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for passage_id, score in ranked:
+                passage = self.passages[passage_id]
+                if max_age_seconds is not None and now - passage["created_at"] > max_age_seconds:
+                    continue
+                results.append((score, passage))
+                if len(results) >= k:
+                    break
+
+        return results
+
+
+def find_covering_passages(store: KnowledgeStore, query: str, configurable: Configuration) -> Optional[List[Dict[str, str]]]:
+    """
+    Return stored passages covering ``query`` as Tavily-shaped results, or None
+
+    A query is covered when at least ``knowledge_min_passages`` fresh
+    passages score above ``knowledge_min_score`` and together contain
+    ``knowledge_min_coverage`` of the query terms.
+    """
+    max_age = configurable.knowledge_max_age_days * 86400
+    results = store.search(query, k=configurable.max_search_results * 2, max_age_seconds=max_age)
+    relevant = [(score, passage) for score, passage in results if score >= configurable.knowledge_min_score]
+    if len(relevant) < configurable.knowledge_min_passages:
+        return None
+
+    covered = set()
+    for _, passage in relevant:
+        covered |= set(tokenize(f"{passage['title']} {passage['content']}"))
+    query_terms = set(tokenize(query))
+    if len(query_terms & covered) / len(query_terms) < configurable.knowledge_min_coverage:
+        return None
+
+    return [
+        {"url": passage["url"], "title": passage["title"], "content": passage["content"], "score": round(score, 3)}
+        for score, passage in relevant
+    ]
+
+
+_store: Optional[KnowledgeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_knowledge_store(max_age_days: Optional[float] = None, max_passages: Optional[int] = None) -> KnowledgeStore:
+    """
+    Return the process-wide store, built from the research archive on first use
+
+    Loading reads the whole archive, so callers on an event loop run this in a worker thread.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            max_age_seconds = max_age_days * 86400 if max_age_days is not None else None
+            _store = KnowledgeStore(max_passages=max_passages, max_age_seconds=max_age_seconds)
+            from services.archive import get_archive
+
+            archive = get_archive()
+            if archive is not None:
+                started = time.monotonic()
+                _store.add_records(
+                    archive.iter_records(types=("source", "summary")),
+                    max_age_seconds=max_age_seconds,
+                )
+                logger.info(
+                    f"Loaded {len(_store.passages)} passages into the knowledge store "
+                    f"in {time.monotonic() - started:.2f}s"
+                )
+        return _store
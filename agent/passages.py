@@ -0,0 +1,141 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from agent.utils import PARAGRAPH_SPLIT, estimate_tokens, tokenize
+
+
+def split_passages(text: str, max_chars: int = 1200) -> List[str]:
+    """Split text into paragraph passages of at most ``max_chars`` characters."""
+    passages = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            passages.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            passages.append(paragraph)
+    return passages
+
+
+class PassageIndex:
+    """
+    Per-run BM25 index over passages, with scoring vectorised in NumPy
+
+    The corpus is stored as flat COO arrays (passage id, term id, weight)
+    with the BM25 term weights precomputed, so scoring a query is a mask
+    over the term ids followed by one ``np.bincount``.
+    """
+    def __init__(self, passages: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.passages = list(passages)
+        self.vocabulary: Dict[str, int] = {}
+
+        doc_ids, term_ids, frequencies = [], [], []
+        lengths = np.zeros(len(self.passages), dtype=np.float32)
+        for doc_id, passage in enumerate(self.passages):
+            counts: Dict[int, int] = {}
+            for token in tokenize(passage):
+                term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            lengths[doc_id] = sum(counts.values())
+            doc_ids.extend([doc_id] * len(counts))
+            term_ids.extend(counts.keys())
+            frequencies.extend(counts.values())
+
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.term_ids = np.asarray(term_ids, dtype=np.int32)
+        tf = np.asarray(frequencies, dtype=np.float32)
+
+        count = max(len(self.passages), 1)
+        document_frequency = np.bincount(self.term_ids, minlength=len(self.vocabulary))
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = max(float(lengths.mean()) if len(lengths) else 0.0, 1.0)
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / average_length)
+        self.weights = (idf[self.term_ids] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every passage for ``query``."""
+        query_ids = [self.vocabulary[t] for t in set(tokenize(query)) if t in self.vocabulary]
+        if not query_ids:
+            return np.zeros(len(self.passages), dtype=np.float32)
+        mask = np.isin(self.term_ids, query_ids)
+        return np.bincount(
+            self.doc_ids[mask], weights=self.weights[mask], minlength=len(self.passages)
+        )
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top ``k`` (passage id, score) pairs with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def build_run_passages(summaries: Sequence[str], sources: Sequence[Dict]) -> List[str]:
+    """Passages of a run: paragraphs of every summary plus each source's content."""
+    passages = []
+    for summary in summaries:
+        passages.extend(split_passages(summary))
+    for source in sources:
+        content = source.get("content", "")
+        if not content:
+            continue
+        label = f"[{source.get('title') or source.get('url')}]({source.get('url')})"
+        passages.extend(f"{label} {chunk}" for chunk in split_passages(content))
+    return passages
+
+
+def select_section_context(
+        index: PassageIndex,
+        topic: str,
+        sections: Sequence[Tuple[str, str]],
+        top_k: int,
+        token_budget: int,
+) -> str:
+    """
+    Retrieve the top passages for each report section within a token budget
+
+    Sections take turns picking their next best passage so that one
+    evidence-rich section cannot use up the whole budget; a passage is only
+    included once, under the first section that picked it.
+
+    Args:
+        index: The run's passage index
+        topic: Research topic, added to every section query
+        sections: (section title, retrieval keywords) pairs
+        top_k: Maximum passages per section
+        token_budget: Maximum estimated tokens of the returned context
+
+    Returns:
+        Passages grouped under one heading per section
+    """
+    ranked = [index.search(f"{topic} {keywords}", top_k) for _, keywords in sections]
+    chosen: List[List[str]] = [[] for _ in sections]
+    used = set()
+    remaining = token_budget
+
+    for rank in range(top_k):
+        for section_idx, hits in enumerate(ranked):
+            if rank >= len(hits):
+                continue
+            passage_id, _ = hits[rank]
+            if passage_id in used:
+                continue
+            passage = index.passages[passage_id]
+            cost = estimate_tokens(passage)
+            if cost > remaining:
+                continue
+            used.add(passage_id)
+            remaining -= cost
+            chosen[section_idx].append(passage)
+
+    return "\n\n".join(
+        f"### Evidence for {title}\n\n" + "\n\n".join(passages)
+        for (title, _), passages in zip(sections, chosen)
+        if passages
+    )
@@ -0,0 +1,31 @@
+from typing import Any, Dict, Literal
+
+# Named research presets, applied as RunnableConfig values so an explicit
+# configurable value or environment variable still wins over them.
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "number_of_initial_queries": 1,
+        "max_research_loops": 1,
+        "max_search_results": 2,
+        "node_model_tiers": {"generate_query": "fast", "finalize_answer": "standard"},
+    },
+    "balanced": {
+        "number_of_initial_queries": 3,
+        "max_research_loops": 2,
+        "max_search_results": 3,
+    },
+    "deep": {
+        "number_of_initial_queries": 5,
+        "max_research_loops": 3,
+        "max_search_results": 5,
+    },
+}
+
+PresetName = Literal["fast", "balanced", "deep"]
+
+
+def preset_configurable(preset: str) -> Dict[str, Any]:
+    """Configuration values of ``preset``."""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown research preset '{preset}', expected one of {sorted(PRESETS)}")
+    return dict(PRESETS[preset])
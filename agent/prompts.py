@@ -1,20 +1,23 @@
 from datetime import datetime
 
+from core.prompt_cache import PromptTemplate
+
 
 # Get current date in a readable format
 def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
 
 
-query_writer_instructions = """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
+query_writer_instructions = PromptTemplate(
+    static="""Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
 
 Instructions:
 - Always prefer a single search query, only add another query if the original question requests multiple aspects or elements and one query is not enough.
 - Each query should focus on one specific aspect of the original question.
-- Don't produce more than {number_queries} queries.
+- Don't produce more queries than the maximum given below.
 - Queries should be diverse, if the topic is broad, generate more than 1 query.
 - Don't generate multiple similar queries, 1 is enough.
-- Query should ensure that the most current information is gathered. The current date is {current_date}.
+- Query should ensure that the most current information is gathered, as of the current date given below.
 
 Format: 
 - Format your response as a JSON object with ALL two of these exact keys:
@@ -25,46 +28,62 @@ Example:
 
 Topic: What revenue grew more last year apple stock or the number of people buying an iphone
 ```json
-{{
+{
     "rationale": "To answer this comparative growth question accurately, we need specific data points on Apple's stock performance and iPhone sales metrics. These queries target the precise financial information needed: company revenue trends, product-specific unit sales figures, and stock price movement over the same fiscal period for direct comparison.",
     "query": ["Apple total revenue growth fiscal year 2024", "iPhone unit sales growth fiscal year 2024", "Apple stock price growth fiscal year 2024"],
-}}
+}
 ```
+""",
+    variable="""
+Maximum number of queries: {number_queries}
+The current date is {current_date}.
 
-Context: {research_topic}"""
+Context: {research_topic}""",
+)
 
 
-web_researcher_summariser_instructions = """
-You will be presented with the results of web searches on "{research_topic}". Your task is to synthesise this information into a verbose, well-structured report summary that captures the key insights and findings in a verifiable text artifact.
+web_researcher_summariser_instructions = PromptTemplate(
+    static="""
+You will be presented with the results of web searches on a research topic. Your task is to synthesise this information into a verbose, well-structured report summary that captures the key insights and findings in a verifiable text artifact.
 
 Instructions:
- - Ensure that the most recent information is included. The current date is {current_date}.
+ - Ensure that the most recent information is included, as of the current date given below.
  - Consolidate key findings while meticulously tracking the source(s) for each specific piece of information.
  - The output should be a well-written summary or report based on your search findings.
  - Only include the information found in the search results, don't make up any information.
  - Cite all sources used in the report in markdown format (e.g. [rand.org](https://www.rand.org/pubs/research_reports/RRA3243-3.html)). THIS IS A MUST.
-
+""",
+    variable="""
+ Research Topic: "{research_topic}"
+ The current date is {current_date}.
 
  Research Results:
  {research_results}
-"""
+""",
+)
 
 
-web_searcher_instructions = """Conduct targeted web searches to gather the most recent, credible information on "{research_topic}" and synthesize it into a verifiable text artifact.
+web_searcher_instructions = PromptTemplate(
+    static="""Conduct targeted web searches to gather the most recent, credible information on the research topic below and synthesize it into a verifiable text artifact.
 
 Instructions:
-- Query should ensure tha the most current information is gathered. The current date is {current_date}.
+- Query should ensure tha the most current information is gathered, as of the current date given below.
 - Conduct multiple, diverse searches to gather comprehensive information.
 - Consolidate key findings while meticulously tracking the source(s) for each specific piece of information.
 - The output should be a well-written summary or report based on your search findings.
 - Only include the information found in the search results, don't make up any information.
+""",
+    variable="""
+The current date is {current_date}.
 
 Research Topic:
 {research_topic}
-"""
+""",
+)
 
 
-reflection_instructions = """You are an expert research assistant analyzing summaries about "{research_topic}".
+reflection_instructions = PromptTemplate(
+    static="""You are an expert research assistant analyzing summaries about the research topic given below.
 
 Instructions:
 - Identify knowledge gaps or areas that need deeper exploration and generate a follow-up query. (1 or multiple).
@@ -83,24 +102,45 @@ Output Format:
 
 Example:
 ```json
-{{
+{
     "is_sufficient": true, // or false
     "knowledge_gap": "The summary lacks information about performance metrics and benchmarks", // "" if is_sufficient is true
     "follow_up_queries": ["What are typical performance benchmarks and metrics used to evaluate [specific technology]?"] // [] if is_sufficient is true
-}}
+}
 ```
 
-Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format:
+Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format.
+""",
+    variable="""
+Research Topic: "{research_topic}"
+The current date is {current_date}.
 
 Summaries:
 {summaries}
-"""
+""",
+)
+
 
+# Sections of the required report structure in answer_instructions, with
+# the keywords used to retrieve supporting passages for each of them.
+REPORT_SECTIONS = [
+    ("Executive Summary", "key findings strategic implications recommendations overview"),
+    ("Introduction and Research Framework", "objectives scope methodology limitations"),
+    ("Background and Context", "history evolution current landscape market regulation policy"),
+    ("Comprehensive Findings Analysis", "data statistics evidence experts case studies examples trends"),
+    ("Cross-Source Synthesis and Validation", "consensus disagreement sources credibility evidence"),
+    ("Critical Analysis and Interpretation", "significance causes risks challenges opportunities comparison"),
+    ("Implications and Strategic Recommendations", "stakeholders impact recommendations implementation costs benefits"),
+    ("Future Outlook and Scenarios", "future trends forecast projections scenarios outlook"),
+    ("Conclusion", "conclusion answer takeaway"),
+]
 
-answer_instructions = """Generate a comprehensive, detailed and well structured research report based on the provided summaries and research topic.
+
+answer_instructions = PromptTemplate(
+    static="""Generate a comprehensive, detailed and well structured research report based on the provided summaries and research topic.
 
 Instructions:
-- The current date is {current_date}.
+- The current date is given below, with the user's question.
 - You are the final step of a multi-step research process, don't mention that you are the final step. 
 - You have access to all the information gathered from the previous steps.
 - You have access to the user's question.
@@ -205,9 +245,73 @@ Additional Context: Supplementary information that supports but doesn't fit main
 - Use transitional phrases to link ideas and create flow between sections
 - Cite all sources used in the report in markdown format (e.g. [rand.org](https://www.rand.org/pubs/research_reports/RRA3243-3.html)). THIS IS A MUST.
 
+""",
+    variable="""
+The current date is {current_date}.
+
 User Context:
 - {research_topic}
 
 
 Summaries:
-{summaries}"""
\ No newline at end of file
+{summaries}""",
+)
+
+
+wiki_transformation_instructions = PromptTemplate(
+    static="""
+You are transforming existing report content into a structured nested wiki JSON format.
+
+TASK
+Transform the report content given at the end into a JSON object with a "pages" key containing an array of pages.
+- Analyze the existing content structure and organize it into logical pages and sub-pages
+- Preserve all the information from the original content
+- Convert the content into ProseMirror/Tiptap JSON format
+
+Each page object must be:
+{
+"title": string,                 // human title derived from the content
+"slug": string,                  // lowercase-kebab; unique across the entire tree
+"content": { ... },              // ProseMirror/Tiptap JSON document
+"children": [ ... ]              // array of child pages; order = nav order
+}
+
+CONTENT (ProseMirror/Tiptap JSON)
+- Root of each page must be: { "type": "doc", "content": [...] }.
+- Allowed block nodes: "heading", "paragraph", "bulletList", "orderedList", "listItem", "blockquote", "codeBlock", "horizontalRule", "hardBreak".
+- Inline: "text" nodes with optional marks: "bold", "italic", "code", "link" (attrs: { "href": URL }).
+- Headings must include level 1..6 in attrs: { "level": n }.
+- For EVERY heading, set a stable id in attrs: { "id": "kebab-case-anchor" }.
+- Anchors must be lowercase-kebab and unique within the page.
+- If an anchor would duplicate, append "-2", "-3", etc.
+- Convert markdown or plain text formatting into proper ProseMirror JSON structure
+- NO Markdown or HTML strings in the output; only PM/Tiptap JSON.
+
+STRUCTURE
+- Analyze the content to determine logical page boundaries (e.g., major sections become pages)
+- The array order defines sibling order; children[] defines sub-pages.
+- Each page should contain a meaningful portion of the original content
+- Maintain the logical flow and hierarchy from the original report
+
+SLUG RULES
+- Generate slugs from the page titles: lowercase-kebab format
+- slug regex: ^[a-z0-9]+(?:-[a-z0-9]+)*$
+- Must be unique across the entire tree (not just per parent)
+- Do NOT include numeric prefixes (e.g., "1.2-"). Numbers are added at render time.
+
+ABSOLUTE OUTPUT RULES
+- Output ONLY valid JSON with a "pages" key.
+- Do NOT include any extra properties outside the schema.
+- No commentary, explanations, or markdown code blocks.
+- Start your response with { and end with }
+- Preserve ALL information from the original content - do not summarize or omit details
+""",
+    variable="""
+CONTEXT
+- Investigation title: {title}
+{scope}
+
+EXISTING REPORT CONTENT:
+{report_content}
+""",
+)
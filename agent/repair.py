@@ -0,0 +1,215 @@
+import re
+import ast
+import json
+import logging
+import typing
+from typing import Any, Callable, Dict, Optional, Set, Type
+
+from pydantic import BaseModel, ValidationError
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+NON_SLUG_CHARS = re.compile(r"[^a-z0-9]+")
+# section numbering such as "1.2-" or "3. ", which is added at render time
+NUMBERING_PREFIX = re.compile(r"^(?:\d+(?:\.\d+)+[-.\s]*|\d+\.\s*)")
+
+
+class RepairError(ValueError):
+    """Raised when model output cannot be repaired into the expected schema."""
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse JSON from model text output, tolerating the usual slips: code fences,
+    prose around the object, trailing commas and Python literals.
+
+    Valid JSON is taken as is, and the outermost object is tried before the
+    contents of a code fence, so fenced code inside string values is left alone.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return _parse_candidate(text)
+    except RepairError:
+        fenced = CODE_FENCE.search(text)
+        if not fenced:
+            raise
+    # e.g. prose with braces around the fenced object
+    return _parse_candidate(fenced.group(1))
+
+
+def _parse_candidate(text: str) -> Any:
+    """Parse the outermost object or array in ``text``, fixing trailing commas and Python literals."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise RepairError("No JSON object in model output")
+    start = min(starts)
+    end = max(text.rfind("}"), text.rfind("]"))
+    candidate = text[start:end + 1]
+
+    for attempt in (
+        candidate,
+        TRAILING_COMMA.sub(r"\1", candidate),
+        re.sub(r"\b(True|False|None)\b", lambda m: PYTHON_LITERALS[m.group(1)], TRAILING_COMMA.sub(r"\1", candidate)),
+    ):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+    raise RepairError("Model output is not valid JSON")
+
+
+def slugify(text: str) -> str:
+    """Lowercase-kebab form of ``text``, without section numbering."""
+    return NON_SLUG_CHARS.sub("-", NUMBERING_PREFIX.sub("", text.strip()).lower()).strip("-") or "page"
+
+
+def unique_slug(slug: str, taken: Set[str]) -> str:
+    """``slug``, or the first free ``slug-2``, ``slug-3``... and mark it as taken."""
+    candidate, suffix = slug, 2
+    while candidate in taken:
+        candidate = f"{slug}-{suffix}"
+        suffix += 1
+    taken.add(candidate)
+    return candidate
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    """Coerce ``value`` towards ``annotation`` where the intent is unambiguous."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Union:
+        non_null = [arg for arg in args if arg is not type(None)]
+        if value is None or len(non_null) != 1:
+            return value
+        return _coerce(value, non_null[0])
+
+    if origin in (list, typing.List):
+        item_type = args[0] if args else Any
+        if isinstance(value, str):
+            stripped = value.strip()
+            # a list serialised into a string, or a single item instead of a list
+            if stripped.startswith("["):
+                try:
+                    value = extract_json(stripped)
+                except RepairError:
+                    try:
+                        value = ast.literal_eval(stripped)
+                    except (ValueError, SyntaxError):
+                        value = [value]
+            else:
+                value = [value] if stripped else []
+        elif isinstance(value, dict):
+            value = [value]
+        if isinstance(value, list):
+            return [_coerce(item, item_type) for item in value]
+        return value
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        if isinstance(value, str):
+            try:
+                value = extract_json(value)
+            except RepairError:
+                return value
+        return coerce_to_model(value, annotation) if isinstance(value, dict) else value
+
+    if annotation is str:
+        if isinstance(value, list):
+            return "\n".join(str(item) for item in value)
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+
+    if annotation is bool and isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "yes", "1"):
+            return True
+        if lowered in ("false", "no", "0"):
+            return False
+
+    return value
+
+
+def coerce_to_model(data: Dict[str, Any], schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Coerce a dict's values to ``schema``'s field types and drop unknown keys."""
+    fields = schema.model_fields
+    # output wrapped in one extra object, e.g. {"Reflection": {...}} or {"properties": {...}}
+    if len(data) == 1 and not set(data) & set(fields):
+        inner = next(iter(data.values()))
+        if isinstance(inner, dict) and set(inner) & set(fields):
+            data = inner
+
+    coerced = {}
+    for name, field in fields.items():
+        key = name if name in data else field.alias
+        if key in data:
+            coerced[name] = _coerce(data[key], field.annotation)
+    return coerced
+
+
+# schema-specific fixes applied before type coercion, e.g. slug rules for wiki pages
+_repairers: Dict[type, Callable[[Any], Any]] = {}
+
+
+def register_repairer(schema: Type[BaseModel]):
+    """Register a function that fixes schema-specific problems in ``schema``'s raw data."""
+    def register(fn: Callable[[Any], Any]):
+        _repairers[schema] = fn
+        return fn
+    return register
+
+
+def repair_structured(data: Any, schema: Type[BaseModel]) -> BaseModel:
+    """
+    Validate model output against ``schema``, repairing it locally if needed
+
+    Strings are parsed as JSON first; invalid data is coerced to the field
+    types, passed through the schema's registered repairer and validated
+    again. Counts ``structured.<schema>.valid``, ``.repaired`` and ``.failed``.
+
+    Raises:
+        RepairError: if the data still does not validate after repair
+    """
+    name = schema.__name__
+    try:
+        parsed = extract_json(data) if isinstance(data, str) else data
+        result = schema.model_validate(parsed)
+        metrics.incr(f"structured.{name}.valid")
+        return result
+    except (RepairError, ValidationError) as e:
+        error = e
+
+    try:
+        if isinstance(data, str):
+            data = extract_json(data)
+        repairer = _repairers.get(schema)
+        if repairer:
+            data = repairer(data)
+        if isinstance(data, dict):
+            data = coerce_to_model(data, schema)
+        result = schema.model_validate(data)
+    except (RepairError, ValidationError, TypeError, ValueError) as e:
+        metrics.incr(f"structured.{name}.failed")
+        raise RepairError(f"Could not repair {name} output: {e}") from error
+
+    metrics.incr(f"structured.{name}.repaired")
+    logger.info(f"Repaired {name} output locally: {str(error).splitlines()[0]}")
+    return result
+
+
+def raw_output_data(message: Any) -> Optional[Any]:
+    """The structured payload of a chat model message: its first tool call's args, else its text."""
+    tool_calls = getattr(message, "tool_calls", None) or []
+    if tool_calls:
+        return tool_calls[0].get("args")
+    content = getattr(message, "content", None)
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or None
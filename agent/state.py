@@ -12,13 +12,25 @@ import operator
 
 class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
+    # computed once per run by generate_query
+    research_topic: str
     search_query: Annotated[list, operator.add]
+    # blob references unless blob_state is off, read through agent.utils.research_summaries / gathered_sources
     web_research_result: Annotated[list, operator.add]
     sources_gathered: Annotated[list, operator.add]
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    model_calls: Annotated[list, operator.add]
+    knowledge_lookups: Annotated[list, operator.add]
+    research_started_at: float
+    searches_run: Annotated[int, operator.add]
+    # one record per web_research search, for the run's ledger and cost budget
+    search_calls: Annotated[list, operator.add]
+    skipped_calls: Annotated[list, operator.add]
+    deadline_adjustments: Annotated[list, operator.add]
+    budget_adjustments: Annotated[list, operator.add]
 
 class DetailedFindingsState(TypedDict):
     findings: Annotated[list[dict], operator.add]  
@@ -1,24 +1,122 @@
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, List, Sequence
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
+from core.blobs import BlobList, BlobStore, get_blob_store, is_blob_ref
 
-def get_research_topic(messages: List[AnyMessage]) -> str:
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+# longest condensed form of one earlier turn in the research topic
+TURN_SUMMARY_CHARS = 600
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how in into is it its of on or "
+    "that the their this to was were what when where which who why will with".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for prompt budgets."""
+    return len(text) // 4 + 1
+
+
+def _condense(text: str, max_chars: int) -> str:
+    """
+    Short stand-in for an earlier turn: its title and opening paragraph, cut
+    at a word boundary. Earlier assistant turns are whole reports.
+    """
+    paragraphs = [p.strip() for p in PARAGRAPH_SPLIT.split(text.strip()) if p.strip()]
+    title = next((p.lstrip("# ").splitlines()[0] for p in paragraphs if p.startswith("#")), "")
+    body = next((p for p in paragraphs if not p.startswith("#")), "")
+    condensed = " ".join(f"{title}: {body}".split()) if title and body else " ".join((title or body).split())
+    if len(condensed) > max_chars:
+        condensed = condensed[:max_chars].rsplit(" ", 1)[0] + " ..."
+    return condensed
+
+
+def get_research_topic(messages: List[AnyMessage], history_token_budget: int = 1000) -> str:
     """
     Get the research topic from the messages.
+
+    The latest question is kept verbatim. Earlier turns are condensed and
+    packed newest first into ``history_token_budget`` tokens, so the topic
+    stays the same size however long the conversation grows.
     """
-    # check if request has a history and combine the messages into a single string
     if len(messages) == 1:
-        research_topic = messages[-1].content
-    else:
-        research_topic = ""
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                research_topic += f"User: {message.content}\n"
-            elif isinstance(message, AIMessage):
-                research_topic += f"Assistant: {message.content}\n"
+        return messages[-1].content
+
+    turns = [message for message in messages if isinstance(message, (HumanMessage, AIMessage))]
+    latest = max((idx for idx, message in enumerate(turns) if isinstance(message, HumanMessage)), default=len(turns) - 1)
+
+    history = []
+    budget = history_token_budget
+    for message in reversed(turns[:latest]):
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        line = f"{role}: {_condense(message.content, min(budget * 4, TURN_SUMMARY_CHARS))}"
+        if estimate_tokens(line) > budget:
+            break
+        history.append(line)
+        budget -= estimate_tokens(line)
+
+    research_topic = ""
+    if latest:
+        research_topic += "Earlier conversation (condensed):\n"
+        if latest > len(history):
+            research_topic += f"[{latest - len(history)} older messages omitted]\n"
+        research_topic += "".join(f"{line}\n" for line in reversed(history)) + "\n"
+    research_topic += f"User: {turns[latest].content}\n"
     return research_topic
 
 
+def state_blob_store(configurable) -> BlobStore:
+    """
+    Blob store holding the run's summaries and sources.
+    """
+    return get_blob_store(configurable.blob_memory_bytes, configurable.blob_spill_dir)
+
+
+def research_summaries(state: Dict[str, Any], store: BlobStore) -> Sequence[str]:
+    """
+    Lazy view of the run's research summaries, loaded from the blob store on access.
+    """
+    return BlobList(state.get("web_research_result", []), store)
+
+
+def gathered_sources(state: Dict[str, Any], store: BlobStore) -> List[Dict[str, Any]]:
+    """
+    The run's source segments; each web_research call stores its segments as one blob.
+    """
+    sources = []
+    for item in state.get("sources_gathered", []):
+        if is_blob_ref(item):
+            sources.extend(store.get(item))
+        else:
+            sources.append(item)
+    return sources
+
+
+def resolve_state(state: Dict[str, Any], store: BlobStore) -> Dict[str, Any]:
+    """
+    Copy of the final state with blob references replaced by their payloads.
+    """
+    return {
+        **state,
+        "web_research_result": list(research_summaries(state, store)),
+        "sources_gathered": gathered_sources(state, store),
+    }
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens used by the retrieval indexes, without stopwords.
+    """
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     """
     Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
@@ -1,21 +1,57 @@
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, List, Dict, Any, Optional, Set
 from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic.json_schema import SkipJsonSchema
 
+from langchain_core.runnables import RunnableConfig
+
+from agent.json_stream import JsonArrayStream
+from agent.repair import RepairError, extract_json, register_repairer, repair_structured, slugify, unique_slug
+from core import llm_cache
+from core.cancellation import CancelToken
+from core.metrics import metrics
 from core.model_manager import ModelManager
 from agent.configuration import Configuration
-
-from botocore.config import Config
+from agent.prompts import wiki_transformation_instructions
 
 logger = logging.getLogger(__name__)
 
-import boto3
 import re
-import os
 
 
 SLUG_PATTERN = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
 
+# level 1 and 2 headings start a new section of the source report
+SECTION_HEADING = re.compile(r"^#{1,2}\s")
+
+
+def split_sections(markdown: str) -> List[str]:
+    """Split a Markdown report into heading-delimited sections, ignoring headings in code blocks."""
+    sections: List[str] = []
+    current: List[str] = []
+    fenced = False
+    for line in markdown.splitlines():
+        if line.lstrip().startswith("```"):
+            fenced = not fenced
+        if not fenced and SECTION_HEADING.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return sections
+
+
+def section_hash(section: str) -> str:
+    """Hash of a section's text, insensitive to trailing whitespace."""
+    normalised = "\n".join(line.rstrip() for line in section.strip().splitlines())
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
 
 # Mark schemas
 class BoldMark(BaseModel):
@@ -115,6 +151,8 @@ class InvestigationOutputPage(BaseModel):
     slug: str = Field(...)
     content: TiptapDoc
     children: List["InvestigationOutputPage"] = Field(default_factory=list)
+    # hash of the report section the page was converted from, not part of the model's schema
+    source_hash: SkipJsonSchema[Optional[str]] = None
 
     @field_validator("slug")
     @classmethod
@@ -130,6 +168,8 @@ InvestigationOutputPage.model_rebuild()
 
 class InvestigationOutputPages(BaseModel):
     pages: List[InvestigationOutputPage] = Field(..., min_length=1)
+    # hashes of report sections converted to no pages, so they are reused like the others
+    empty_sections: SkipJsonSchema[List[str]] = Field(default_factory=list)
 
     @model_validator(mode="after")
     def validate_unique_slugs(self):
@@ -156,9 +196,71 @@ class InvestigationDto(BaseModel):
     title: str
 
 
+def _collect_slugs(pages: List[InvestigationOutputPage], taken: Set[str]):
+    for page in pages:
+        taken.add(page.slug)
+        _collect_slugs(page.children, taken)
+
+
+def _dedupe_slugs(pages: List[InvestigationOutputPage], taken: Set[str]):
+    """Give pages whose slug is already taken a free ``-2``, ``-3``... suffix."""
+    for page in pages:
+        page.slug = unique_slug(page.slug, taken)
+        _dedupe_slugs(page.children, taken)
+
+
+@register_repairer(InvestigationOutputPages)
+def repair_pages(data: Any) -> Dict[str, Any]:
+    """
+    Fix common slips in model-produced wiki pages: a missing ``pages`` key,
+    invalid or duplicate slugs, missing titles and bare content lists.
+    """
+    if isinstance(data, list):
+        data = {"pages": data}
+    elif isinstance(data, dict) and "pages" not in data:
+        if "title" in data or "slug" in data:
+            data = {"pages": [data]}
+        elif len(data) == 1 and isinstance(next(iter(data.values())), list):
+            data = {"pages": next(iter(data.values()))}
+    if not isinstance(data, dict) or not isinstance(data.get("pages"), (list, dict)):
+        raise RepairError("No wiki pages in model output")
+
+    taken: Set[str] = set()
+
+    def fix(page: Dict[str, Any]) -> Dict[str, Any]:
+        title = str(page.get("title") or page.get("slug") or "Untitled").strip()[:200]
+        slug = page.get("slug")
+        if not (isinstance(slug, str) and SLUG_PATTERN.match(slug)):
+            slug = slugify(str(slug or title))
+        slug = unique_slug(slug, taken)
+
+        content = page.get("content")
+        if isinstance(content, list):
+            content = {"type": "doc", "content": content}
+        elif not isinstance(content, dict):
+            content = {"type": "doc", "content": []}
+        else:
+            content = {"type": "doc", "content": content.get("content") or []}
+
+        children = page.get("children") or []
+        children = [children] if isinstance(children, dict) else children
+        fixed = {"title": title, "slug": slug, "content": content}
+        fixed["children"] = [fix(child) for child in children if isinstance(child, dict)]
+        return fixed
+
+    pages = data["pages"]
+    pages = [pages] if isinstance(pages, dict) else pages
+    return {"pages": [fix(page) for page in pages if isinstance(page, dict)]}
+
+
 class WikiService:
-    def __init__(self):
+    def __init__(self, config: Optional[RunnableConfig] = None, cancel_token: Optional[CancelToken] = None):
         self.name = "WikiService"
+        self.config = config
+        # stops the conversion between sections and mid-stream, e.g. on the stage's timeout
+        self.cancel_token = cancel_token
+        # records of every model call made by this service, for the run's ledger
+        self.calls: List[Dict[str, Any]] = []
 
     def _create_investigation_output(self, model: type[BaseModel]) -> Dict[str, any]:
         """Convert Pydantic model to tool schema format"""
@@ -177,63 +279,118 @@ class WikiService:
 
 
     def generate_investigation_output(
-        self, investigation: InvestigationDto, report_content: str
+        self,
+        investigation: InvestigationDto,
+        report_content: str,
+        previous: Optional[InvestigationOutputPages] = None,
+        on_page: Optional[Callable[[InvestigationOutputPage], None]] = None,
     ) -> InvestigationOutputPages:
-        import json
-
-        prompt = f"""
-        You are transforming existing report content into a structured nested wiki JSON format.
-
-        CONTEXT
-        - Investigation title: {investigation.title}
-
-        EXISTING REPORT CONTENT:
-        {report_content}
-
-        TASK
-        Transform the above report content into a JSON object with a "pages" key containing an array of pages.
-        - Analyze the existing content structure and organize it into logical pages and sub-pages
-        - Preserve all the information from the original content
-        - Convert the content into ProseMirror/Tiptap JSON format
-
-        Each page object must be:
-        {{
-        "title": string,                 // human title derived from the content
-        "slug": string,                  // lowercase-kebab; unique across the entire tree
-        "content": {{ ... }},              // ProseMirror/Tiptap JSON document
-        "children": [ ... ]              // array of child pages; order = nav order
-        }}
-
-        CONTENT (ProseMirror/Tiptap JSON)
-        - Root of each page must be: {{ "type": "doc", "content": [...] }}.
-        - Allowed block nodes: "heading", "paragraph", "bulletList", "orderedList", "listItem", "blockquote", "codeBlock", "horizontalRule", "hardBreak".
-        - Inline: "text" nodes with optional marks: "bold", "italic", "code", "link" (attrs: {{ "href": URL }}).
-        - Headings must include level 1..6 in attrs: {{ "level": n }}.
-        - For EVERY heading, set a stable id in attrs: {{ "id": "kebab-case-anchor" }}.
-        - Anchors must be lowercase-kebab and unique within the page.
-        - If an anchor would duplicate, append "-2", "-3", etc.
-        - Convert markdown or plain text formatting into proper ProseMirror JSON structure
-        - NO Markdown or HTML strings in the output; only PM/Tiptap JSON.
-
-        STRUCTURE
-        - Analyze the content to determine logical page boundaries (e.g., major sections become pages)
-        - The array order defines sibling order; children[] defines sub-pages.
-        - Each page should contain a meaningful portion of the original content
-        - Maintain the logical flow and hierarchy from the original report
-
-        SLUG RULES
-        - Generate slugs from the page titles: lowercase-kebab format
-        - slug regex: ^[a-z0-9]+(?:-[a-z0-9]+)*$
-        - Must be unique across the entire tree (not just per parent)
-        - Do NOT include numeric prefixes (e.g., "1.2-"). Numbers are added at render time.
-
-        ABSOLUTE OUTPUT RULES
-        - Output ONLY valid JSON with a "pages" key.
-        - Do NOT include any extra properties outside the schema.
-        - No commentary, explanations, or markdown code blocks.
-        - Start your response with {{ and end with }}
-        - Preserve ALL information from the original content - do not summarize or omit details
         """
+        Convert a Markdown report into wiki pages, one conversion per section
+
+        Every top-level page records the hash of the report section it came
+        from. Given the ``previous`` output for an earlier version of the
+        report, sections whose hash is unchanged keep their pages, slugs and
+        anchors, and only changed sections are sent to the model. Sections
+        converted to no pages are listed in ``empty_sections`` and reused the
+        same way; RepairError is raised if no section produced a page.
+
+        ``on_page`` is called from a worker thread with each newly converted
+        top-level page, with its final slug, as soon as it is validated; with
+        ``wiki_streaming`` that is while the model is still writing the rest
+        of the section. A section that is re-prompted emits its pages again.
+        """
+        configurable = Configuration.from_runnable_config(self.config)
+        sections = split_sections(report_content) or [report_content]
+        hashes = [section_hash(section) for section in sections]
+
+        reusable: Dict[str, List[InvestigationOutputPage]] = {}
+        for page in previous.pages if previous else []:
+            if page.source_hash:
+                reusable.setdefault(page.source_hash, []).append(page)
+        for digest in previous.empty_sections if previous else []:
+            reusable.setdefault(digest, [])
+
+        groups: List[Optional[List[InvestigationOutputPage]]] = [
+            reusable.pop(digest, None) for digest in hashes
+        ]
+        changed = [idx for idx, group in enumerate(groups) if group is None]
+
+        # reused pages keep their slugs, new pages give way on collisions as they arrive
+        taken: Set[str] = set()
+        for group in groups:
+            _collect_slugs(group or [], taken)
+        taken_lock = threading.Lock()
+        started = time.monotonic()
+        first_page = threading.Event()
+
+        def convert(idx: int) -> List[InvestigationOutputPage]:
+            emitted: List[InvestigationOutputPage] = []
+
+            def emit(page: InvestigationOutputPage):
+                page.source_hash = hashes[idx]
+                with taken_lock:
+                    _dedupe_slugs([page], taken)
+                emitted.append(page)
+                if not first_page.is_set():
+                    first_page.set()
+                    metrics.histogram("wiki.first_page").observe(time.monotonic() - started)
+                if on_page:
+                    on_page(page)
+
+            # re-prompt only when the output could not be repaired locally
+            for attempt in range(configurable.structured_output_retries + 1):
+                if self.cancel_token:
+                    self.cancel_token.raise_if_cancelled()
+                try:
+                    self._convert_section(investigation, sections[idx], idx + 1, len(sections), emit)
+                    break
+                except RepairError as e:
+                    # the retry emits the section's pages again, under the same slugs
+                    with taken_lock:
+                        released: Set[str] = set()
+                        _collect_slugs(emitted, released)
+                        taken.difference_update(released)
+                    emitted.clear()
+                    if attempt == configurable.structured_output_retries:
+                        raise
+                    metrics.incr("structured.reprompts")
+                    logger.warning(f"Re-prompting wiki conversion of section {idx + 1}: {e}")
+            return emitted
+
+        with ThreadPoolExecutor(max_workers=max(1, min(configurable.wiki_max_concurrency, len(changed) or 1))) as pool:
+            for idx, pages in zip(changed, pool.map(convert, changed)):
+                groups[idx] = pages
+
+        logger.info(f"Wiki conversion: reused {len(sections) - len(changed)} of {len(sections)} sections")
+        metrics.incr("wiki.sections.reused", len(sections) - len(changed))
+        metrics.incr("wiki.sections.converted", len(changed))
+        pages = [page for group in groups for page in group]
+        if not pages:
+            raise RepairError(f"No wiki pages in any of the report's {len(sections)} sections")
+        return InvestigationOutputPages(
+            pages=pages,
+            empty_sections=sorted({digest for digest, group in zip(hashes, groups) if not group}),
+        )
+
+    def _convert_section(
+        self,
+        investigation: InvestigationDto,
+        report_content: str,
+        number: int = 1,
+        total: int = 1,
+        emit: Optional[Callable[[InvestigationOutputPage], None]] = None,
+    ) -> InvestigationOutputPages:
+        scope = (
+            f"- The content below is section {number} of {total} of the report; create pages for this section only."
+            if total > 1 else "- The content below is the whole report."
+        )
+
+        prompt = wiki_transformation_instructions.format(
+            title=investigation.title,
+            scope=scope,
+            report_content=report_content,
+        )
 
         # Define the tool for structured output
         tool_config = {
@@ -251,27 +408,32 @@ class WikiService:
             "toolChoice": {"tool": {"name": "transform_report_to_wiki"}},
         }
 
-        # create configurable object
-        bedrock_config = Config(
-            read_timeout=900, connect_timeout=60, retries={"max_attempts": 3}
-        )
-
-        boto3_client = boto3.client(
-            "bedrock-runtime",
-            region_name="eu-west-2",
-            config=bedrock_config,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
-
         logger.info("Sending schema request to Bedrock")
 
-        response = boto3_client.converse(
-            modelId="anthropic.claude-3-7-sonnet-20250219-v1:0",
-            messages=[{"role": "user", "content": [{"text": prompt}]}],
+        # retried and hedged through the shared model manager policy
+        model_manager = ModelManager(self.config, self.cancel_token)
+        request = dict(
+            node="wiki",
+            read_timeout=900,
+            messages=[{"role": "user", "content": model_manager.converse_content(prompt)}],
             toolConfig=tool_config,
             inferenceConfig={"temperature": 0.0, "maxTokens": 50000},
         )
+        configurable = Configuration.from_runnable_config(self.config)
+        try:
+            if configurable.wiki_streaming and configurable.llm_cache_mode == llm_cache.OFF:
+                result = self._stream_section(model_manager, request, emit)
+            else:
+                result = self._converse_section(model_manager, request)
+                if emit:
+                    for page in result.pages:
+                        emit(page)
+        finally:
+            self.calls.extend(model_manager.calls)
+        return result
+
+    def _converse_section(self, model_manager: ModelManager, request: Dict[str, Any]) -> InvestigationOutputPages:
+        response = model_manager.converse(**request)
 
         output_message = response["output"]["message"]
 
@@ -282,13 +444,54 @@ class WikiService:
                 tool_use = content["toolUse"]
                 break
 
-        if not tool_use:
-            raise ValueError("No tool use found in Bedrock response")
+        if tool_use:
+            result_data = tool_use.get("input")
+        else:
+            # the model answered in text instead of calling the tool
+            result_data = "".join(content.get("text", "") for content in output_message.get("content", []))
 
-        # Parse and validate the result
-        result_data = tool_use.get("input", {})
+        # Parse and validate the result, repairing schema slips locally
+        return repair_structured(result_data, InvestigationOutputPages)
 
-        if not result_data or "pages" not in result_data:
-            raise ValueError(f"Invalid tool response - missing pages. Got: {result_data}")
+    def _stream_section(
+        self,
+        model_manager: ModelManager,
+        request: Dict[str, Any],
+        emit: Optional[Callable[[InvestigationOutputPage], None]],
+    ) -> InvestigationOutputPages:
+        """
+        Convert a section over a streamed response, validating each top-level
+        page as soon as its JSON closes
 
-        return InvestigationOutputPages(**result_data)
+        A page that cannot be repaired, or output cut off mid-page, closes the
+        stream at once instead of paying for the rest of it, and raises
+        RepairError so the section is re-prompted.
+        """
+        parser = JsonArrayStream("pages")
+        pages: List[InvestigationOutputPage] = []
+        # pages are validated one at a time, so slugs are kept unique across them here
+        taken: Set[str] = set()
+        stop_reason = None
+        with closing(model_manager.converse_stream(**request)) as events:
+            for event in events:
+                delta = event.get("contentBlockDelta", {}).get("delta", {})
+                fragment = delta.get("toolUse", {}).get("input") or delta.get("text")
+                for item in parser.feed(fragment) if fragment else []:
+                    page = repair_structured({"pages": [extract_json(item)]}, InvestigationOutputPages).pages[0]
+                    _dedupe_slugs([page], taken)
+                    pages.append(page)
+                    if emit:
+                        emit(page)
+                if "messageStop" in event:
+                    stop_reason = event["messageStop"].get("stopReason")
+
+        if not pages:
+            # not the expected shape, e.g. a single page object: repair the whole output
+            result = repair_structured(parser.text, InvestigationOutputPages)
+            if emit:
+                for page in result.pages:
+                    emit(page)
+            return result
+        if not parser.complete:
+            raise RepairError(f"Wiki output cut off after {len(pages)} pages (stop reason: {stop_reason})")
+        return InvestigationOutputPages(pages=pages)
@@ -1,9 +1,17 @@
+from dotenv import load_dotenv
+
+# before any project import: modules read their settings from the environment when imported
+load_dotenv()
+
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
-from services.process_research import ResearchRequest, ProcessResearchService
-from services.s3 import S3UploadService
+from services.process_research import ResearchRequest, ProcessResearchService, cancel_research, warm_up
+from services.batch import BatchResearchRequest, BatchResearchService
+from services.scheduler import AdmissionRejected
+from services.storage import get_storage_backend
 
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +26,17 @@ async def agent_invocation(payload, context):
     try: 
         logger.info(f"Received payload: {payload}")
 
+        if payload.get("batch"):
+            return await batch_invocation(payload)
+
+        if payload.get("cancel"):
+            # {"cancel": research_id} stops a job running in this session
+            cancelled = cancel_research(payload["cancel"])
+            return {
+                "statusCode": 202 if cancelled else 404,
+                "body": {"message": f"{'Cancelling' if cancelled else 'No running'} research: {payload['cancel']}"},
+            }
+
         required_fields = ["user_id", "research_id", "research_topic"]
 
         for field in required_fields:
@@ -27,12 +46,19 @@ async def agent_invocation(payload, context):
         research_request = ResearchRequest(
             user_id=payload.get("user_id"),
             research_id=payload.get("research_id"),
-            research_topic=payload.get("research_topic")
+            research_topic=payload.get("research_topic"),
+            preset=payload.get("preset"),
+            deadline_seconds=payload.get("deadline_seconds"),
+            profile=bool(payload.get("profile")),
         )
 
-        s3 = S3UploadService(RESEARCH_BUCKET, AWS_REGION)
+        storage = get_storage_backend(bucket_name=RESEARCH_BUCKET, region_name=AWS_REGION)
 
-        research_service = ProcessResearchService(research_request, s3)
+        research_service = ProcessResearchService(research_request, storage)
+        try:
+            research_service.submit()
+        except AdmissionRejected as e:
+            return {"statusCode": 429, "body": {"error": str(e)}}
         result = await research_service.process_research()
 
         if not result:
@@ -57,6 +83,32 @@ async def agent_invocation(payload, context):
             }
         }
 
+async def batch_invocation(payload):
+    """Handle {"batch": [{user_id, research_id, research_topic}, ...], "batch_id": optional}."""
+    batch_request = BatchResearchRequest(
+        requests=payload["batch"],
+        batch_id=payload.get("batch_id"),
+    )
+
+    storage = get_storage_backend(bucket_name=RESEARCH_BUCKET, region_name=AWS_REGION)
+
+    batch_service = BatchResearchService(batch_request, storage)
+    try:
+        batch_service.submit()
+    except AdmissionRejected as e:
+        return {"statusCode": 429, "body": {"error": str(e)}}
+    status = await batch_service.process_batch()
+
+    return {
+        "statusCode": 200,
+        "body": {
+            "message": f"Research completed for batch: {batch_service.batch_id}",
+            "batch": status,
+        }
+    }
+
 if __name__ == "__main__":
+    # compile the graph in the background so /ping answers while it loads
+    threading.Thread(target=warm_up, name="graph-warm-up", daemon=True).start()
     app.run()
 
@@ -1,20 +1,28 @@
-import os
 import asyncio
 import logging
 
-from services.s3 import S3UploadService
+from services.storage import get_storage_backend
 from services.process_research import (
     ResearchRequest, 
-    ProcessResearchService
+    ProcessResearchService,
+    cancel_research,
 )
+from services.batch import (
+    BatchResearchRequest,
+    BatchResearchService,
+    batch_status,
+)
+from services.jobs import DONE, FINISHED, job_registry
+from services.report_cache import report_cache
+from services.scheduler import AdmissionRejected, scheduler
 
 from fastapi import (
     APIRouter,
+    HTTPException,
+    Request,
+    Response,
 )
 
-RESEARCH_BUCKET = os.getenv("RESEARCH_BUCKET")
-AWS_REGION = os.getenv("AWS_REGION")
-
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -24,12 +32,88 @@ router = APIRouter()
 async def create_research(req_data: ResearchRequest): 
     logger.info("Received research request")
 
-    s3 = S3UploadService(RESEARCH_BUCKET, AWS_REGION)
-
-    research_service = ProcessResearchService(req_data, s3)
+    research_service = ProcessResearchService(req_data, get_storage_backend())
+    try:
+        research_service.submit()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
     asyncio.create_task(research_service.process_research())
 
     return {
         "message": f"Research started for investigation: {req_data.research_id}"
     }
+
+
+@router.post("/batch")
+async def create_research_batch(req_data: BatchResearchRequest):
+    logger.info(f"Received research batch with {len(req_data.requests)} requests")
+
+    batch_service = BatchResearchService(req_data, get_storage_backend())
+    try:
+        batch_service.submit()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    asyncio.create_task(batch_service.process_batch())
+
+    return {
+        "message": f"Research started for {len(req_data.requests)} investigations",
+        "batch_id": batch_service.batch_id,
+        "research_ids": [request.research_id for request in req_data.requests],
+    }
+
+
+@router.get("/batch/{batch_id}")
+async def get_research_batch(batch_id: str):
+    status = batch_status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    return status
+
+
+@router.get("/scheduler")
+async def get_scheduler_status():
+    return scheduler.status()
+
+
+@router.get("/{research_id}")
+async def get_research_status(research_id: str):
+    job = job_registry.get(research_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown research: {research_id}")
+    return job
+
+
+@router.delete("/{research_id}", status_code=202)
+async def cancel_research_job(research_id: str):
+    job = job_registry.get(research_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown research: {research_id}")
+    if job.state in FINISHED or not cancel_research(research_id):
+        raise HTTPException(status_code=409, detail=f"Research {research_id} is {job.state}")
+    return {"message": f"Cancelling research: {research_id}"}
+
+
+@router.get("/{research_id}/report")
+async def get_research_report(research_id: str, request: Request):
+    report = await report_cache.fetch(research_id, get_storage_backend())
+    if report is None:
+        job = job_registry.get(research_id)
+        if job is not None and job.state != DONE:
+            raise HTTPException(status_code=409, detail=f"Research {research_id} is {job.state}")
+        raise HTTPException(status_code=404, detail=f"No report for research: {research_id}")
+
+    headers = {
+        "ETag": report.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if report.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(report.gzipped, media_type=report.content_type, headers=headers)
+    return Response(report.body, media_type=report.content_type, headers=headers)
@@ -0,0 +1,154 @@
+"""
+Search client benchmark against a local stub Tavily server
+
+Compares the per-query overhead of a fresh ``TavilySearchResults`` per search
+(the previous web_research path, one new connection per request) with the
+shared keep-alive client in core.search, sequentially and with concurrent
+branches, and shows how many requests coalescing saves when concurrent jobs
+issue the same query, e.g.::
+
+    python benchmarks/search_client.py --queries 200 --concurrency 16
+"""
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.search import TavilyClient  # noqa: E402
+
+
+class StubTavilyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    requests = 0
+    connections = set()
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # like production servers; otherwise Nagle's algorithm delays keep-alive responses
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            StubTavilyHandler.requests += 1
+            StubTavilyHandler.connections.add(self.client_address)
+        time.sleep(self.delay)
+        body = json.dumps({
+            "query": payload["query"],
+            "results": [
+                {"url": f"https://example.com/{i}", "title": f"Result {i}", "content": "stub " * 200, "score": 0.9}
+                for i in range(payload.get("max_results", 5))
+            ],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(delay: float) -> ThreadingHTTPServer:
+    StubTavilyHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTavilyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def reset_counters():
+    StubTavilyHandler.requests = 0
+    StubTavilyHandler.connections = set()
+
+
+def old_search(base_url: str) -> Callable[[str], list]:
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    from langchain_community.utilities import tavily_search
+
+    tavily_search.TAVILY_API_URL = base_url
+
+    def search(query: str):
+        tool = TavilySearchResults(
+            max_results=2,
+            search_depth="advanced",
+            include_answer=True,
+            include_raw_content=False,
+            tavily_api_key="benchmark",
+        )
+        return tool.invoke({"query": query})
+    return search
+
+
+def shared_search(client: TavilyClient) -> Callable[[str], list]:
+    def search(query: str):
+        return client.search(query, api_key="benchmark", max_results=2, include_answer=True)
+    return search
+
+
+def measure(search: Callable[[str], list], queries: List[str], concurrency: int) -> List[float]:
+    def timed(query: str) -> float:
+        started = time.perf_counter()
+        search(query)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, queries))
+
+
+def report(label: str, latencies: List[float], delay: float):
+    overhead = [(latency - delay) * 1000 for latency in latencies]
+    print(
+        f"{label:>28}: overhead median {statistics.median(overhead):6.2f} ms, "
+        f"p95 {sorted(overhead)[int(len(overhead) * 0.95) - 1]:6.2f} ms, "
+        f"{StubTavilyHandler.requests} requests over {len(StubTavilyHandler.connections)} connections"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="stub server processing time")
+    args = parser.parse_args(argv)
+
+    delay = args.delay_ms / 1000
+    server = start_server(delay)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    queries = [f"query {i}" for i in range(args.queries)]
+
+    client = TavilyClient(base_url, max_connections=args.concurrency, max_keepalive_connections=args.concurrency,
+                          connect_timeout=5.0, coalesce=True)
+    try:
+        for concurrency in (1, args.concurrency):
+            for label, search in (("TavilySearchResults per query", old_search(base_url)),
+                                  ("shared client", shared_search(client))):
+                reset_counters()
+                report(f"{label} x{concurrency}", measure(search, queries, concurrency), delay)
+
+        # concurrent jobs asking the same queries at the same time
+        duplicated = [query for query in queries[: args.queries // 4] for _ in range(4)]
+        for coalesce in (False, True):
+            client.coalesce = coalesce
+            reset_counters()
+            report(f"same query x4, coalesce={coalesce}", measure(shared_search(client), duplicated, args.concurrency), delay)
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
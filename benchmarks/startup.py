@@ -0,0 +1,113 @@
+"""
+Startup benchmark: time from process start to the first healthy response
+
+Starts each entry point in a fresh process, polls its health endpoint and
+reports the time until it first answers 200, e.g.::
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --target main --profile-imports
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.importtime import format_report, profile_imports  # noqa: E402
+
+# entry point -> (command, health path, module imported at startup)
+TARGETS = {
+    "main": (
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "{port}"],
+        "/health",
+        "main",
+    ),
+    # BedrockAgentCoreApp always listens on 8080
+    "agentcore": ([sys.executable, "-m", "agentcore"], "/ping", "agentcore"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before becoming healthy")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} not healthy after {timeout}s")
+
+
+def measure(target: str, timeout: float) -> float:
+    """Seconds from spawning ``target`` to its first healthy response."""
+    command, path, _ = TARGETS[target]
+    port = free_port() if target == "main" else 8080
+    command = [part.format(port=port) for part in command]
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_healthy(f"http://127.0.0.1:{port}{path}", process, timeout)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--profile-imports", action="store_true", help="also print an import-time breakdown")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, List[float]] = {}
+    for target in args.target or sorted(TARGETS):
+        try:
+            results[target] = [measure(target, args.timeout) for _ in range(args.runs)]
+        except (RuntimeError, TimeoutError) as e:
+            print(f"{target}: failed: {e}")
+            continue
+        samples = results[target]
+        print(
+            f"{target}: time to first healthy response "
+            f"median {statistics.median(samples) * 1000:.0f} ms, "
+            f"min {min(samples) * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms "
+            f"over {len(samples)} runs"
+        )
+        if args.profile_imports:
+            module = TARGETS[target][2]
+            print(format_report(module, profile_imports(module), top=10))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+State memory benchmark: peak memory and checkpoint size per concurrent job
+
+Runs the research graph offline (stubbed model and Tavily responses of a
+fixed size) for several concurrent jobs with a checkpointer attached: with
+payloads inline in graph state, as blob references, and as blob references
+spilling to disk. Reports the tracemalloc peak and the bytes held by the
+checkpointer, e.g.::
+
+    python benchmarks/state_memory.py --jobs 8 --summary-kb 32
+"""
+import os
+import sys
+import shutil
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+
+from agent.configuration import Configuration  # noqa: E402
+from agent.graph import build_graph  # noqa: E402
+from agent.tools_and_schemas import Reflection, SearchQueryList  # noqa: E402
+from agent.utils import state_blob_store  # noqa: E402
+from core.model_manager import ModelManager  # noqa: E402
+from core.search import TavilyClient  # noqa: E402
+
+
+def install_stubs(queries: int, summary_bytes: int, source_bytes: int):
+    """Replace model and search calls with fixed-size offline responses."""
+    # distinct queries per call so jobs do not share payloads through content addressing
+    counter = itertools.count()
+
+    def invoke(self, prompt, node, schema=None, model_id=None, tier=None):
+        if schema is SearchQueryList:
+            return SearchQueryList(query=[f"query {next(counter)}" for _ in range(queries)], rationale="benchmark")
+        if schema is Reflection:
+            return Reflection(
+                is_sufficient=False,
+                knowledge_gap="benchmark",
+                follow_up_queries=[f"follow up {next(counter)}" for _ in range(queries)],
+            )
+        # unique per prompt, like real summaries
+        return AIMessage(content=(prompt[-64:] + " ") * (summary_bytes // 65 + 1))
+
+    def search(self, query, api_key, **kwargs):
+        return [
+            {
+                "url": f"https://example.com/{query.replace(' ', '-')}/{i}",
+                "title": f"Result {i}",
+                "content": (query + " ") * (source_bytes // (len(query) + 1) + 1),
+            }
+            for i in range(3)
+        ]
+
+    ModelManager.invoke = invoke
+    TavilyClient.search = search
+
+
+def checkpoint_bytes(saver: InMemorySaver) -> int:
+    """Bytes of serialized channel values and pending writes held by the saver."""
+    total = sum(len(value[1]) for value in saver.blobs.values())
+    for writes in saver.writes.values():
+        total += sum(len(write[2][1]) for write in writes.values())
+    return total
+
+
+def run_mode(name: str, jobs: int, configurable: Dict) -> Dict:
+    saver = InMemorySaver()
+    graph = build_graph(checkpointer=saver)
+    store = state_blob_store(Configuration.model_validate(configurable))
+
+    def job(idx: int):
+        config = {"configurable": {**configurable, "thread_id": f"{name}-{idx}", "run_id": f"{name}-{idx}"}}
+        graph.invoke({"messages": [f"Benchmark topic {idx}"]}, config)
+
+    tracemalloc.start()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(job, range(jobs)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "mode": name,
+        "peak_per_job_kb": peak / jobs / 1024,
+        "checkpoint_per_job_kb": checkpoint_bytes(saver) / jobs / 1024,
+        "blobs": store.stats(),
+    }
+    for idx in range(jobs):
+        store.release(f"{name}-{idx}")
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--loops", type=int, default=2)
+    parser.add_argument("--summary-kb", type=int, default=32)
+    parser.add_argument("--source-kb", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    install_stubs(args.queries, args.summary_kb * 1024, args.source_kb * 1024)
+    base = {"max_research_loops": args.loops, "number_of_initial_queries": args.queries}
+    spill_dir = tempfile.mkdtemp(prefix="blob-spill-")
+    try:
+        modes = [
+            ("inline", {**base, "blob_state": False}),
+            ("blobs", {**base, "blob_state": True}),
+            ("blobs+spill", {**base, "blob_state": True, "blob_memory_bytes": 256 * 1024, "blob_spill_dir": spill_dir}),
+        ]
+        for name, configurable in modes:
+            result = run_mode(name, args.jobs, configurable)
+            print(
+                f"{result['mode']:>12}: peak {result['peak_per_job_kb']:8.0f} KiB/job, "
+                f"checkpoints {result['checkpoint_per_job_kb']:8.0f} KiB/job, blob store {result['blobs']}"
+            )
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
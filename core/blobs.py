@@ -0,0 +1,146 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "blob:"
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+class BlobStore:
+    """
+    Content-addressed store for large graph state payloads
+
+    Payloads are kept JSON encoded in an in-memory LRU tier and, when a spill
+    directory is configured, written to disk once the tier exceeds
+    ``max_memory_bytes``. Graph state holds only the short ``blob:<sha256>``
+    references. Every blob is owned by the runs that stored it and is dropped
+    when the last of them is released.
+    """
+    def __init__(self, max_memory_bytes: int, spill_dir: Optional[str] = None):
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._spilled: Set[str] = set()
+        self._owners: Dict[str, Set[str]] = {}
+        self._runs: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.spill_dir / key[:2] / key
+
+    def put(self, value: Any, owner: str = "") -> str:
+        """Store ``value`` for the run ``owner`` and return its reference."""
+        data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._owners.setdefault(key, set()).add(owner)
+            self._runs.setdefault(owner, set()).add(key)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            elif key not in self._spilled:
+                self._memory[key] = data
+                self.memory_bytes += len(data)
+                self._spill()
+        metrics.incr("blobs.put")
+        return BLOB_PREFIX + key
+
+    def get(self, ref: str) -> Any:
+        key = ref[len(BLOB_PREFIX):]
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            elif key in self._spilled:
+                data = self._path(key).read_bytes()
+                metrics.incr("blobs.disk_read")
+            else:
+                raise KeyError(f"Unknown or released blob: {ref}")
+        return json.loads(data)
+
+    def _spill(self):
+        """Move least recently used blobs to disk until the memory tier fits."""
+        if self.spill_dir is None:
+            return
+        while self.memory_bytes > self.max_memory_bytes and self._memory:
+            key, data = self._memory.popitem(last=False)
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            self._spilled.add(key)
+            self.memory_bytes -= len(data)
+            metrics.incr("blobs.spilled")
+
+    def release(self, owner: str) -> int:
+        """Drop the run's hold on its blobs; returns the number of blobs evicted."""
+        evicted = 0
+        with self._lock:
+            for key in self._runs.pop(owner, set()):
+                owners = self._owners.get(key)
+                if owners is None:
+                    continue
+                owners.discard(owner)
+                if owners:
+                    continue
+                del self._owners[key]
+                data = self._memory.pop(key, None)
+                if data is not None:
+                    self.memory_bytes -= len(data)
+                elif key in self._spilled:
+                    self._spilled.discard(key)
+                    self._path(key).unlink(missing_ok=True)
+                evicted += 1
+        metrics.incr("blobs.evicted", evicted)
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "blobs": len(self._owners),
+                "memory_bytes": self.memory_bytes,
+                "spilled": len(self._spilled),
+                "runs": len(self._runs),
+            }
+
+
+class BlobList(Sequence):
+    """Read-only view over a state list that resolves blob references on access."""
+    def __init__(self, items: Iterable[Any], store: BlobStore):
+        self._items = list(items)
+        self._store = store
+
+    def _resolve(self, item: Any) -> Any:
+        return self._store.get(item) if is_blob_ref(item) else item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._resolve(item) for item in self._items[index]]
+        return self._resolve(self._items[index])
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_stores: Dict[Tuple, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(max_memory_bytes: int, spill_dir: Optional[str] = None) -> BlobStore:
+    """Return the process-wide blob store for these settings."""
+    key = (max_memory_bytes, spill_dir or None)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = BlobStore(max_memory_bytes, spill_dir or None)
+        return _stores[key]
@@ -0,0 +1,88 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+
+class JobCancelled(Exception):
+    """Raised in a run's model calls, searches and graph steps once the run is cancelled."""
+
+
+# Runs blocking provider calls so a cancelled run stops waiting for them at once;
+# an abandoned call finishes in the background and its result is dropped.
+_call_executor = ThreadPoolExecutor(max_workers=256, thread_name_prefix="cancellable-call")
+
+
+class CancelToken:
+    """
+    Cancellation signal shared by everything one run does
+
+    ``cancel`` is idempotent; the first reason (e.g. "cancelled" or "timeout")
+    is kept. Blocking work waits through ``run`` or ``wait`` so it returns as
+    soon as the token is cancelled.
+    """
+    def __init__(self):
+        self.future: Future = Future()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the run; returns False if it already was."""
+        try:
+            self.future.set_result(reason)
+        except Exception:
+            return False
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future.done()
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self.future.result() if self.future.done() else None
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"Run {self.reason}")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; returns True if cancelled meanwhile."""
+        done, _ = wait([self.future], timeout=timeout)
+        return bool(done)
+
+    def result(self, future: Future) -> Any:
+        """Result of ``future``, or JobCancelled as soon as the token is cancelled."""
+        wait([future, self.future], return_when=FIRST_COMPLETED)
+        if not future.done():
+            future.cancel()
+            self.raise_if_cancelled()
+        return future.result()
+
+    def run(self, fn: Callable[[], Any], executor: Optional[Executor] = None) -> Any:
+        """Call ``fn`` on ``executor`` and return its result, unless the run is cancelled first."""
+        self.raise_if_cancelled()
+        return self.result((executor or _call_executor).submit(fn))
+
+
+_tokens: Dict[str, CancelToken] = {}
+_tokens_lock = threading.Lock()
+
+
+def new_cancel_token(run_id: str) -> CancelToken:
+    """Give the run a fresh token, replacing one left by an earlier run with the same id."""
+    with _tokens_lock:
+        token = _tokens[run_id] = CancelToken()
+        return token
+
+
+def find_cancel_token(run_id: Optional[str]) -> Optional[CancelToken]:
+    """The run's token if it has one; graph runs started without a service have none."""
+    if not run_id:
+        return None
+    with _tokens_lock:
+        return _tokens.get(run_id)
+
+
+def release_cancel_token(run_id: str, token: CancelToken):
+    """Forget the run's token, unless a newer run with the same id has replaced it."""
+    with _tokens_lock:
+        if _tokens.get(run_id) is token:
+            del _tokens[run_id]
@@ -0,0 +1,77 @@
+"""
+Import-time profiling report
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+summarises the slowest imports, e.g.::
+
+    python -m core.importtime main agentcore --top 15
+"""
+import re
+import sys
+import argparse
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Parse the stderr of ``python -X importtime`` into one timing per module."""
+    timings = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return timings
+
+
+def profile_imports(module: str, python: Optional[str] = None) -> List[ImportTiming]:
+    """Import ``module`` in a fresh interpreter and return its import timings."""
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def format_report(module: str, timings: List[ImportTiming], top: int = 20) -> str:
+    """Total import time of ``module`` plus its slowest imports by cumulative and self time."""
+    total = next((t.cumulative_us for t in timings if t.module == module and t.depth == 0), None)
+    total = total if total is not None else sum(t.self_us for t in timings)
+
+    lines = [f"{module}: {total / 1000:.1f} ms to import, {len(timings)} modules"]
+    lines.append("  slowest by cumulative time:")
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"    {timing.cumulative_us / 1000:9.1f} ms  {timing.module}")
+    lines.append("  slowest by self time:")
+    for timing in sorted(timings, key=lambda t: t.self_us, reverse=True)[:top]:
+        lines.append(f"    {timing.self_us / 1000:9.1f} ms  {timing.module}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Report the slowest imports of the given modules")
+    parser.add_argument("modules", nargs="*", default=["main"])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        print(format_report(module, profile_imports(module), args.top))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# List prices in USD per million tokens at the time of writing, by model id
+# without its cross-region prefix; override or extend them with model_prices.
+# Cache reads and writes are priced as input where no price is given.
+DEFAULT_MODEL_PRICES: Dict[str, Dict[str, float]] = {
+    "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.25, "output": 1.25},
+    "anthropic.claude-3-5-haiku-20241022-v1:0": {"input": 0.8, "output": 4.0, "cache_read": 0.08, "cache_write": 1.0},
+    "anthropic.claude-3-5-sonnet-20240620-v1:0": {"input": 3.0, "output": 15.0},
+    "anthropic.claude-3-7-sonnet-20250219-v1:0": {"input": 3.0, "output": 15.0, "cache_read": 0.3, "cache_write": 3.75},
+    "gpt-5": {"input": 1.25, "output": 10.0, "cache_read": 0.125},
+}
+
+# eu., us., apac. or global. inference profile prefixes
+CROSS_REGION_PREFIX = re.compile(r"^(?:eu|us|apac|global)\.")
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+
+def model_price(model: str, prices: Optional[Dict[str, Dict[str, float]]] = None) -> Optional[Dict[str, float]]:
+    """Prices of ``model`` from ``prices``, then the defaults; None if it is unpriced."""
+    for table in (prices or {}, DEFAULT_MODEL_PRICES):
+        for key in (model, CROSS_REGION_PREFIX.sub("", model)):
+            if key in table:
+                return table[key]
+    return None
+
+
+def call_cost(call: Dict[str, Any], prices: Optional[Dict[str, Dict[str, float]]] = None) -> Optional[float]:
+    """
+    Cost in USD of one model call record, or None if its model is unpriced
+
+    ``input_tokens`` include the cached ones, which are priced at the cache
+    read and write rates instead.
+    """
+    price = model_price(call["model"], prices)
+    if price is None:
+        return None
+    cache_read = call.get("cache_read_tokens") or 0
+    cache_write = call.get("cache_write_tokens") or 0
+    uncached = max((call.get("input_tokens") or 0) - cache_read - cache_write, 0)
+    return (
+        uncached * price["input"]
+        + cache_read * price.get("cache_read", price["input"])
+        + cache_write * price.get("cache_write", price["input"])
+        + (call.get("output_tokens") or 0) * price["output"]
+    ) / 1_000_000
+
+
+def calls_cost(
+    calls: Iterable[Dict[str, Any]],
+    searches: int = 0,
+    prices: Optional[Dict[str, Dict[str, float]]] = None,
+    search_cost: float = 0.0,
+) -> float:
+    """Cost in USD of model calls and paid searches; unpriced models count as free."""
+    return sum(call_cost(call, prices) or 0.0 for call in calls) + searches * search_cost
+
+
+def _entry() -> Dict[str, Any]:
+    return {"calls": 0, **{name: 0 for name in TOKEN_FIELDS}, "search_calls": 0, "model_s": 0.0, "cost": 0.0}
+
+
+def build_ledger(
+    research_id: str,
+    model_calls: List[Dict[str, Any]],
+    search_calls: List[Dict[str, Any]],
+    node_seconds: Dict[str, float],
+    run_seconds: Optional[float] = None,
+    prices: Optional[Dict[str, Dict[str, float]]] = None,
+    search_cost: float = 0.0,
+    **extra: Any,
+) -> Dict[str, Any]:
+    """
+    Token, search and cost ledger of one run
+
+    Totals plus breakdowns per node and per model. ``node_seconds`` is the
+    wall time spent in each node, summed over parallel branches, and
+    ``run_seconds`` that of the whole run; ``model_s`` only counts model
+    calls. Only searches sent to the search API (``paid``) are costed;
+    knowledge-store hits and searches shared within a batch are listed but
+    free.
+    """
+    nodes: Dict[str, Dict[str, Any]] = {}
+    models: Dict[str, Dict[str, Any]] = {}
+    unpriced = set()
+    totals = _entry()
+
+    for call in model_calls:
+        cost = call_cost(call, prices)
+        if cost is None:
+            unpriced.add(call["model"])
+        for entry in (totals, nodes.setdefault(call["node"], _entry()), models.setdefault(call["model"], _entry())):
+            entry["calls"] += 1
+            for name in TOKEN_FIELDS:
+                entry[name] += call.get(name) or 0
+            entry["model_s"] += call.get("latency_s") or 0.0
+            entry["cost"] += cost or 0.0
+
+    for search in search_calls:
+        cost = search_cost if search.get("paid") else 0.0
+        for entry in (totals, nodes.setdefault(search["node"], _entry())):
+            entry["search_calls"] += 1
+            entry["cost"] += cost
+
+    for node, seconds in node_seconds.items():
+        nodes.setdefault(node, _entry())["wall_s"] = round(seconds, 3)
+    for entry in [totals, *nodes.values(), *models.values()]:
+        entry["model_s"] = round(entry["model_s"], 3)
+        entry["cost"] = round(entry["cost"], 6)
+    totals["wall_s"] = round(run_seconds, 3) if run_seconds is not None else None
+
+    return {
+        "research_id": research_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "currency": "USD",
+        **extra,
+        "totals": totals,
+        "nodes": nodes,
+        "models": models,
+        "unpriced_models": sorted(unpriced),
+    }
@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+OFF = "off"
+AUTO = "auto"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay mode when a call has no recorded response."""
+
+
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        return json.dumps(
+            [
+                {"type": getattr(m, "type", None), "content": getattr(m, "content", m)}
+                for m in prompt
+            ],
+            sort_keys=True,
+            default=str,
+        )
+    return json.dumps(prompt, sort_keys=True, default=str)
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    temperature: Optional[float],
+    schema: Optional[type[BaseModel]],
+    prompt: Any,
+) -> str:
+    """Content address of a model call."""
+    payload = {
+        "provider": provider,
+        "model": model,
+        "temperature": temperature,
+        "schema": schema.model_json_schema() if schema else None,
+        "prompt": hashlib.sha256(_prompt_text(prompt).encode("utf-8")).hexdigest(),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMCache:
+    """Two-tier response cache: in-memory LRU in front of a size-bounded disk tier."""
+
+    def __init__(self, directory: Optional[str], max_entries: int, max_bytes: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_bytes = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, files in os.walk(self.directory)
+                for name in files
+            )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, value: Dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                metrics.incr("llm_cache.hit.memory")
+                return self._memory[key]
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, "r") as file:
+                    value = json.load(file)
+                # refresh mtime so disk eviction is least-recently-used
+                os.utime(path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value)
+                metrics.incr("llm_cache.hit.disk")
+                return value
+
+        metrics.incr("llm_cache.miss")
+        return None
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._remember(key, value)
+
+        if not self.directory:
+            return
+        path = self._path(key)
+        data = json.dumps(value, default=str).encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least-recently-used files until the disk tier is back under 90% of its budget."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            metrics.incr("llm_cache.evicted")
+        self._disk_bytes = total
+
+
+_caches: Dict[tuple, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(directory: Optional[str], max_entries: int, max_bytes: int) -> LLMCache:
+    """Return the process-wide cache for this directory (``None`` for memory only)."""
+    key = (directory or None, max_entries, max_bytes)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = LLMCache(directory or None, max_entries, max_bytes)
+        return _caches[key]
@@ -1,70 +1,409 @@
 import os
-import boto3
-from botocore.config import Config
+import time
+import logging
+import threading
 
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple
 from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
 
 from agent.configuration import Configuration
+from agent.repair import RepairError, raw_output_data, repair_structured
+from agent.utils import estimate_tokens
+from core import llm_cache
+from core.cancellation import CancelToken, find_cancel_token
+from core.metrics import metrics
+from core.prompt_cache import CacheablePrompt, cache_point_content, cache_point_messages, cached_tokens
+from core.regions import get_region_router, inference_profile_id
+from core.resilience import RetryPolicy, call_with_retries
+from core.routing import RouteDecision, route_model
+from core.shared import get_batch_scope
 
-from langchain_aws import ChatBedrockConverse
-from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from langchain_core.messages import AIMessage
+
+# provider SDKs are slow to import, so they are only loaded once a provider is used
+if TYPE_CHECKING:
+    from langchain_aws import ChatBedrockConverse
+    from langchain_openai import AzureChatOpenAI, ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+BEDROCK = "bedrock"
+
+# boto3 clients are thread-safe and expensive to build, so they are shared per region
+_bedrock_clients: Dict[Tuple, Any] = {}
+_bedrock_clients_lock = threading.Lock()
 
 
 class ModelManager:
-    def __init__(self, config: Optional[RunnableConfig] = None):
+    def __init__(self, config: Optional[RunnableConfig] = None, cancel_token: Optional[CancelToken] = None):
         self.config = Configuration.from_runnable_config(config)
-
-    def configure_boto_client(self, model_id):
-        bedrock_config = Config(
-            read_timeout=300,
-            connect_timeout=60,
-            retries={'max_attempts': 3}
+        self.retry_policy = RetryPolicy(
+            max_attempts=self.config.max_retries,
+            base_delay=self.config.retry_base_delay,
+            max_delay=self.config.retry_max_delay,
         )
+        # one record per model call made through this manager, returned by nodes as state
+        self.calls: list[dict] = []
+        # set while the run is managed by ProcessResearchService, see core.cancellation;
+        # a stage that can be stopped on its own passes its own token
+        self.cancel_token = cancel_token or find_cancel_token(self.config.run_id)
 
-        return boto3.client(
-            'bedrock-runtime',
-            region_name=self.config.aws_region,
-            config=bedrock_config,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
+    def configure_boto_client(self, model_id=None, read_timeout: int = 300, region: Optional[str] = None):
+        region = region or self.config.bedrock_regions[0]
+        endpoint_url = self.config.bedrock_endpoint_url
+        if endpoint_url:
+            endpoint_url = endpoint_url.format(region=region)
 
-    def configure_bedrock_client(self, model_id) -> ChatBedrockConverse:
-        bedrock_config = Config(
-            read_timeout=300,
-            connect_timeout=60,
-            retries={
-                'max_attempts': 3,
-            }
-        )
+        key = (region, read_timeout, endpoint_url)
+        with _bedrock_clients_lock:
+            if key not in _bedrock_clients:
+                import boto3
+                from botocore.config import Config
 
-        bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=self.config.aws_region,
-            config=bedrock_config
-        )
+                # retries are handled by core.resilience so they can be classified and hedged;
+                # botocore's max_attempts counts retries, total_max_attempts the attempts
+                bedrock_config = Config(
+                    read_timeout=read_timeout,
+                    connect_timeout=60,
+                    retries={'total_max_attempts': 1, 'mode': 'standard'}
+                )
+
+                _bedrock_clients[key] = boto3.client(
+                    'bedrock-runtime',
+                    region_name=region,
+                    endpoint_url=endpoint_url,
+                    config=bedrock_config,
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                )
+            return _bedrock_clients[key]
+
+    def configure_bedrock_client(self, model_id, region: Optional[str] = None) -> "ChatBedrockConverse":
+        from langchain_aws import ChatBedrockConverse
+
+        region = region or self.config.bedrock_regions[0]
 
         return ChatBedrockConverse(
-            model_id=model_id,
-            client=bedrock_client,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            region_name=self.config.aws_region,
+            model_id=inference_profile_id(model_id, region, self.config.cross_region_inference),
+            client=self.configure_boto_client(model_id, region=region),
+            region_name=region,
             temperature=self.config.temperature,
         )
 
-    def configure_azure_client(self, deployment_name) -> AzureChatOpenAI:
+    def configure_azure_client(self, deployment_name) -> "AzureChatOpenAI":
+        from langchain_openai import AzureChatOpenAI
+
         return AzureChatOpenAI(
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
             openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
             openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             deployment_name=deployment_name,
         )
-    
-    def configure_openai_client(self) -> ChatOpenAI:
+
+    def configure_openai_client(self, model: Optional[str] = None, prompt_cache_key: Optional[str] = None) -> "ChatOpenAI":
+        from langchain_openai import ChatOpenAI
+
         return ChatOpenAI(
-            model=self.config.openai_native_model,
+            model=model or self.config.openai_native_model,
             openai_api_key=os.getenv("OPENAI_API_KEY"),
             temperature=self.config.temperature,
-        )
\ No newline at end of file
+            # routes calls sharing a prompt prefix to the same cache
+            model_kwargs={"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {},
+        )
+
+    def get_chat_model(self, model_id: str, region: Optional[str] = None, prompt_cache_key: Optional[str] = None):
+        """Return the chat model for the configured provider."""
+        if self.config.llm_provider == "bedrock":
+            return self.configure_bedrock_client(model_id=model_id, region=region)
+        if self.config.llm_provider == "azure":
+            return self.configure_azure_client(deployment_name=model_id)
+        if self.config.llm_provider == "openai":
+            return self.configure_openai_client(model=model_id, prompt_cache_key=prompt_cache_key)
+        raise ValueError(f"Unsupported LLM provider: {self.config.llm_provider}")
+
+    def _cache_prefix(self, prompt: Any) -> bool:
+        """Whether the prompt's static prefix is long enough to be cached by the provider."""
+        return (
+            self.config.prompt_caching
+            and isinstance(prompt, CacheablePrompt)
+            and estimate_tokens(prompt.static) >= self.config.prompt_cache_min_tokens
+        )
+
+    def converse_content(self, prompt: Any) -> list:
+        """Converse API content blocks for ``prompt``, with a cache point after its static prefix."""
+        if self._cache_prefix(prompt):
+            return cache_point_content(prompt)
+        return [{"text": str(prompt)}]
+
+    def region_router(self):
+        """Process-wide router over the configured Bedrock regions."""
+        return get_region_router(
+            self.config.bedrock_regions,
+            self.config.region_failure_threshold,
+            self.config.region_cooldown_seconds,
+        )
+
+    def _hedge_delay(self, model_id: str) -> Optional[float]:
+        if not self.config.hedge_requests:
+            return None
+        histogram = metrics.histogram(f"llm.latency.{model_id}")
+        delay = self.config.hedge_default_delay
+        if histogram.count >= self.config.hedge_min_samples:
+            delay = histogram.quantile(self.config.hedge_quantile) or delay
+        return max(self.config.hedge_min_delay, delay)
+
+    def _call(self, fn, model_id: str, provider: Optional[str] = None, stream: bool = False) -> Any:
+        """
+        Run ``fn(region)`` with retries, hedging and, for Bedrock, region failover
+
+        Streams are opened without hedging, as the losing stream would keep
+        generating, and their time to first byte goes to its own histogram so
+        it does not shorten the hedge delay of whole calls to the model.
+        """
+        if (provider or self.config.llm_provider) == BEDROCK:
+            router = self.region_router()
+            target = fn
+        else:
+            router = None
+            target = lambda: fn(None)
+
+        return call_with_retries(
+            target,
+            policy=self.retry_policy,
+            label=model_id,
+            histogram=metrics.histogram(f"llm.{'stream_open' if stream else 'latency'}.{model_id}"),
+            hedge_delay=None if stream else lambda: self._hedge_delay(model_id),
+            router=router,
+            cancel_token=self.cancel_token,
+        )
+
+    def route(
+        self,
+        node: str,
+        override: Optional[str] = None,
+        tier: Optional[str] = None,
+        provider: Optional[str] = None,
+    ) -> RouteDecision:
+        """Resolve the model for ``node`` and log the decision."""
+        decision = route_model(self.config, node, override, tier, provider)
+        logger.info(
+            f"Routing {node} to {decision.model} (tier={decision.tier}, source={decision.source})"
+        )
+        return decision
+
+    def _record(self, decision: RouteDecision, started: float, usage: Optional[dict], cache_hit: bool = False):
+        latency = time.monotonic() - started
+        if not cache_hit:
+            metrics.histogram(f"llm.tier.{decision.tier}").observe(latency)
+            # per node and tier, for the deadline planner's predictions
+            metrics.histogram(f"llm.node.{decision.node}.{decision.tier}").observe(latency)
+        metrics.incr(f"llm.calls.{decision.tier}")
+        usage = usage or {}
+        prompt_cache = cached_tokens(usage)
+        for name, tokens in prompt_cache.items():
+            if tokens:
+                metrics.incr(f"llm.{name}", tokens)
+        self.calls.append({
+            **decision.to_dict(),
+            "latency_s": round(latency, 3),
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            **prompt_cache,
+            "cache_hit": cache_hit,
+        })
+
+    def _response_cache(self, node: str, temperature: Optional[float]) -> Optional[llm_cache.LLMCache]:
+        """Return the response cache if this call should use it."""
+        mode = self.config.llm_cache_mode
+        if mode == llm_cache.OFF:
+            return None
+        if self.config.llm_cache_nodes and node not in self.config.llm_cache_nodes:
+            return None
+        if mode == llm_cache.AUTO and temperature != 0:
+            return None
+        return llm_cache.get_llm_cache(
+            self.config.llm_cache_dir,
+            self.config.llm_cache_max_entries,
+            self.config.llm_cache_max_bytes,
+        )
+
+    def _cached(self, cache, key: str, decision: RouteDecision) -> Optional[dict]:
+        cached = cache.get(key) if cache else None
+        if cached is None and cache and self.config.llm_cache_mode == llm_cache.REPLAY:
+            raise llm_cache.LLMCacheMiss(
+                f"No recorded response for {decision.node} ({decision.model}) in replay mode"
+            )
+        return cached
+
+    def invoke(
+        self,
+        prompt: Any,
+        node: str,
+        schema: Optional[type[BaseModel]] = None,
+        model_id: Optional[str] = None,
+        tier: Optional[str] = None,
+    ) -> Any:
+        """Invoke the model routed for ``node`` with caching, retries, optional hedging and region failover.
+
+        Args:
+            prompt: Prompt string or messages to send to the model
+            node: Graph node making the call; selects the model tier
+            schema: Optional Pydantic schema for structured output
+            model_id: Optional model id overriding the routing configuration
+            tier: Optional tier overriding the configured model, e.g. from the deadline planner
+
+        Returns:
+            The model's message, or an instance of ``schema`` when one is given
+        """
+        decision = self.route(node, model_id, tier)
+        started = time.monotonic()
+
+        cache = self._response_cache(node, self.config.temperature)
+        key = llm_cache.cache_key(
+            self.config.llm_provider, decision.model, self.config.temperature, schema, prompt
+        ) if cache or self.config.batch_id else None
+        cached = self._cached(cache, key, decision)
+        if cached is not None:
+            self._record(decision, started, None, cache_hit=True)
+            if schema:
+                return schema.model_validate(cached["data"])
+            return AIMessage(content=cached["content"])
+
+        def compute():
+            return self._invoke_model(decision, prompt, schema)
+
+        if self.config.batch_id:
+            # identical calls from jobs of the same batch run once
+            (result, usage), shared = get_batch_scope(self.config.batch_id).model_calls.do(key, compute)
+        else:
+            (result, usage), shared = compute(), False
+        self._record(decision, started, None if shared else usage, cache_hit=shared)
+
+        if cache and not shared:
+            if schema:
+                cache.put(key, {"data": result.model_dump()})
+            else:
+                cache.put(key, {"content": result.content})
+        return result
+
+    def _invoke_model(self, decision: RouteDecision, prompt: Any, schema: Optional[type[BaseModel]]):
+        """Call the routed model and return ``(result, usage)``."""
+        prompt_cache_key = None
+        if self._cache_prefix(prompt):
+            # Bedrock caches up to an explicit cache point; OpenAI and Azure cache
+            # the longest shared prefix on their own, which the static-first layout provides
+            if self.config.llm_provider == "bedrock":
+                prompt = cache_point_messages(prompt)
+            elif self.config.llm_provider == "openai":
+                prompt_cache_key = prompt.cache_key
+
+        def call(region):
+            llm = self.get_chat_model(decision.model, region=region, prompt_cache_key=prompt_cache_key)
+            if not schema:
+                return llm.invoke(prompt), None
+            # include_raw keeps the message so its token usage can be recorded
+            output = llm.with_structured_output(schema, include_raw=True).invoke(prompt)
+            if output["parsing_error"] is None and output["parsed"] is not None:
+                metrics.incr(f"structured.{schema.__name__}.valid")
+                return output["parsed"], output["raw"]
+            # fix malformed output locally before paying for another model call
+            return repair_structured(raw_output_data(output["raw"]), schema), output["raw"]
+
+        for attempt in range(self.config.structured_output_retries + 1):
+            try:
+                result, raw = self._call(call, decision.model)
+                break
+            except RepairError as e:
+                if attempt == self.config.structured_output_retries:
+                    raise
+                metrics.incr("structured.reprompts")
+                logger.warning(f"Re-prompting {decision.model}: {e}")
+        message = raw if schema else result
+        return result, getattr(message, "usage_metadata", None)
+
+    def converse(self, node: str, read_timeout: int = 300, model_id: Optional[str] = None, **kwargs) -> dict:
+        """
+        Call the raw Bedrock Converse API with the same routing, caching, retry, hedging and failover policy
+
+        The Converse API only exists on Bedrock, so the call goes to the
+        node's Bedrock model through the region router whatever ``llm_provider`` is.
+        """
+        decision = self.route(node, model_id, provider=BEDROCK)
+        started = time.monotonic()
+
+        temperature = kwargs.get("inferenceConfig", {}).get("temperature")
+        cache = self._response_cache(node, temperature)
+        key = llm_cache.cache_key(
+            "bedrock-converse", decision.model, temperature, None, kwargs
+        ) if cache else None
+        cached = self._cached(cache, key, decision)
+        if cached is not None:
+            self._record(decision, started, None, cache_hit=True)
+            return cached["data"]
+
+        def call(region):
+            client = self.configure_boto_client(decision.model, read_timeout=read_timeout, region=region)
+            return client.converse(
+                modelId=inference_profile_id(decision.model, region, self.config.cross_region_inference),
+                **kwargs,
+            )
+
+        response = self._call(call, decision.model, BEDROCK)
+        usage = response.get("usage", {})
+        self._record(decision, started, _converse_usage(usage))
+
+        if cache:
+            cache.put(key, {"data": {"output": response["output"], "usage": usage}})
+        return response
+
+    def converse_stream(
+        self, node: str, read_timeout: int = 300, model_id: Optional[str] = None, **kwargs
+    ) -> Iterator[dict]:
+        """
+        Call the Bedrock ConverseStream API and yield its events as they arrive
+
+        Opening the stream goes through the same retry and failover policy as
+        ``converse``, without hedging; a failure mid-stream is raised to the caller,
+        which has usually consumed part of the output already. Streams bypass
+        the response cache. The call is recorded, with its usage from the
+        final metadata event, once the stream ends or the caller closes it.
+        Like ``converse`` it always goes to Bedrock.
+        """
+        decision = self.route(node, model_id, provider=BEDROCK)
+        started = time.monotonic()
+
+        def call(region):
+            client = self.configure_boto_client(decision.model, read_timeout=read_timeout, region=region)
+            return client.converse_stream(
+                modelId=inference_profile_id(decision.model, region, self.config.cross_region_inference),
+                **kwargs,
+            )
+
+        stream = self._call(call, decision.model, BEDROCK, stream=True)["stream"]
+        usage: dict = {}
+        first_event = True
+        try:
+            for event in stream:
+                if first_event:
+                    metrics.histogram(f"llm.first_event.{decision.model}").observe(time.monotonic() - started)
+                    first_event = False
+                if self.cancel_token:
+                    self.cancel_token.raise_if_cancelled()
+                if "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+                yield event
+        finally:
+            stream.close()
+            self._record(decision, started, _converse_usage(usage))
+
+
+def _converse_usage(usage: dict) -> dict:
+    """Converse API usage in the shape of LangChain's usage metadata."""
+    cache_read, cache_write = usage.get("cacheReadInputTokens", 0), usage.get("cacheWriteInputTokens", 0)
+    return {
+        # like LangChain's usage metadata, input tokens include the cached ones
+        "input_tokens": usage.get("inputTokens", 0) + cache_read + cache_write,
+        "output_tokens": usage.get("outputTokens", 0),
+        "input_token_details": {"cache_read": cache_read, "cache_creation": cache_write},
+    }
@@ -0,0 +1,264 @@
+"""
+Per-job profiling
+
+``JobProfiler`` captures, while one research job runs:
+
+- a sampled stack profile of every thread in the process, in the folded
+  format read by flamegraph.pl and speedscope: ``cpu.folded`` holds the
+  samples of threads that used CPU since the previous sample, ``wall.folded``
+  all samples, including threads waiting on the network or a lock
+- the top allocations made during the job, from tracemalloc snapshots
+- a Chrome trace-event timeline (chrome://tracing, Perfetto) of the job's
+  phases and graph nodes, with concurrently running nodes such as the
+  web_research fan-out on separate lanes
+
+The sampler sees the whole process, so jobs running alongside the profiled
+one show up in the stack profiles too. Nothing is started unless a job asks
+for a profile.
+"""
+import re
+import sys
+import json
+import time
+import heapq
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# worker threads are numbered per pool, e.g. "cancellable-call_12"; samples are grouped per pool
+THREAD_NUMBER = re.compile(r"[_-]\d+$")
+
+# tracemalloc is process-wide; it runs while any job that asked for it is profiled
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename.rsplit("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _thread_cpu_clock(ident: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        # not available on this platform, or the thread has exited
+        return None
+
+
+class StackSampler:
+    """Samples the stacks of all other threads every ``interval`` seconds on a background thread."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu_times: Dict[int, float] = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                thread = THREAD_NUMBER.sub("", names.get(ident, "thread"))
+                key = ";".join([thread] + stack[::-1])
+                self.wall[key] += 1
+                if self._used_cpu(ident):
+                    self.cpu[key] += 1
+            self.samples += 1
+
+    def _used_cpu(self, ident: int) -> bool:
+        clock = _thread_cpu_clock(ident)
+        if clock is None:
+            return False
+        try:
+            cpu_time = time.clock_gettime(clock)
+        except OSError:
+            return False
+        previous = self._cpu_times.get(ident)
+        self._cpu_times[ident] = cpu_time
+        # a thread on CPU for at least a tenth of the interval counts as running
+        return previous is not None and cpu_time - previous >= self.interval / 10
+
+    @staticmethod
+    def folded(counts: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class AllocationTracker:
+    """Top allocations between ``start`` and ``stop``, by source line."""
+
+    def __init__(self, frames: int = 1, top: int = 25):
+        self.frames = frames
+        self.top = top
+        self._started = False
+        self._before: Optional[tracemalloc.Snapshot] = None
+        self.report: Dict[str, Any] = {}
+
+    def start(self):
+        global _tracemalloc_users
+        with _tracemalloc_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            _tracemalloc_users += 1
+        self._started = True
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self):
+        global _tracemalloc_users
+        if not self._started:
+            return
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        self._started = False
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = after.filter_traces(filters).compare_to(self._before.filter_traces(filters), "lineno")
+        self.report = {
+            "traced_bytes": current,
+            # peak since tracing started, which may predate this job if another one was traced
+            "peak_traced_bytes": peak,
+            "top_allocations": [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in diff[:self.top]
+            ],
+        }
+
+
+class TraceRecorder:
+    """
+    Chrome trace-event timeline of one job
+
+    Lane 0 holds the job's phases. Each graph node gets the lowest lane not
+    in use while it runs, so parallel branches sit side by side.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._open: Dict[str, Tuple[str, float, int]] = {}
+        self._free_lanes: List[int] = []
+        self._lanes = 0
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def begin(self, key: str, name: str):
+        """Start a node span; ``key`` identifies this run of the node, e.g. its task id."""
+        with self._lock:
+            if self._free_lanes:
+                lane = heapq.heappop(self._free_lanes)
+            else:
+                self._lanes += 1
+                lane = self._lanes
+            self._open[key] = (name, self._now_us(), lane)
+
+    def end(self, key: str):
+        with self._lock:
+            opened = self._open.pop(key, None)
+            if opened is None:
+                return
+            name, started, lane = opened
+            self._add(name, "node", started, self._now_us() - started, lane)
+            heapq.heappush(self._free_lanes, lane)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = self._now_us()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._add(name, "phase", started, self._now_us() - started, 0)
+
+    def _add(self, name: str, category: str, started: float, duration: float, lane: int):
+        self._events.append({
+            "name": name, "cat": category, "ph": "X", "pid": 1, "tid": lane,
+            "ts": round(started, 1), "dur": round(duration, 1),
+        })
+
+    def to_json(self) -> str:
+        with self._lock:
+            # nodes still running when the job ended, e.g. on cancellation
+            now = self._now_us()
+            events = list(self._events) + [
+                {"name": name, "cat": "node", "ph": "X", "pid": 1, "tid": lane,
+                 "ts": round(started, 1), "dur": round(now - started, 1), "args": {"unfinished": True}}
+                for name, started, lane in self._open.values()
+            ]
+            lanes = self._lanes
+        metadata = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "job"}}] + [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"graph lane {lane}"}}
+            for lane in range(1, lanes + 1)
+        ]
+        return json.dumps({"traceEvents": metadata + events, "displayTimeUnit": "ms"})
+
+
+class JobProfiler:
+    """Stack samples, allocations and a timeline of one job, see the module docstring."""
+
+    def __init__(self, sample_interval: float = 0.01, traceback_frames: int = 1, top_allocations: int = 25):
+        self.sampler = StackSampler(sample_interval)
+        self.allocations = AllocationTracker(traceback_frames, top_allocations)
+        self.trace = TraceRecorder()
+        self._started_at = time.perf_counter()
+        self._elapsed: Optional[float] = None
+
+    def start(self):
+        self.allocations.start()
+        self.sampler.start()
+
+    def stop(self):
+        """Stop capturing; safe to call more than once."""
+        if self._elapsed is not None:
+            return
+        self._elapsed = time.perf_counter() - self._started_at
+        self.sampler.stop()
+        self.allocations.stop()
+
+    def files(self) -> List[Tuple[str, str, str]]:
+        """The captured profile as ``(name, content, content_type)``; stops capturing first."""
+        self.stop()
+        memory = {
+            "elapsed_s": round(self._elapsed, 3),
+            "samples": self.sampler.samples,
+            "sample_interval_s": self.sampler.interval,
+            **self.allocations.report,
+        }
+        return [
+            ("cpu.folded", StackSampler.folded(self.sampler.cpu), "text/plain"),
+            ("wall.folded", StackSampler.folded(self.sampler.wall), "text/plain"),
+            ("memory.json", json.dumps(memory, indent=2), "application/json"),
+            ("trace.json", self.trace.to_json(), "application/json"),
+        ]
@@ -0,0 +1,67 @@
+import hashlib
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from langchain_core.messages import HumanMessage
+
+# Converse content block marking the end of the cacheable prefix
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+class CacheablePrompt(str):
+    """
+    Prompt text made of a static prefix, identical across calls, and a
+    per-call suffix
+
+    Behaves as the full prompt string everywhere; ModelManager uses the split
+    to place a provider cache point after the prefix.
+    """
+    static: str
+    variable: str
+
+    def __new__(cls, static: str, variable: str):
+        prompt = super().__new__(cls, static + variable)
+        prompt.static = static
+        prompt.variable = variable
+        return prompt
+
+    @property
+    def cache_key(self) -> str:
+        """Stable identifier of the static prefix."""
+        return hashlib.sha256(self.static.encode("utf-8")).hexdigest()[:32]
+
+
+class PromptTemplate(NamedTuple):
+    """
+    Prompt template split into static instructions and a variable suffix
+
+    Only ``variable`` holds placeholders, so ``static`` is written with
+    literal braces.
+    """
+    static: str
+    variable: str
+
+    def format(self, **values: Any) -> CacheablePrompt:
+        return CacheablePrompt(self.static, self.variable.format(**values))
+
+
+def cache_point_messages(prompt: CacheablePrompt) -> List[HumanMessage]:
+    """The prompt as one LangChain message with a Bedrock cache point after the static prefix."""
+    return [HumanMessage(content=[
+        {"type": "text", "text": prompt.static},
+        CACHE_POINT,
+        {"type": "text", "text": prompt.variable},
+    ])]
+
+
+def cache_point_content(prompt: CacheablePrompt) -> List[Dict[str, Any]]:
+    """Converse API content blocks of the prompt with a cache point after the static prefix."""
+    return [{"text": prompt.static}, CACHE_POINT, {"text": prompt.variable}]
+
+
+def cached_tokens(usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Cache read and write token counts from a call's LangChain usage metadata."""
+    details = (usage or {}).get("input_token_details") or {}
+    return {
+        "cache_read_tokens": details.get("cache_read") or 0,
+        "cache_write_tokens": details.get("cache_creation") or 0,
+    }
@@ -0,0 +1,163 @@
+import time
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core.resilience import FATAL, THROTTLED
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Geography prefixes of Bedrock cross-region inference profiles
+_GEO_PREFIXES = {"eu": "eu", "us": "us", "ca": "us", "ap": "apac"}
+_PROFILE_PREFIXES = ("eu.", "us.", "apac.")
+
+
+def inference_profile_id(model_id: str, region: str, cross_region: bool = False) -> str:
+    """Return the model id to use in ``region``.
+
+    Geography-prefixed inference profile ids (``eu.anthropic...``) are rewritten
+    to the geography of the target region. Bare model ids are only prefixed
+    when ``cross_region`` is enabled.
+    """
+    geo = _GEO_PREFIXES.get(region.split("-")[0])
+    if geo is None:
+        return model_id
+    for prefix in _PROFILE_PREFIXES:
+        if model_id.startswith(prefix):
+            return f"{geo}.{model_id[len(prefix):]}"
+    if cross_region and not model_id.startswith("global."):
+        return f"{geo}.{model_id}"
+    return model_id
+
+
+class RegionHealth:
+    """Latency/error EWMA and circuit breaker state for one region."""
+
+    def __init__(self, region: str, failure_threshold: int, cooldown: float, alpha: float = 0.2):
+        self.region = region
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        # start of the half-open circuit's probe request, while it is in flight
+        self.probe_started: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            # let a probe request through; its outcome closes or re-opens the circuit
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # one probe at a time; one that never reported back is given up after a cool-down
+            return self.probe_started is None or now - self.probe_started >= self.cooldown
+        return self.state == CLOSED
+
+    def start_call(self, now: float):
+        if self.state == HALF_OPEN and self.available(now):
+            self.probe_started = now
+
+    def score(self) -> float:
+        """Lower is better; unknown latency is treated as one second."""
+        return (self.latency or 1.0) * (1.0 + 4.0 * self.error_rate)
+
+    def record_success(self, latency: float):
+        self.latency = latency if self.latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency
+        )
+        self.error_rate *= (1 - self.alpha)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.probe_started = None
+
+    def record_failure(self, error_class: str, now: float):
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        # a throttle counts double: the region is telling us to go elsewhere
+        weight = 2 if error_class == THROTTLED else 1
+        if self.state == HALF_OPEN or self.consecutive_failures * weight >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+        self.probe_started = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "latency": self.latency,
+            "error_rate": round(self.error_rate, 4),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class RegionRouter:
+    """Spreads calls over regions by observed latency and error rate, with per-region circuit breaking."""
+
+    def __init__(self, regions: List[str], failure_threshold: int = 3, cooldown: float = 30.0):
+        self.regions = list(regions)
+        self.health = {
+            region: RegionHealth(region, failure_threshold, cooldown) for region in self.regions
+        }
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[str]:
+        """Regions in the order they should be tried.
+
+        The first region is drawn at random weighted by inverse score so load
+        spreads across healthy regions; the rest follow by score, with half-open
+        regions after the closed ones. Regions with an open circuit, or a
+        half-open one whose probe is in flight, come last as a final resort.
+        A half-open region's probe is only claimed by ``start_call``, once a
+        call is actually sent there.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.regions if self.health[r].available(now)]
+            broken = [r for r in self.regions if r not in healthy]
+            if not healthy:
+                return broken
+
+            ranked = sorted(healthy, key=lambda r: self.health[r].score())
+            weights = [1.0 / self.health[r].score() for r in ranked]
+            first = random.choices(ranked, weights=weights)[0]
+            rest = [r for r in ranked if r != first]
+            probing = [r for r in rest if self.health[r].state == HALF_OPEN]
+            return [first] + [r for r in rest if r not in probing] + probing + broken
+
+    def start_call(self, region: str):
+        """Note a call about to go to ``region``; the first one after a cool-down is its probe."""
+        with self._lock:
+            self.health[region].start_call(time.monotonic())
+
+    def record_success(self, region: str, latency: float):
+        with self._lock:
+            self.health[region].record_success(latency)
+
+    def record_failure(self, region: str, error_class: str):
+        with self._lock:
+            # fatal errors (validation, access) are the request's fault, not the region's
+            if error_class == FATAL:
+                self.health[region].probe_started = None
+                return
+            self.health[region].record_failure(error_class, time.monotonic())
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {region: h.snapshot() for region, h in self.health.items()}
+
+
+_routers: Dict[Tuple, RegionRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_region_router(regions: List[str], failure_threshold: int, cooldown: float) -> RegionRouter:
+    """Return the process-wide router for this region list."""
+    key = (tuple(regions), failure_threshold, cooldown)
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = RegionRouter(regions, failure_threshold, cooldown)
+        return _routers[key]
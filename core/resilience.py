@@ -0,0 +1,239 @@
+import time
+import random
+import logging
+from dataclasses import dataclass
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Optional
+
+from core.cancellation import CancelToken, JobCancelled
+from core.metrics import LatencyHistogram, metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Error classes used to decide whether and how long to back off
+THROTTLED = "throttled"
+TIMEOUT = "timeout"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+_THROTTLE_CODES = {
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "RequestLimitExceeded",
+    "SlowDown",
+}
+_TRANSIENT_CODES = {
+    "InternalServerException",
+    "InternalFailure",
+    "ServiceUnavailableException",
+    "ServiceUnavailable",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+_THROTTLE_TYPES = {"RateLimitError"}
+_TIMEOUT_TYPES = {
+    "ReadTimeoutError",
+    "ConnectTimeoutError",
+    "APITimeoutError",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "TimeoutError",
+}
+_TRANSIENT_TYPES = {
+    "EndpointConnectionError",
+    "ConnectionClosedError",
+    "APIConnectionError",
+    "InternalServerError",
+    "ConnectionError",
+}
+
+# Shared pool for hedged requests; each hedged call holds at most two workers
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+def _classify_single(exc: BaseException) -> Optional[str]:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in _THROTTLE_CODES:
+            return THROTTLED
+        if code in _TRANSIENT_CODES:
+            return TRANSIENT
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 429:
+            return THROTTLED
+        if status and status >= 500:
+            return TRANSIENT
+
+    status = getattr(exc, "status_code", None)
+    if status == 429:
+        return THROTTLED
+    if isinstance(status, int) and status >= 500:
+        return TRANSIENT
+
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _THROTTLE_TYPES:
+            return THROTTLED
+        if cls.__name__ in _TIMEOUT_TYPES:
+            return TIMEOUT
+        if cls.__name__ in _TRANSIENT_TYPES:
+            return TRANSIENT
+    return None
+
+
+def classify_error(exc: BaseException) -> str:
+    """Classify a provider error as throttled, timeout, transient or fatal.
+
+    Wrapped exceptions are unwrapped through ``__cause__``/``__context__`` so
+    errors re-raised by LangChain are classified by their botocore/OpenAI root.
+    """
+    seen = set()
+    current = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        error_class = _classify_single(current)
+        if error_class:
+            return error_class
+        current = current.__cause__ or current.__context__
+    return FATAL
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff, tuned per error class."""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    # throttles need longer to clear than connection blips
+    throttle_multiplier: float = 4.0
+
+    def backoff(self, error_class: str, attempt: int) -> float:
+        base = self.base_delay
+        if error_class == THROTTLED:
+            base *= self.throttle_multiplier
+        # full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.max_delay, base * (2 ** (attempt - 1))))
+
+
+def hedged_call(
+    fn: Callable[[], Any],
+    hedge_after: float,
+    backup_fn: Optional[Callable[[], Any]] = None,
+) -> Any:
+    """Run ``fn`` and fire a duplicate if it has not finished after ``hedge_after`` seconds.
+
+    Whichever call succeeds first wins; the other is cancelled if it has not
+    started, otherwise its result is discarded. An error is only raised once
+    both calls have failed. ``backup_fn`` lets the duplicate go elsewhere,
+    e.g. to another region.
+    """
+    primary = _hedge_executor.submit(fn)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    metrics.incr("llm.hedge.fired")
+    backup = _hedge_executor.submit(backup_fn or fn)
+    pending = {primary, backup}
+    first_error = None
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                if future is backup:
+                    metrics.incr("llm.hedge.won")
+                return future.result()
+            first_error = first_error or future.exception()
+
+    raise first_error
+
+
+def _routed(fn: Callable[[str], Any], router, region: str) -> Callable[[], Any]:
+    """Bind ``fn`` to ``region`` and feed the outcome into the router's health scores."""
+    def call():
+        router.start_call(region)
+        started = time.monotonic()
+        try:
+            result = fn(region)
+        except Exception as e:
+            router.record_failure(region, classify_error(e))
+            raise
+        router.record_success(region, time.monotonic() - started)
+        return result
+    return call
+
+
+def call_with_retries(
+    fn: Callable[..., Any],
+    policy: RetryPolicy,
+    label: str,
+    histogram: Optional[LatencyHistogram] = None,
+    hedge_delay: Optional[Callable[[], Optional[float]]] = None,
+    router=None,
+    cancel_token: Optional[CancelToken] = None,
+) -> Any:
+    """Call ``fn`` with classified retries, optional hedging and optional region failover.
+
+    Args:
+        fn: Callable performing one provider request. Takes the target region when ``router`` is set
+        policy: Retry policy deciding attempts and backoff
+        label: Name used in logs and error counters (usually the model id)
+        histogram: Latency histogram updated with successful call durations
+        hedge_delay: Returns the hedge delay for the next attempt, or None to disable hedging
+        router: Optional ``RegionRouter``; failed calls move to the next region
+            straight away and only back off once every region has been tried
+        cancel_token: Optional run token; cancelling it abandons the in-flight
+            attempt and any backoff with ``JobCancelled``
+    """
+    attempt = 0
+    tried = set()
+    max_attempts = policy.max_attempts + (len(router.regions) - 1 if router else 0)
+
+    while True:
+        attempt += 1
+        if router is None:
+            primary = backup = fn
+        else:
+            order = [r for r in router.candidates() if r not in tried] or router.candidates()
+            primary = _routed(fn, router, order[0])
+            backup = _routed(fn, router, order[1] if len(order) > 1 else order[0])
+            tried.add(order[0])
+
+        started = time.monotonic()
+        try:
+            delay = hedge_delay() if hedge_delay else None
+            attempt_fn = primary if delay is None else partial(hedged_call, primary, delay, backup)
+            result = cancel_token.run(attempt_fn) if cancel_token else attempt_fn()
+        except JobCancelled:
+            raise
+        except Exception as e:
+            error_class = classify_error(e)
+            metrics.incr(f"llm.errors.{error_class}")
+            if error_class == FATAL or attempt >= max_attempts:
+                raise
+            if router is not None and len(tried) < len(router.regions):
+                logger.warning(f"{label} call failed ({error_class}: {e}); failing over to next region")
+                continue
+            tried.clear()
+            sleep_for = policy.backoff(error_class, attempt)
+            logger.warning(
+                f"{label} call failed ({error_class}: {e}); "
+                f"retrying in {sleep_for:.1f}s (attempt {attempt}/{max_attempts})"
+            )
+            if cancel_token:
+                if cancel_token.wait(sleep_for):
+                    cancel_token.raise_if_cancelled()
+            else:
+                time.sleep(sleep_for)
+            continue
+
+        if histogram is not None:
+            histogram.observe(time.monotonic() - started)
+        return result
@@ -0,0 +1,109 @@
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from agent.configuration import Configuration
+
+logger = logging.getLogger(__name__)
+
+
+# Default tier per graph node: high fan-out steps get the cheap tier,
+# only the final synthesis gets the large one.
+NODE_TIERS: Dict[str, str] = {
+    "generate_query": "standard",
+    "web_research": "fast",
+    "reflection": "standard",
+    "finalize_answer": "large",
+    "wiki": "large",
+}
+
+# Per-node model fields kept for backwards compatibility; they win over the
+# tier when set explicitly (environment or RunnableConfig).
+LEGACY_NODE_FIELDS: Dict[str, str] = {
+    "generate_query": "query_generator_model",
+    "reflection": "reflection_model",
+    "finalize_answer": "answer_model",
+}
+
+
+@dataclass
+class RouteDecision:
+    node: str
+    tier: str
+    model: str
+    source: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+
+def route_model(
+    configurable: Configuration,
+    node: str,
+    override: Optional[str] = None,
+    tier: Optional[str] = None,
+    provider: Optional[str] = None,
+) -> RouteDecision:
+    """Resolve the model a node should call.
+
+    Precedence: an explicit ``override`` (e.g. ``reasoning_model`` in state),
+    a ``tier`` chosen at run time (e.g. by the deadline planner), ``node_models``
+    from the RunnableConfig (a model id or a tier name), an explicitly set
+    legacy per-node field, then the node's tier.
+
+    Args:
+        configurable: The run's configuration
+        node: Graph node (or pipeline stage) name, see ``NODE_TIERS``
+        override: Model id that takes precedence over any configuration
+        tier: Tier that takes precedence over the configured model
+        provider: Provider the model is called through; defaults to ``llm_provider``
+
+    Returns:
+        The routing decision, including where the model came from
+    """
+    tiers = configurable.model_tiers
+    provider = provider or configurable.llm_provider
+    planned_tier = tier
+    tier = configurable.node_model_tiers.get(node, NODE_TIERS.get(node, "standard"))
+
+    if override:
+        return RouteDecision(node, tier, override, "override")
+
+    if planned_tier and planned_tier in tiers and provider != "openai":
+        return RouteDecision(node, planned_tier, tiers[planned_tier], "planned_tier")
+
+    node_model = configurable.node_models.get(node)
+    if node_model:
+        if node_model in tiers:
+            return RouteDecision(node, node_model, tiers[node_model], "node_models")
+        return RouteDecision(node, tier, node_model, "node_models")
+
+    legacy_field = LEGACY_NODE_FIELDS.get(node)
+    if legacy_field and legacy_field in configurable.model_fields_set:
+        return RouteDecision(node, tier, getattr(configurable, legacy_field), legacy_field)
+
+    if provider == "openai":
+        return RouteDecision(node, tier, configurable.openai_native_model, "openai_native_model")
+
+    if tier not in tiers:
+        raise ValueError(f"Unknown model tier '{tier}' for node '{node}'")
+    return RouteDecision(node, tier, tiers[tier], "tier")
+
+
+def summarise_model_calls(calls: List[Dict]) -> Dict[str, Dict]:
+    """Aggregate a run's model call records per tier."""
+    summary: Dict[str, Dict] = {}
+    for call in calls:
+        tier = summary.setdefault(
+            call["tier"], {"calls": 0, "latency_s": 0.0, "cache_read_tokens": 0, "models": set()}
+        )
+        tier["calls"] += 1
+        tier["latency_s"] += call["latency_s"]
+        tier["cache_read_tokens"] += call.get("cache_read_tokens", 0)
+        tier["models"].add(call["model"])
+
+    for tier in summary.values():
+        tier["mean_latency_s"] = round(tier["latency_s"] / tier["calls"], 3)
+        tier["latency_s"] = round(tier["latency_s"], 3)
+        tier["models"] = sorted(tier["models"])
+    return summary
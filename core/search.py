@@ -0,0 +1,164 @@
+import json
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.cancellation import CancelToken
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TavilyClient:
+    """
+    Process-wide Tavily search client
+
+    Searches share one keep-alive ``httpx.AsyncClient`` that runs on a
+    background event loop thread, so connections and TLS sessions are reused
+    across branches and jobs. Blocking graph nodes call ``search``; async code
+    can await ``asearch``. With ``coalesce`` on, concurrent identical searches
+    share a single request; results are not kept once it completes.
+    """
+    def __init__(
+            self,
+            base_url: str,
+            max_connections: int,
+            max_keepalive_connections: int,
+            connect_timeout: float,
+            coalesce: bool = True,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.connect_timeout = connect_timeout
+        self.coalesce = coalesce
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tavily-client", daemon=True)
+        self._thread.start()
+
+    def _http(self) -> httpx.AsyncClient:
+        # created on the loop thread, the client's connection pool belongs to that loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(None, connect=self.connect_timeout),
+            )
+        return self._client
+
+    async def _post(self, payload: Dict[str, Any], timeout: float) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        response = await self._http().post(
+            "/search",
+            json=payload,
+            headers={"Authorization": f"Bearer {payload['api_key']}"},
+            timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+        )
+        metrics.histogram("search.latency").observe(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    async def asearch(
+            self,
+            query: str,
+            api_key: str,
+            max_results: int = 5,
+            search_depth: str = "advanced",
+            include_answer: bool = False,
+            include_raw_content: bool = False,
+            timeout: float = 60.0,
+    ) -> List[Dict[str, Any]]:
+        """Run a Tavily search on the client's loop; returns the ``results`` list."""
+        if asyncio.get_running_loop() is not self._loop:
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                self.asearch(query, api_key, max_results, search_depth, include_answer, include_raw_content, timeout),
+                self._loop,
+            ))
+
+        payload = {
+            "api_key": api_key,
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+        }
+        if not self.coalesce:
+            metrics.incr("search.requests")
+            return await self._post(payload, timeout)
+
+        key = json.dumps(payload, sort_keys=True)
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.incr("search.coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the run that owned the request was cancelled, not this caller: search again
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.asearch(
+                        query, api_key, max_results, search_depth, include_answer, include_raw_content, timeout
+                    )
+                raise
+
+        future = self._inflight[key] = self._loop.create_future()
+        metrics.incr("search.requests")
+        try:
+            results = await self._post(payload, timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # the waiters re-raise it; keep the loop from logging it as unretrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(results)
+            return results
+        finally:
+            del self._inflight[key]
+
+    def search(self, query: str, api_key: str, cancel_token: Optional[CancelToken] = None, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Blocking wrapper around ``asearch`` for the graph's sync nodes; cancelling
+        ``cancel_token`` cancels the request and raises ``JobCancelled``.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.asearch(query, api_key, **kwargs), self._loop)
+        return cancel_token.result(future) if cancel_token else future.result()
+
+    def close(self):
+        async def shutdown():
+            if self._client is not None:
+                await self._client.aclose()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_clients: Dict[Tuple, TavilyClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_search_client(
+        base_url: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        connect_timeout: float,
+        coalesce: bool = True,
+) -> TavilyClient:
+    """Return the process-wide client for these settings."""
+    key = (base_url, max_connections, max_keepalive_connections, connect_timeout, coalesce)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = TavilyClient(base_url, max_connections, max_keepalive_connections, connect_timeout, coalesce)
+        return _clients[key]
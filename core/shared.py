@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.cancellation import JobCancelled
+
+
+class SingleFlight:
+    """
+    Computes each key at most once and shares the result
+
+    Concurrent callers asking for a key that is already being computed wait
+    for that computation instead of starting their own. Failures are not
+    remembered, so the next caller retries.
+    """
+    def __init__(self):
+        self._results: Dict[str, Any] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return ``(value, shared)``; ``shared`` is False only for the caller that computed it."""
+        with self._lock:
+            if key in self._results:
+                self.shared += 1
+                return self._results[key], True
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+
+        if not owner:
+            try:
+                return future.result(), True
+            except JobCancelled:
+                # the job computing it was cancelled, not this caller
+                return self.do(key, fn)
+
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._results[key] = value
+            del self._inflight[key]
+            self.computed += 1
+        future.set_result(value)
+        return value, False
+
+
+class BatchScope:
+    """Search results and model calls shared by all jobs of one batch."""
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.searches = SingleFlight()
+        self.model_calls = SingleFlight()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "searches_run": self.searches.computed,
+            "searches_shared": self.searches.shared,
+            "model_calls_run": self.model_calls.computed,
+            "model_calls_shared": self.model_calls.shared,
+        }
+
+
+_scopes: Dict[str, BatchScope] = {}
+_scopes_lock = threading.Lock()
+
+
+def get_batch_scope(batch_id: str) -> BatchScope:
+    with _scopes_lock:
+        if batch_id not in _scopes:
+            _scopes[batch_id] = BatchScope(batch_id)
+        return _scopes[batch_id]
+
+
+def find_batch_scope(batch_id: str) -> Optional[BatchScope]:
+    """Return the batch's scope if it is still running."""
+    with _scopes_lock:
+        return _scopes.get(batch_id)
+
+
+def release_batch_scope(batch_id: str):
+    """Drop a finished batch's shared results."""
+    with _scopes_lock:
+        _scopes.pop(batch_id, None)
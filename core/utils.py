@@ -3,17 +3,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def write_to_markdown(content: str, filename: str ):
-    """Writes research reports and sources to a markdown file."""
-    try:
-        with open(filename, 'w') as file:
-            file.write(content)
-
-    except IOError as e:
-        logger.error(f"Failed to write to {filename}: {e}")
-
-
-
 def generate_citations_from_tavily(search_results, query):
     """Generate citations from Tavily search results"""
     citations = []
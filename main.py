@@ -1,8 +1,27 @@
+from dotenv import load_dotenv
+
+# before any project import: modules read their settings from the environment when imported
+load_dotenv()
+
+import threading
+from contextlib import asynccontextmanager
+
+from api.routes.health import router as health_router
 from api.routes.research import router as research_router
+from services.process_research import warm_up
 from fastapi import FastAPI
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # compile the graph in the background so the server answers health checks straight away
+    threading.Thread(target=warm_up, name="graph-warm-up", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(health_router)
 app.include_router(research_router, prefix="/research")
 
 
@@ -0,0 +1,348 @@
+import os
+import gzip
+import asyncio
+import json
+import mmap
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from agent.configuration import Configuration
+
+logger = logging.getLogger(__name__)
+
+
+# Bounds of the on-disk archive (0 disables either); whole closed segments are deleted, oldest first
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+
+# Flat column layout used for Parquet/Arrow exports
+EXPORT_COLUMNS = [
+    "type", "research_id", "user_id", "topic", "created_at",
+    "position", "query", "url", "title", "short_url", "text",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    research_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    records INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_user ON runs (user_id);
+CREATE INDEX IF NOT EXISTS runs_topic ON runs (topic);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT NOT NULL,
+    research_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_url ON urls (url);
+"""
+
+
+def run_records(
+        research_id: str,
+        user_id: str,
+        topic: str,
+        state: Dict[str, Any],
+        report: str,
+) -> List[Dict[str, Any]]:
+    """Flatten a finished graph state into archive records."""
+    base = {
+        "research_id": research_id,
+        "user_id": user_id,
+        "topic": topic,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    records = [{**base, "type": "run", "text": report}]
+    records += [
+        {**base, "type": "query", "position": idx, "query": query}
+        # web_research echoes its query back, so the list holds duplicates
+        for idx, query in enumerate(dict.fromkeys(state.get("search_query", [])))
+    ]
+    records += [
+        {**base, "type": "summary", "position": idx, "text": summary}
+        for idx, summary in enumerate(state.get("web_research_result", []))
+    ]
+    records += [
+        {
+            **base,
+            "type": "source",
+            "position": idx,
+            "url": source.get("url", ""),
+            "title": source.get("title", ""),
+            "short_url": source.get("short_url", ""),
+            "text": source.get("content", ""),
+        }
+        for idx, source in enumerate(state.get("sources_gathered", []))
+    ]
+    return records
+
+
+class ResearchArchive:
+    """
+    Append-only archive of research artifacts
+
+    Each run is appended as one gzip member to the current JSONL segment, so
+    a run can be decompressed on its own from its byte range. A SQLite index
+    maps research_id, user_id, topic and source URL to that range. Closed
+    segments are deleted, oldest first, while the archive exceeds
+    ``max_bytes`` or once all their runs are older than ``retention_days``.
+    """
+    def __init__(
+            self,
+            root: str,
+            max_segment_bytes: int = 64 * 1024 * 1024,
+            max_bytes: int = 0,
+            retention_days: float = 0,
+    ):
+        self.root = Path(root)
+        self.segments_dir = self.root / "segments"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def _current_segment(self) -> Path:
+        segments = sorted(self.segments_dir.glob("segment-*.jsonl.gz"))
+        if segments and segments[-1].stat().st_size < self.max_segment_bytes:
+            return segments[-1]
+        # numbered after the last one, as older segments may have been pruned
+        number = int(segments[-1].name.split("-")[1].split(".")[0]) + 1 if segments else 1
+        return self.segments_dir / f"segment-{number:06d}.jsonl.gz"
+
+    def append_run(self, records: List[Dict[str, Any]]):
+        """Append one run's records (as built by ``run_records``) and index them."""
+        if not records:
+            return
+        run = records[0]
+        payload = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        member = gzip.compress(payload)
+        urls = {record["url"] for record in records if record.get("url")}
+
+        with self._lock:
+            segment = self._current_segment()
+            with open(segment, "ab") as file:
+                offset = file.tell()
+                file.write(member)
+
+            with self._db:
+                self._db.execute("DELETE FROM urls WHERE research_id = ?", (run["research_id"],))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run["research_id"], run["user_id"], run["topic"], run["created_at"],
+                        segment.name, offset, len(member), len(records),
+                    ),
+                )
+                self._db.executemany(
+                    "INSERT INTO urls VALUES (?, ?)",
+                    [(url, run["research_id"]) for url in urls],
+                )
+            self._prune()
+
+    def _prune(self) -> int:
+        """Delete closed segments beyond the size and age bounds; the caller holds the lock."""
+        if not self.max_bytes and not self.retention_days:
+            return 0
+        segments = sorted(self.segments_dir.glob("segment-*.jsonl.gz"))
+        sizes = {segment: segment.stat().st_size for segment in segments}
+        total = sum(sizes.values())
+        cutoff = None
+        if self.retention_days:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat()
+
+        removed = 0
+        # the current segment is still written to and is never removed
+        for segment in segments[:-1]:
+            oversized = self.max_bytes and total > self.max_bytes
+            expired = False
+            if cutoff is not None:
+                newest = self._db.execute(
+                    "SELECT MAX(created_at) FROM runs WHERE segment = ?", (segment.name,)
+                ).fetchone()[0]
+                expired = newest is None or newest < cutoff
+            if not oversized and not expired:
+                break
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM urls WHERE research_id IN (SELECT research_id FROM runs WHERE segment = ?)",
+                    (segment.name,),
+                )
+                self._db.execute("DELETE FROM runs WHERE segment = ?", (segment.name,))
+            segment.unlink()
+            total -= sizes[segment]
+            removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} archive segments, {total} bytes kept")
+        return removed
+
+    def find_runs(
+            self,
+            research_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            topic: Optional[str] = None,
+            url: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Look up runs in the index. ``topic`` matches as a substring."""
+        query = "SELECT DISTINCT runs.* FROM runs"
+        clauses, params = [], []
+        if url is not None:
+            query += " JOIN urls ON urls.research_id = runs.research_id"
+            clauses.append("urls.url = ?")
+            params.append(url)
+        if research_id is not None:
+            clauses.append("runs.research_id = ?")
+            params.append(research_id)
+        if user_id is not None:
+            clauses.append("runs.user_id = ?")
+            params.append(user_id)
+        if topic is not None:
+            clauses.append("runs.topic LIKE ?")
+            params.append(f"%{topic}%")
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY runs.created_at"
+
+        with self._lock:
+            cursor = self._db.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _iter_member(self, segment: str, offset: int, length: int) -> Iterator[Dict[str, Any]]:
+        """Stream records of one gzip member straight out of the memory-mapped segment."""
+        with open(self.segments_dir / segment, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                pending = b""
+                for start in range(offset, offset + length, 1024 * 1024):
+                    chunk = mapped[start:min(start + 1024 * 1024, offset + length)]
+                    pending += decompressor.decompress(chunk)
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        if line:
+                            yield json.loads(line)
+                pending += decompressor.flush()
+                if pending.strip():
+                    yield json.loads(pending)
+
+    def iter_records(
+            self,
+            types: Optional[Iterable[str]] = None,
+            **filters: Optional[str],
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream archived records without loading whole segments
+
+        Args:
+            types: Record types to keep ('run', 'query', 'summary', 'source'); all if None
+            **filters: research_id, user_id, topic or url, as for ``find_runs``;
+                ``url`` selects the runs that cited that URL
+        """
+        types = set(types) if types else None
+        for run in self.find_runs(**filters):
+            for record in self._iter_member(run["segment"], run["offset"], run["length"]):
+                if types is None or record["type"] in types:
+                    yield record
+
+    def export(self, path: str, format: str = "parquet", batch_size: int = 10_000, **filters) -> int:
+        """
+        Export archived records to a Parquet or Arrow IPC file
+
+        Records are written in batches so the export never holds the whole
+        archive in memory. Requires the optional ``pyarrow`` dependency.
+
+        Returns:
+            The number of records written
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Archive export requires pyarrow: pip install pyarrow") from e
+
+        schema = pa.schema([
+            (column, pa.int64() if column == "position" else pa.string())
+            for column in EXPORT_COLUMNS
+        ])
+        if format == "parquet":
+            writer = pq.ParquetWriter(path, schema, compression="zstd")
+        elif format == "arrow":
+            writer = pa.ipc.new_file(path, schema)
+        else:
+            raise ValueError(f"Unsupported export format: {format}")
+
+        written = 0
+        batch: List[Dict[str, Any]] = []
+        try:
+            for record in self.iter_records(**filters):
+                batch.append({column: record.get(column) for column in EXPORT_COLUMNS})
+                if len(batch) >= batch_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    written += len(batch)
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                written += len(batch)
+        finally:
+            writer.close()
+        return written
+
+
+@lru_cache(maxsize=None)
+def get_archive() -> Optional[ResearchArchive]:
+    """Return the process-wide archive, or None when ARCHIVE_DIR is set to an empty value."""
+    root = os.getenv("ARCHIVE_DIR", "archive")
+    if not root:
+        return None
+    return ResearchArchive(root, max_bytes=ARCHIVE_MAX_BYTES, retention_days=ARCHIVE_RETENTION_DAYS)
+
+
+async def archive_run(
+        research_id: str,
+        user_id: str,
+        topic: str,
+        state: Dict[str, Any],
+        report: str,
+        run_config: Configuration,
+):
+    """
+    Keep a finished run's queries, summaries and sources in the local archive
+    and, with the knowledge store on, index them for later runs; failures are
+    only logged.
+    """
+    archive = get_archive()
+    if archive is None:
+        return
+    records = run_records(research_id, user_id, topic, state, report)
+    try:
+        await asyncio.to_thread(archive.append_run, records)
+    except Exception as e:
+        logger.warning(f"Failed to archive research {research_id}: {e}")
+        return
+
+    if not run_config.knowledge_store_enabled:
+        return
+    # imported here as agent.knowledge loads the store from this module's archive
+    from agent.knowledge import get_knowledge_store
+
+    # make this run's passages reusable by later runs straight away; the
+    # first run to do so loads the store from the archive
+    try:
+        store = await asyncio.to_thread(
+            get_knowledge_store, run_config.knowledge_max_age_days, run_config.knowledge_max_passages
+        )
+        await asyncio.to_thread(store.add_records, records, run_config.knowledge_max_age_days * 86400)
+    except Exception as e:
+        logger.warning(f"Failed to index research {research_id} in the knowledge store: {e}")
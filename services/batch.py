@@ -0,0 +1,85 @@
+import os
+import uuid
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from core.shared import find_batch_scope, release_batch_scope
+from services.jobs import job_registry
+from services.process_research import ProcessResearchService, ResearchRequest
+from services.scheduler import scheduler
+from services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+class BatchResearchRequest(BaseModel):
+    requests: List[ResearchRequest] = Field(..., min_length=1)
+    batch_id: Optional[str] = None
+
+
+class BatchResearchService:
+    """
+    Schedules many research requests together
+
+    Jobs of a batch run with bounded concurrency and share a BatchScope, so
+    identical search queries and model calls across topics run only once.
+    """
+
+    def __init__(self, batch: BatchResearchRequest, storage: StorageBackend, max_concurrency: int = BATCH_MAX_CONCURRENCY):
+        self.batch_id = batch.batch_id or uuid.uuid4().hex
+        self.requests = batch.requests
+        self.storage = storage
+        self.max_concurrency = max_concurrency
+        self.services = [
+            ProcessResearchService(request, storage, batch_id=self.batch_id)
+            for request in self.requests
+        ]
+
+    def submit(self):
+        """
+        Register every job of the batch as queued
+
+        Raises:
+            AdmissionRejected: if a tenant may not queue that many more jobs; none are queued then
+        """
+        scheduler.admit([(request.user_id, request.research_id) for request in self.requests])
+        for service in self.services:
+            service.submit(admit=False)
+
+    async def process_batch(self) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(service: ProcessResearchService):
+            async with semaphore:
+                return await service.process_research()
+
+        try:
+            await asyncio.gather(*[run(service) for service in self.services])
+            status = batch_status(self.batch_id)
+            logger.info(f"Batch {self.batch_id} finished: {status['states']}, shared work: {status['shared']}")
+            return status
+        finally:
+            release_batch_scope(self.batch_id)
+
+
+def batch_status(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Combined status of a batch's jobs, or None if the batch is unknown."""
+    jobs = job_registry.batch(batch_id)
+    if not jobs:
+        return None
+    scope = find_batch_scope(batch_id)
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "states": dict(Counter(job.state for job in jobs)),
+        # shared work counters are only kept while the batch runs
+        "shared": scope.stats() if scope else None,
+        "jobs": [job.model_dump(mode="json") for job in jobs],
+    }
@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+# states a job does not leave
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class NodeTiming(BaseModel):
+    count: int = 0
+    total_s: float = 0.0
+
+
+class JobStatus(BaseModel):
+    research_id: str
+    user_id: str
+    batch_id: Optional[str] = None
+    state: str = QUEUED
+    error: Optional[str] = None
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    # seconds the job waited for a scheduler slot
+    queue_wait_s: Optional[float] = None
+    finished_at: Optional[datetime] = None
+    current_nodes: List[str] = Field(default_factory=list)
+    node_timings: Dict[str, NodeTiming] = Field(default_factory=dict)
+    wiki_state: Optional[str] = None
+    # slugs of the wiki pages uploaded so far, each at {research_id}/wiki/{slug}.json
+    wiki_pages: List[str] = Field(default_factory=list)
+
+
+class JobRegistry:
+    """In-process record of research jobs, bounded to the most recent ``max_jobs``."""
+
+    def __init__(self, max_jobs: int = 10000):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, JobStatus]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, research_id: str, user_id: str, batch_id: Optional[str] = None) -> JobStatus:
+        job = JobStatus(
+            research_id=research_id,
+            user_id=user_id,
+            batch_id=batch_id,
+            submitted_at=datetime.now(timezone.utc),
+        )
+        with self._lock:
+            self._jobs[research_id] = job
+            self._jobs.move_to_end(research_id)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def update(self, research_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(research_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    def start(self, research_id: str):
+        self.update(research_id, state=RUNNING, started_at=datetime.now(timezone.utc))
+
+    def node_started(self, research_id: str, node: str):
+        with self._lock:
+            job = self._jobs.get(research_id)
+            if job is not None:
+                job.current_nodes.append(node)
+
+    def wiki_page_ready(self, research_id: str, slug: str):
+        with self._lock:
+            job = self._jobs.get(research_id)
+            if job is not None and slug not in job.wiki_pages:
+                job.wiki_pages.append(slug)
+
+    def node_finished(self, research_id: str, node: str, elapsed: float):
+        with self._lock:
+            job = self._jobs.get(research_id)
+            if job is None:
+                return
+            if node in job.current_nodes:
+                job.current_nodes.remove(node)
+            timing = job.node_timings.setdefault(node, NodeTiming())
+            timing.count += 1
+            timing.total_s += elapsed
+
+    def finish(self, research_id: str, error: Optional[str] = None, state: Optional[str] = None):
+        self.update(
+            research_id,
+            state=state or (FAILED if error else DONE),
+            error=error,
+            finished_at=datetime.now(timezone.utc),
+            current_nodes=[],
+        )
+
+    def get(self, research_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            job = self._jobs.get(research_id)
+            return job.model_copy(deep=True) if job else None
+
+    def batch(self, batch_id: str) -> List[JobStatus]:
+        with self._lock:
+            return [job.model_copy() for job in self._jobs.values() if job.batch_id == batch_id]
+
+
+job_registry = JobRegistry()
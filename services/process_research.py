@@ -1,15 +1,62 @@
-from pydantic import BaseModel
-from agent.graph import graph
-from services.s3 import S3UploadService
+import json
+import time
+import asyncio
+from pydantic import BaseModel, Field
+from services.storage import Artifact, StorageBackend
+from services.archive import archive_run
+from agent.configuration import Configuration
+from agent.presets import PresetName, preset_configurable
+from agent.utils import resolve_state, state_blob_store
+from agent.wiki import InvestigationDto, InvestigationOutputPage, InvestigationOutputPages, WikiService
+from services.jobs import CANCELLED, DONE, FAILED, RUNNING, job_registry
+from services.report_cache import report_cache
+from services.run_recorder import RunRecorder
+from services.scheduler import BATCH, INTERACTIVE, Lane, scheduler
+from core.cancellation import CancelToken, find_cancel_token, new_cancel_token, release_cancel_token
+from core.routing import summarise_model_calls
 import logging
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# tasks of the jobs running in this process, so they can be cancelled
+_running: Dict[str, asyncio.Task] = {}
+
+
+def cancel_research(research_id: str, reason: str = "cancelled") -> bool:
+    """
+    Cancel a queued or running job: its model calls, searches and uploads
+    stop at once. Returns False if the job is not known to this process.
+    """
+    token = find_cancel_token(research_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    task = _running.get(research_id)
+    if task is not None:
+        task.get_loop().call_soon_threadsafe(task.cancel)
+    return True
+
+
+def warm_up():
+    """Import and compile the research graph ahead of the first request."""
+    # agent.graph pulls in langgraph and the node dependencies, so it is not imported with this module
+    from agent.graph import get_graph
+
+    get_graph()
+
 
 class ResearchRequest(BaseModel):
     user_id: str
     research_id: str
     research_topic: str
+    preset: Optional[PresetName] = None
+    # seconds from submission by which the report should be ready
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    # store a stack profile, top allocations and a timeline under {research_id}/profile/
+    profile: bool = False
+    # scheduling lane; defaults to batch for jobs of a batch and interactive otherwise
+    lane: Optional[Lane] = None
 
 
 class ResearchResponse(BaseModel):
@@ -21,35 +68,356 @@ class ResearchResponse(BaseModel):
 class ProcessResearchService:
     """Service for processing research requests"""
 
-    def __init__(self, request: ResearchRequest, s3: S3UploadService):
+    def __init__(self, request: ResearchRequest, storage: StorageBackend, batch_id: Optional[str] = None):
         self.request = request
-        self.s3 = s3
+        self.storage = storage
+        self.batch_id = batch_id
 
+    @property
+    def lane(self) -> str:
+        return self.request.lane or (BATCH if self.batch_id else INTERACTIVE)
+
+    def submit(self, admit: bool = True):
+        """
+        Register the job as queued
+
+        Raises:
+            AdmissionRejected: if the tenant may not queue more jobs, unless
+                ``admit`` is False because the caller admitted it already
+        """
+        if admit:
+            scheduler.admit([(self.request.user_id, self.request.research_id)])
+        new_cancel_token(self.request.research_id)
+        job_registry.submit(self.request.research_id, self.request.user_id, self.batch_id)
+
+    def _config(self) -> dict:
+        """The RunnableConfig of the job's graph run."""
+        configurable = {"run_id": self.request.research_id}
+        if self.request.preset:
+            configurable.update(preset_configurable(self.request.preset))
+        if self.request.deadline_seconds:
+            submitted_at = job_registry.get(self.request.research_id).submitted_at
+            configurable["deadline_at"] = submitted_at.timestamp() + self.request.deadline_seconds
+        if self.batch_id:
+            configurable["batch_id"] = self.batch_id
+        return {"configurable": configurable}
 
     async def process_research(self) -> ResearchResponse:
-        try: 
-            response = graph.invoke({"messages": [self.request.research_topic]})
-            response_content = response["messages"][-1].content
+        research_id = self.request.research_id
+        if job_registry.get(research_id) is None or find_cancel_token(research_id) is None:
+            self.submit()
+        token = find_cancel_token(research_id)
+        config = self._config()
+        run_config = Configuration.from_runnable_config(config)
+        waited = await self._acquire_slot(token, run_config)
+        if waited is None:
+            return None
+
+        recorder = RunRecorder(research_id, self.request.user_id, run_config, self.request.profile)
+        blob_store = None
+        wiki_task = None
+        # stops the wiki conversion's worker threads on its timeout and when the job ends
+        wiki_cancel = CancelToken()
+        report_uploaded = asyncio.Event()
+        written: List[str] = []
+        timer = None
 
+        # the slot is held from here on, the finally gives it back whatever fails
+        try:
+            job_registry.update(research_id, queue_wait_s=round(waited, 3))
+            job_registry.start(research_id)
+            blob_store = state_blob_store(run_config)
+            recorder.start()
+            if run_config.job_timeout_seconds:
+                timer = asyncio.get_running_loop().call_later(
+                    run_config.job_timeout_seconds, cancel_research, research_id, "timeout"
+                )
+
+            # the graph's nodes are blocking, keep them off the event loop
+            with recorder.phase("graph"):
+                response = await asyncio.to_thread(self._run_graph, config, recorder)
+            response = resolve_state(response, blob_store)
+            response_content = response["messages"][-1].content
+            self._log_run(response)
             if (response_content is None or response_content.strip() == ""):
                 raise ValueError("No response content received from graph")
-            
-            upload_result = await self.s3.uploadFile(
-                content=response_content,
-                s3_key=f"{self.request.research_id}/{self.request.user_id}-research.md",
-                content_type="text/markdown"
-            )
 
-            if not upload_result:
-                raise Exception("Failed to upload research content to S3")
-            
+            if run_config.wiki_enabled:
+                # the slower wiki conversion overlaps with the report upload instead of following it
+                wiki_task = asyncio.create_task(self._wiki(
+                    response_content, config, run_config.wiki_timeout_seconds, report_uploaded, wiki_cancel, recorder
+                ))
+
+            with recorder.phase("upload"):
+                await self._upload_report(response, response_content, written)
+            report_uploaded.set()
+
+            with recorder.phase("archive"):
+                await archive_run(
+                    research_id, self.request.user_id, self.request.research_topic,
+                    response, response_content, run_config,
+                )
+
             logger.info(f"Processed and uploaded research for ID: {self.request.research_id}")
+            if wiki_task:
+                await wiki_task
+            await recorder.save(self.storage)
+            job_registry.finish(self.request.research_id)
 
             return ResearchResponse(
                 research_id=self.request.research_id,
                 research_topic=self.request.research_topic,
                 research_content=response_content
             )
-            
+
+        except (asyncio.CancelledError, Exception) as e:
+            if wiki_task:
+                wiki_task.cancel()
+            if not token.cancelled:
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                logger.error(f"Error processing research: {e}")
+                await recorder.save(self.storage)
+                job_registry.finish(research_id, error=str(e))
+                return None
+
+            if isinstance(e, asyncio.CancelledError):
+                # cancelled through the token: handled here, not by the task's awaiter
+                asyncio.current_task().uncancel()
+            logger.info(f"Research {research_id} {token.reason}")
+            await self._cancelled(run_config, recorder.state, blob_store, written, report_uploaded.is_set())
+            await recorder.save(self.storage)
+            job_registry.finish(research_id, error=token.reason, state=CANCELLED)
+
+        finally:
+            if timer:
+                timer.cancel()
+            wiki_cancel.cancel("job ended")
+            recorder.stop()
+            scheduler.release(self.request.user_id, self.lane, recorder.tokens_used())
+            _running.pop(research_id, None)
+            release_cancel_token(research_id, token)
+            if blob_store is not None:
+                blob_store.release(self.request.research_id)
+
+    async def _acquire_slot(self, token: CancelToken, run_config: Configuration) -> Optional[float]:
+        """
+        Wait for the job's scheduler slot and return the seconds waited, or
+        None if the job was cancelled while queued, which finishes it.
+        """
+        research_id = self.request.research_id
+        if token.cancelled:
+            # cancelled before it was picked up
+            scheduler.withdraw(self.request.user_id, research_id)
+            job_registry.finish(research_id, error=token.reason, state=CANCELLED)
+            release_cancel_token(research_id, token)
+            return None
+        _running[research_id] = asyncio.current_task()
+
+        try:
+            # deeper runs cost more of their tenant's fair share
+            cost = run_config.number_of_initial_queries * run_config.max_research_loops
+            return await scheduler.acquire(self.request.user_id, research_id, self.lane, cost)
+        except asyncio.CancelledError:
+            _running.pop(research_id, None)
+            if not token.cancelled:
+                release_cancel_token(research_id, token)
+                raise
+            # cancelled while waiting for a slot
+            asyncio.current_task().uncancel()
+            job_registry.finish(research_id, error=token.reason, state=CANCELLED)
+            release_cancel_token(research_id, token)
+            return None
+
+    def _log_run(self, response: dict):
+        """Log the run's model routing, skipped calls, deadline adjustments and knowledge store use."""
+        logger.info(
+            f"Model routing for {self.request.research_id}: "
+            f"{summarise_model_calls(response.get('model_calls', []))}"
+        )
+        skipped = response.get("skipped_calls", [])
+        if skipped:
+            logger.info(
+                f"Skipped model calls for {self.request.research_id}: "
+                f"{', '.join(call['node'] + ' (' + call['reason'] + ')' for call in skipped)}"
+            )
+        adjustments = response.get("deadline_adjustments", [])
+        if adjustments:
+            logger.info(
+                f"Deadline adjustments for {self.request.research_id}: "
+                f"{', '.join(a['node'] + ' ' + a['kind'] + '=' + str(a['value']) for a in adjustments)}"
+            )
+        lookups = response.get("knowledge_lookups", [])
+        if lookups:
+            avoided = sum(1 for lookup in lookups if lookup["hit"])
+            logger.info(
+                f"Knowledge store for {self.request.research_id}: "
+                f"hit rate {avoided / len(lookups):.0%}, {avoided} web searches avoided"
+            )
+
+    async def _upload_report(self, response: dict, report: str, written: List[str]):
+        """Upload the report and its sources, listing their keys in ``written`` before the upload starts."""
+        research_id = self.request.research_id
+        artifacts = [
+            Artifact(f"{self.request.user_id}-research.md", report, "text/markdown"),
+            Artifact(
+                "sources.json",
+                json.dumps(response.get("sources_gathered", [])),
+                "application/json",
+            ),
+        ]
+        written += [f"{research_id}/{artifact.name}" for artifact in artifacts] + [f"{research_id}/manifest.json"]
+        await self.storage.put_artifacts(
+            prefix=research_id,
+            artifacts=artifacts,
+            metadata={"user_id": self.request.user_id},
+        )
+        report_cache.put(research_id, report)
+
+    async def _cancelled(
+        self,
+        run_config: Configuration,
+        state: Optional[dict],
+        blob_store,
+        written: List[str],
+        report_uploaded: bool,
+    ):
+        """Keep the cancelled run's research so far, or delete what it started uploading."""
+        research_id = self.request.research_id
+        try:
+            if run_config.keep_partial_results:
+                state = resolve_state(state or {}, blob_store)
+                partial = {
+                    "search_query": state.get("search_query", []),
+                    "web_research_result": state.get("web_research_result", []),
+                    "sources_gathered": state.get("sources_gathered", []),
+                    "model_calls": state.get("model_calls", []),
+                }
+                await self.storage.add_artifacts(
+                    prefix=research_id,
+                    artifacts=[Artifact("partial.json", json.dumps(partial), "application/json")],
+                    metadata={"user_id": self.request.user_id},
+                )
+            elif written and not report_uploaded:
+                # a finished report is kept; only an incomplete upload is removed
+                await self.storage.delete(*written)
         except Exception as e:
-            logger.error(f"Error processing research: {e}")
+            logger.warning(f"Failed to clean up cancelled research {research_id}: {e}")
+
+    async def _wiki(
+        self,
+        report: str,
+        config: dict,
+        timeout: float,
+        report_uploaded: asyncio.Event,
+        cancel_token: CancelToken,
+        recorder: RunRecorder,
+    ):
+        """
+        Convert the report into wiki pages and upload them next to it; failures only affect the wiki.
+
+        Each new top-level page is uploaded to ``wiki/{slug}.json`` as soon as
+        it is converted and listed in the job's ``wiki_pages``; ``wiki.json``
+        with all pages follows once the conversion is complete. On timeout or
+        failure ``cancel_token`` stops the conversion's worker threads before
+        their next model call or stream event.
+        """
+        research_id = self.request.research_id
+        job_registry.update(research_id, wiki_state=RUNNING)
+        loop = asyncio.get_running_loop()
+        page_uploads: List[asyncio.Future] = []
+
+        async def upload_page(page: InvestigationOutputPage):
+            await self.storage.put(
+                f"{research_id}/wiki/{page.slug}.json",
+                page.model_dump_json(),
+                "application/json",
+                metadata={"user_id": self.request.user_id},
+            )
+            job_registry.wiki_page_ready(research_id, page.slug)
+
+        closed = False
+
+        def schedule_upload(page: InvestigationOutputPage):
+            # pages arriving once the stage has ended are dropped, nothing would await their upload
+            if not closed:
+                page_uploads.append(asyncio.ensure_future(upload_page(page)))
+
+        def on_page(page: InvestigationOutputPage):
+            # called from the conversion's worker threads
+            if closed:
+                return
+            loop.call_soon_threadsafe(schedule_upload, page.model_copy(deep=True))
+
+        service = WikiService(config, cancel_token)
+        # the list is shared, so calls made before a failure or timeout are counted too
+        recorder.wiki_calls = service.calls
+        started = time.perf_counter()
+        try:
+            with recorder.phase("wiki"):
+                pages = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        service.generate_investigation_output,
+                        InvestigationDto(title=self.request.research_topic),
+                        report,
+                        await self._previous_wiki(),
+                        on_page,
+                    ),
+                    timeout,
+                )
+            # the manifest is extended, so it must exist first
+            await report_uploaded.wait()
+            await self.storage.add_artifacts(
+                prefix=research_id,
+                artifacts=[Artifact("wiki.json", pages.model_dump_json(), "application/json")],
+                metadata={"user_id": self.request.user_id},
+            )
+            await asyncio.gather(*page_uploads)
+        except Exception as e:
+            logger.warning(f"Wiki conversion failed for {research_id}: {e!r}")
+            job_registry.update(research_id, wiki_state=FAILED)
+            return
+        finally:
+            # wait_for cannot stop the conversion's worker threads once it timed out, the token does
+            cancel_token.cancel("stopped")
+            closed = True
+            recorder.wiki_seconds = time.perf_counter() - started
+            for upload in page_uploads:
+                upload.cancel()
+        job_registry.update(research_id, wiki_state=DONE)
+
+    async def _previous_wiki(self) -> Optional[InvestigationOutputPages]:
+        """Wiki pages of an earlier run with this research id, so unchanged sections are reused."""
+        try:
+            previous = await self.storage.get(f"{self.request.research_id}/wiki.json")
+            return InvestigationOutputPages.model_validate_json(previous) if previous else None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable previous wiki for {self.request.research_id}: {e}")
+            return None
+
+    def _run_graph(self, config: Optional[dict], recorder: RunRecorder) -> dict:
+        """Run the graph, reporting the nodes in progress and their timings to the job registry."""
+        from agent.graph import get_graph
+
+        research_id = self.request.research_id
+        token = find_cancel_token(research_id)
+        started = {}
+        state = None
+        for mode, chunk in get_graph().stream(
+                {"messages": [self.request.research_topic]},
+                config,
+                stream_mode=["values", "tasks"],
+        ):
+            if token:
+                token.raise_if_cancelled()
+            if mode == "values":
+                state = recorder.state = chunk
+            elif "result" not in chunk:
+                started[chunk["id"]] = time.perf_counter()
+                job_registry.node_started(research_id, chunk["name"])
+                recorder.task_started(chunk["id"], chunk["name"])
+            else:
+                elapsed = time.perf_counter() - started.pop(chunk["id"], time.perf_counter())
+                job_registry.node_finished(research_id, chunk["name"], elapsed)
+                recorder.task_finished(chunk["id"])
+        return state
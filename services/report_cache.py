@@ -0,0 +1,97 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from core.metrics import metrics
+from services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedReport:
+    body: bytes
+    gzipped: bytes
+    etag: str
+    content_type: str = "text/markdown"
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzipped)
+
+
+class ReportCache:
+    """
+    Bounded LRU of finished reports, with their gzip encoding and ETag
+
+    Misses fall back to the storage backend, reading the run's manifest to
+    locate the report.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._reports: "OrderedDict[str, CachedReport]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, research_id: str, content: str, content_type: str = "text/markdown") -> CachedReport:
+        body = content.encode("utf-8")
+        report = CachedReport(
+            body=body,
+            gzipped=gzip.compress(body, mtime=0),
+            etag=f'"{hashlib.sha256(body).hexdigest()}"',
+            content_type=content_type,
+        )
+        if report.size > self.max_bytes:
+            return report
+
+        with self._lock:
+            previous = self._reports.pop(research_id, None)
+            if previous:
+                self._bytes -= previous.size
+            self._reports[research_id] = report
+            self._bytes += report.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._reports.popitem(last=False)
+                self._bytes -= evicted.size
+        return report
+
+    def get(self, research_id: str) -> Optional[CachedReport]:
+        with self._lock:
+            report = self._reports.get(research_id)
+            if report:
+                self._reports.move_to_end(research_id)
+            return report
+
+    async def fetch(self, research_id: str, storage: StorageBackend) -> Optional[CachedReport]:
+        """Return the report from the cache, loading it from storage on a miss."""
+        report = self.get(research_id)
+        if report:
+            metrics.incr("report_cache.hit")
+            return report
+
+        metrics.incr("report_cache.miss")
+        manifest = await storage.get(f"{research_id}/manifest.json")
+        if manifest is None:
+            return None
+        report_key = next(
+            (
+                artifact["key"] for artifact in json.loads(manifest)["artifacts"]
+                if artifact["content_type"] == "text/markdown"
+            ),
+            None,
+        )
+        if report_key is None:
+            return None
+        body = await storage.get(report_key)
+        if body is None:
+            return None
+        return self.put(research_id, body.decode("utf-8"))
+
+
+report_cache = ReportCache(int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
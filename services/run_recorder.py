@@ -0,0 +1,118 @@
+import json
+import asyncio
+import logging
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from agent.configuration import Configuration
+from core.ledger import build_ledger
+from core.profiling import JobProfiler
+from services.jobs import job_registry
+from services.storage import Artifact, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+class RunRecorder:
+    """
+    Records one job's usage and, if requested, its profile
+
+    Holds the graph state so far and the wiki conversion's model calls. It
+    stores them as ``ledger.json``, with the profile under ``profile/``,
+    whatever the job's outcome.
+    """
+
+    def __init__(self, research_id: str, user_id: str, run_config: Configuration, profile: bool = False):
+        self.research_id = research_id
+        self.user_id = user_id
+        self.run_config = run_config
+        # latest graph state, kept for the ledger and partial results if the run is cancelled
+        self.state: Optional[dict] = None
+        self.wiki_calls: List[dict] = []
+        self.wiki_seconds: Optional[float] = None
+        self.profiler = JobProfiler(
+            run_config.profile_sample_interval_ms / 1000,
+            run_config.profile_traceback_frames,
+            run_config.profile_top_allocations,
+        ) if profile else None
+
+    def start(self):
+        if self.profiler:
+            self.profiler.start()
+
+    def stop(self):
+        """Stop profiling; safe to call more than once."""
+        if self.profiler:
+            self.profiler.stop()
+
+    def phase(self, name: str):
+        """Timeline span of a phase of the job when it is profiled."""
+        return self.profiler.trace.phase(name) if self.profiler else nullcontext()
+
+    def task_started(self, task_id: str, name: str):
+        if self.profiler:
+            self.profiler.trace.begin(task_id, name)
+
+    def task_finished(self, task_id: str):
+        if self.profiler:
+            self.profiler.trace.end(task_id)
+
+    def model_calls(self) -> List[dict]:
+        """Model call records of the run so far, the graph's and the wiki conversion's."""
+        return (self.state or {}).get("model_calls", []) + self.wiki_calls
+
+    def tokens_used(self) -> int:
+        return sum(call.get("input_tokens", 0) + call.get("output_tokens", 0) for call in self.model_calls())
+
+    def ledger(self) -> dict:
+        """The run's token, search and cost ledger, see core.ledger."""
+        state = self.state or {}
+        job = job_registry.get(self.research_id)
+        node_seconds = {node: timing.total_s for node, timing in (job.node_timings if job else {}).items()}
+        if self.wiki_seconds is not None:
+            node_seconds["wiki"] = self.wiki_seconds
+        limited_by = [
+            call["reason"] for call in state.get("skipped_calls", [])
+            if call["reason"] in ("token_budget", "cost_budget")
+        ] + [
+            f"{adjustment['node']}.{adjustment['kind']}" for adjustment in state.get("budget_adjustments", [])
+        ]
+        return build_ledger(
+            self.research_id,
+            self.model_calls(),
+            state.get("search_calls", []),
+            node_seconds,
+            run_seconds=(datetime.now(timezone.utc) - job.started_at).total_seconds() if job and job.started_at else None,
+            prices=self.run_config.model_prices,
+            search_cost=self.run_config.search_cost,
+            user_id=self.user_id,
+            budget={
+                "max_tokens": self.run_config.max_tokens or None,
+                "max_cost": self.run_config.max_cost or None,
+                "limited_by": sorted(set(limited_by)),
+            },
+        )
+
+    async def save(self, storage: StorageBackend):
+        """Store ``ledger.json`` and, for a profiled job, its capture under ``profile/``."""
+        try:
+            ledger = self.ledger()
+            totals = ledger["totals"]
+            logger.info(
+                f"Usage of {self.research_id}: {totals['calls']} model calls, "
+                f"{totals['input_tokens']} input / {totals['output_tokens']} output / "
+                f"{totals['cache_read_tokens']} cached tokens, {totals['search_calls']} searches, "
+                f"${totals['cost']:.4f}"
+            )
+            artifacts = [Artifact("ledger.json", json.dumps(ledger, indent=2), "application/json")]
+            if self.profiler:
+                files = await asyncio.to_thread(self.profiler.files)
+                artifacts += [Artifact(f"profile/{name}", content, content_type) for name, content, content_type in files]
+            await storage.add_artifacts(
+                prefix=self.research_id,
+                artifacts=artifacts,
+                metadata={"user_id": self.user_id},
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store the ledger and profile of research {self.research_id}: {e}")
@@ -1,21 +1,72 @@
 import boto3
 import logging
-from io import BytesIO
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 from typing import Optional, Dict, Any
 
+from services.storage import StorageBackend
+
 logger = logging.getLogger(__name__)
 
-class S3UploadService:
+class S3UploadService(StorageBackend):
     """
     Service for uploading files to s3
 
-    Automatically uses environment credentials
+    Automatically uses environment credentials. One client (and its
+    connection pool) is shared by every request using this service.
     """
-    def __init__(self, bucket_name: str, region_name: str):
-        
+    def __init__(
+            self,
+            bucket_name: str,
+            region_name: str,
+            max_pool_connections: int = 16,
+            compress: bool = False,
+    ):
+        super().__init__(max_workers=max_pool_connections, compress=compress)
         self.bucket_name = bucket_name
-        self.s3_client = boto3.client('s3', region_name=region_name)
+        self.s3_client = boto3.client(
+            's3',
+            region_name=region_name,
+            config=Config(max_pool_connections=max_pool_connections),
+        )
+
+    def _put(self, key, body, content_type, content_encoding, metadata):
+        extra_args = {'ContentType': content_type}
+
+        if content_encoding:
+            extra_args['ContentEncoding'] = content_encoding
+
+        if metadata:
+            extra_args['Metadata'] = {k: str(v) for k, v in metadata.items()}
+
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                **extra_args
+            )
+        except (ClientError, NoCredentialsError) as e:
+            logger.error(f"Failed to upload ({key}): {e}")
+            raise
+
+    def _get(self, key):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            logger.error(f"Failed to download ({key}): {e}")
+            raise
+        return response["Body"].read()
+
+    def _delete(self, key):
+        # deleting a missing key succeeds in S3
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            logger.error(f"Failed to delete ({key}): {e}")
+            raise
 
     async def uploadFile(
             self,
@@ -24,22 +75,5 @@ class S3UploadService:
             content_type: str,
             metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
-        try:
-            file_obj = BytesIO(content.encode('utf-8'))
-            extra_args = {'ContentType': content_type}
-
-            if metadata:
-                extra_args['Metadata'] = metadata
-
-            self.s3_client.upload_fileobj(
-                file_obj,
-                self.bucket_name,
-                s3_key,
-                ExtraArgs=extra_args
-            )
-
-            return True
-
-        except (ClientError, NoCredentialsError) as e:
-            logger.error(f"Failed to upload ({s3_key}): {e}")
-            raise 
\ No newline at end of file
+        await self.put(s3_key, content, content_type, metadata)
+        return True
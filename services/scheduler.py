@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Literal, Optional, Set, Tuple
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+Lane = Literal["interactive", "batch"]
+
+SCHEDULER_MAX_RUNNING_JOBS = int(os.getenv("SCHEDULER_MAX_RUNNING_JOBS", "16"))
+# slots batch jobs may not take, so interactive jobs never queue behind a large batch
+SCHEDULER_INTERACTIVE_RESERVED = int(os.getenv("SCHEDULER_INTERACTIVE_RESERVED", "4"))
+TENANT_MAX_RUNNING_JOBS = int(os.getenv("TENANT_MAX_RUNNING_JOBS", "4"))
+TENANT_MAX_QUEUED_JOBS = int(os.getenv("TENANT_MAX_QUEUED_JOBS", "100"))
+# model tokens a tenant may use per window before new jobs are refused; 0 disables the budget
+TENANT_TOKEN_BUDGET = int(os.getenv("TENANT_TOKEN_BUDGET", "0"))
+TENANT_BUDGET_WINDOW_SECONDS = float(os.getenv("TENANT_BUDGET_WINDOW_SECONDS", "3600"))
+# JSON object of user_id -> weight; tenants not listed weigh 1
+TENANT_WEIGHTS: Dict[str, float] = json.loads(os.getenv("TENANT_WEIGHTS", "{}"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a tenant may not queue more jobs right now."""
+
+    def __init__(self, user_id: str, reason: str, message: str):
+        super().__init__(message)
+        self.user_id = user_id
+        self.reason = reason
+
+
+@dataclass
+class _Waiter:
+    user_id: str
+    research_id: str
+    lane: str
+    finish_tag: float
+    start_tag: float
+    seq: int
+    enqueued: float
+    future: asyncio.Future
+
+
+@dataclass
+class _Tenant:
+    weight: float
+    running: int = 0
+    # admitted jobs that have not started yet
+    pending: Set[str] = field(default_factory=set)
+    # finish tag of the tenant's latest job per lane
+    last_finish: Dict[str, float] = field(default_factory=dict)
+    # (finished_at, tokens) of the jobs finished within the budget window
+    usage: Deque[Tuple[float, int]] = field(default_factory=deque)
+    completed: int = 0
+
+    def tokens_used(self, window: float) -> int:
+        cutoff = time.time() - window
+        while self.usage and self.usage[0][0] < cutoff:
+            self.usage.popleft()
+        return sum(tokens for _, tokens in self.usage)
+
+
+class FairScheduler:
+    """
+    Admission control and weighted fair queuing of research jobs across tenants
+
+    A tenant is a ``user_id``. ``admit`` refuses jobs of a tenant that already
+    has ``tenant_max_queued`` jobs waiting, or that has used its token budget
+    within the window. Admitted jobs wait in ``acquire`` for a slot: at most
+    ``max_running`` jobs run at once, at most ``tenant_max_running`` per
+    tenant, and batch jobs leave ``interactive_reserved`` slots free.
+
+    Within a lane, jobs are ordered by start-time fair queuing: a job's finish
+    tag is its start tag plus its cost divided by its tenant's weight, and the
+    job with the lowest finish tag among tenants below their cap goes first.
+    A tenant queuing many jobs therefore takes its weighted share of the slots
+    instead of every slot it arrived first for. Interactive jobs go before
+    batch jobs. All methods are called from the event loop.
+    """
+
+    def __init__(
+        self,
+        max_running: int = SCHEDULER_MAX_RUNNING_JOBS,
+        interactive_reserved: int = SCHEDULER_INTERACTIVE_RESERVED,
+        tenant_max_running: int = TENANT_MAX_RUNNING_JOBS,
+        tenant_max_queued: int = TENANT_MAX_QUEUED_JOBS,
+        tenant_token_budget: int = TENANT_TOKEN_BUDGET,
+        budget_window: float = TENANT_BUDGET_WINDOW_SECONDS,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.max_running = max_running
+        self.interactive_reserved = min(interactive_reserved, max_running - 1)
+        self.tenant_max_running = tenant_max_running
+        self.tenant_max_queued = tenant_max_queued
+        self.tenant_token_budget = tenant_token_budget
+        self.budget_window = budget_window
+        self.weights = dict(TENANT_WEIGHTS if weights is None else weights)
+        self._tenants: Dict[str, _Tenant] = {}
+        self._queues: Dict[str, List[_Waiter]] = {INTERACTIVE: [], BATCH: []}
+        self._running: Dict[str, int] = {INTERACTIVE: 0, BATCH: 0}
+        # virtual time per lane: the start tag of the job dispatched last
+        self._virtual_time: Dict[str, float] = {INTERACTIVE: 0.0, BATCH: 0.0}
+        self._seq = 0
+
+    def _tenant(self, user_id: str) -> _Tenant:
+        if user_id not in self._tenants:
+            self._tenants[user_id] = _Tenant(weight=max(float(self.weights.get(user_id, 1.0)), 1e-6))
+        return self._tenants[user_id]
+
+    def admit(self, jobs: List[Tuple[str, str]]):
+        """
+        Admit ``(user_id, research_id)`` jobs, all or none
+
+        Raises:
+            AdmissionRejected: if a tenant's queue is full or its token budget used up
+        """
+        requested: Dict[str, List[str]] = {}
+        for user_id, research_id in jobs:
+            requested.setdefault(user_id, []).append(research_id)
+
+        for user_id, research_ids in requested.items():
+            tenant = self._tenant(user_id)
+            if self.tenant_token_budget:
+                used = tenant.tokens_used(self.budget_window)
+                if used >= self.tenant_token_budget:
+                    self._reject(user_id, "token_budget", (
+                        f"Tenant {user_id} used {used} of its {self.tenant_token_budget} tokens "
+                        f"in the last {self.budget_window:g}s"
+                    ))
+            if len(tenant.pending) + len(research_ids) > self.tenant_max_queued:
+                self._reject(user_id, "queue_full", (
+                    f"Tenant {user_id} has {len(tenant.pending)} jobs queued, "
+                    f"at most {self.tenant_max_queued} may wait"
+                ))
+
+        for user_id, research_ids in requested.items():
+            self._tenant(user_id).pending.update(research_ids)
+
+    def _reject(self, user_id: str, reason: str, message: str):
+        metrics.incr(f"scheduler.rejected.{reason}")
+        metrics.incr(f"scheduler.tenant.{user_id}.rejected")
+        raise AdmissionRejected(user_id, reason, message)
+
+    def withdraw(self, user_id: str, research_id: str):
+        """Forget an admitted job that will not run, e.g. one cancelled while queued."""
+        self._tenant(user_id).pending.discard(research_id)
+
+    async def acquire(self, user_id: str, research_id: str, lane: str = INTERACTIVE, cost: float = 1.0) -> float:
+        """Wait for the job's turn to run; returns the seconds it waited."""
+        tenant = self._tenant(user_id)
+        tenant.pending.add(research_id)
+        start_tag = max(self._virtual_time[lane], tenant.last_finish.get(lane, 0.0))
+        finish_tag = start_tag + cost / tenant.weight
+        tenant.last_finish[lane] = finish_tag
+        self._seq += 1
+        waiter = _Waiter(
+            user_id, research_id, lane, finish_tag, start_tag, self._seq,
+            time.monotonic(), asyncio.get_running_loop().create_future(),
+        )
+        self._queues[lane].append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            tenant.pending.discard(research_id)
+            if waiter in self._queues[lane]:
+                self._queues[lane].remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # the slot was granted just as the job was cancelled
+                self._free(tenant, lane)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued
+        metrics.histogram(f"scheduler.queue_wait.{lane}").observe(waited)
+        metrics.histogram(f"scheduler.tenant.{user_id}.queue_wait").observe(waited)
+        return waited
+
+    def release(self, user_id: str, lane: str = INTERACTIVE, tokens: int = 0):
+        """Give back a slot from ``acquire`` once the job finished; ``tokens`` count against its budget."""
+        tenant = self._tenant(user_id)
+        tenant.completed += 1
+        if tokens:
+            tenant.usage.append((time.time(), tokens))
+            metrics.incr(f"scheduler.tenant.{user_id}.tokens", tokens)
+        metrics.incr(f"scheduler.tenant.{user_id}.completed")
+        self._free(tenant, lane)
+
+    def _free(self, tenant: _Tenant, lane: str):
+        tenant.running -= 1
+        self._running[lane] -= 1
+        self._dispatch()
+
+    def _lane_has_room(self, lane: str) -> bool:
+        running = sum(self._running.values())
+        if lane == BATCH:
+            return running < self.max_running - self.interactive_reserved
+        return running < self.max_running
+
+    def _dispatch(self):
+        for lane in (INTERACTIVE, BATCH):
+            queue = self._queues[lane]
+            while queue and self._lane_has_room(lane):
+                # queues hold at most a few hundred jobs, a scan is cheaper than keeping heaps per tenant
+                eligible = [
+                    waiter for waiter in queue
+                    if self._tenants[waiter.user_id].running < self.tenant_max_running
+                ]
+                if not eligible:
+                    break
+                waiter = min(eligible, key=lambda w: (w.finish_tag, w.seq))
+                queue.remove(waiter)
+                if waiter.future.cancelled():
+                    continue
+                tenant = self._tenants[waiter.user_id]
+                tenant.pending.discard(waiter.research_id)
+                tenant.running += 1
+                self._running[lane] += 1
+                self._virtual_time[lane] = max(self._virtual_time[lane], waiter.start_tag)
+                waiter.future.set_result(None)
+
+    def status(self) -> Dict[str, Any]:
+        """Slots in use, queue lengths and per-tenant usage."""
+        queued: Dict[str, Dict[str, int]] = {}
+        for lane, queue in self._queues.items():
+            for waiter in queue:
+                counts = queued.setdefault(waiter.user_id, {INTERACTIVE: 0, BATCH: 0})
+                counts[lane] += 1
+        return {
+            "max_running": self.max_running,
+            "running": dict(self._running),
+            "queued": {lane: len(queue) for lane, queue in self._queues.items()},
+            "tenants": {
+                user_id: {
+                    "weight": tenant.weight,
+                    "running": tenant.running,
+                    "queued": queued.get(user_id, {INTERACTIVE: 0, BATCH: 0}),
+                    "completed": tenant.completed,
+                    "tokens_in_window": tenant.tokens_used(self.budget_window),
+                    "queue_wait_s": metrics.histogram(f"scheduler.tenant.{user_id}.queue_wait").snapshot(),
+                }
+                for user_id, tenant in self._tenants.items()
+            },
+        }
+
+
+scheduler = FairScheduler()
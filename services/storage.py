@@ -0,0 +1,210 @@
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class Artifact:
+    """One file produced by a research run."""
+    name: str
+    content: Union[str, bytes]
+    content_type: str
+
+    def body(self) -> bytes:
+        if isinstance(self.content, str):
+            return self.content.encode("utf-8")
+        return self.content
+
+
+class StorageBackend:
+    """
+    Base class for artifact storage
+
+    Blocking I/O runs on a dedicated thread pool so the event loop stays free.
+    Subclasses implement ``_put``, ``_get`` and ``_delete``.
+    """
+    def __init__(self, max_workers: int = 16, compress: bool = False):
+        self.compress = compress
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    def _put(self, key: str, body: bytes, content_type: str, content_encoding: Optional[str], metadata: Optional[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    async def put(
+            self,
+            key: str,
+            content: Union[str, bytes],
+            content_type: str,
+            metadata: Optional[Dict[str, Any]] = None,
+            compress: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Store ``content`` under ``key`` and return its manifest entry."""
+        body = Artifact(key, content, content_type).body()
+        compress = self.compress if compress is None else compress
+        content_encoding = "gzip" if compress else None
+        stored = gzip.compress(body, mtime=0) if compress else body
+
+        await self._run(self._put, key, stored, content_type, content_encoding, metadata)
+
+        return {
+            "key": key,
+            "content_type": content_type,
+            "content_encoding": content_encoding,
+            "size": len(body),
+            "stored_size": len(stored),
+            "sha256": hashlib.sha256(body).hexdigest(),
+        }
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the decompressed content stored under ``key``, or None if missing."""
+        body = await self._run(self._get, key)
+        if body is not None and body[:2] == GZIP_MAGIC:
+            body = gzip.decompress(body)
+        return body
+
+    async def delete(self, *keys: str):
+        """Delete the objects stored under ``keys``; missing ones are ignored."""
+        await asyncio.gather(*[self._run(self._delete, key) for key in keys])
+
+    async def put_artifacts(
+            self,
+            prefix: str,
+            artifacts: List[Artifact],
+            metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Upload all artifacts of a run concurrently, then write ``{prefix}/manifest.json``.
+
+        The manifest is written last so its presence marks a complete upload.
+        """
+        entries = await self._put_all(prefix, artifacts, metadata)
+
+        manifest = {
+            "prefix": prefix,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "artifacts": list(entries),
+        }
+        await self._put_manifest(prefix, manifest, metadata)
+        return manifest
+
+    async def add_artifacts(
+            self,
+            prefix: str,
+            artifacts: List[Artifact],
+            metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Upload artifacts produced after ``put_artifacts`` and add them to the run's manifest."""
+        entries = await self._put_all(prefix, artifacts, metadata)
+
+        existing = await self.get(f"{prefix}/manifest.json")
+        manifest = json.loads(existing) if existing else {
+            "prefix": prefix,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "artifacts": [],
+        }
+        added = {entry["key"] for entry in entries}
+        manifest["artifacts"] = [
+            entry for entry in manifest["artifacts"] if entry["key"] not in added
+        ] + list(entries)
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await self._put_manifest(prefix, manifest, metadata)
+        return manifest
+
+    async def _put_all(self, prefix: str, artifacts: List[Artifact], metadata: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*[
+            self.put(f"{prefix}/{artifact.name}", artifact.content, artifact.content_type, metadata)
+            for artifact in artifacts
+        ])
+
+    async def _put_manifest(self, prefix: str, manifest: Dict[str, Any], metadata: Optional[Dict[str, Any]]):
+        await self.put(
+            f"{prefix}/manifest.json",
+            json.dumps(manifest, indent=2),
+            "application/json",
+            metadata,
+            compress=False,
+        )
+
+
+class LocalStorageBackend(StorageBackend):
+    """Stores artifacts on the local filesystem under ``root``."""
+    def __init__(self, root: str, max_workers: int = 4, compress: bool = False):
+        super().__init__(max_workers=max_workers, compress=compress)
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Storage key escapes the storage root: {key}")
+        return path
+
+    def _put(self, key, body, content_type, content_encoding, metadata):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_bytes(body)
+        tmp_path.replace(path)
+
+    def _get(self, key):
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def get_storage_backend(
+        backend: Optional[str] = None,
+        bucket_name: Optional[str] = None,
+        region_name: Optional[str] = None,
+) -> StorageBackend:
+    """
+    Return the process-wide storage backend
+
+    Defaults come from STORAGE_BACKEND ('s3' or 'local'), RESEARCH_BUCKET,
+    AWS_REGION, LOCAL_STORAGE_DIR, STORAGE_MAX_CONNECTIONS and STORAGE_COMPRESSION.
+    """
+    backend = backend or os.getenv("STORAGE_BACKEND", "s3")
+    compress = os.getenv("STORAGE_COMPRESSION", "").lower() == "gzip"
+    max_connections = int(os.getenv("STORAGE_MAX_CONNECTIONS", "16"))
+
+    if backend == "local":
+        return LocalStorageBackend(os.getenv("LOCAL_STORAGE_DIR", "outputs"), compress=compress)
+
+    if backend == "s3":
+        from services.s3 import S3UploadService
+
+        return S3UploadService(
+            bucket_name or os.getenv("RESEARCH_BUCKET"),
+            region_name or os.getenv("AWS_REGION"),
+            max_pool_connections=max_connections,
+            compress=compress,
+        )
+
+    raise ValueError(f"Unsupported storage backend: {backend}")
@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from agent.knowledge import KnowledgeStore
+from services.archive import ResearchArchive, run_records
+
+STATE = {
+    "search_query": ["solar prices", "solar prices"],
+    "web_research_result": ["Solar got cheaper."],
+    "sources_gathered": [{"url": "https://a.example", "title": "A", "content": "Module prices fell."}],
+}
+
+
+def test_archived_runs_round_trip(tmp_path):
+    archive = ResearchArchive(str(tmp_path))
+    archive.append_run(run_records("r1", "u1", "solar", STATE, "Report"))
+    archive.append_run(run_records("r2", "u2", "wind", {}, "Other report"))
+
+    assert [run["research_id"] for run in archive.find_runs(url="https://a.example")] == ["r1"]
+    records = list(archive.iter_records(research_id="r1"))
+    assert [record["type"] for record in records] == ["run", "query", "summary", "source"]
+    assert [record["text"] for record in archive.iter_records(types=["run"], topic="win")] == ["Other report"]
+
+
+def test_closed_segments_are_pruned_oldest_first(tmp_path):
+    # every run closes its segment, so each lands in a segment of its own
+    archive = ResearchArchive(str(tmp_path), max_segment_bytes=1)
+    for n in range(3):
+        archive.append_run(run_records(f"r{n}", "u1", "solar", STATE, "Report"))
+    segment_bytes = max(path.stat().st_size for path in archive.segments_dir.iterdir())
+
+    archive.max_bytes = segment_bytes * 5 // 2
+    archive.append_run(run_records("r3", "u1", "solar", STATE, "Report"))
+    assert [run["research_id"] for run in archive.find_runs()] == ["r2", "r3"]
+    assert sorted(path.name for path in archive.segments_dir.iterdir()) == [
+        "segment-000003.jsonl.gz", "segment-000004.jsonl.gz",
+    ]
+
+    # a new segment is numbered after the last one, not after the number of segments left
+    archive.append_run(run_records("r4", "u1", "solar", STATE, "Report"))
+    assert archive.find_runs(research_id="r4")[0]["segment"] == "segment-000005.jsonl.gz"
+
+
+def test_expired_segments_are_pruned(tmp_path):
+    archive = ResearchArchive(str(tmp_path), max_segment_bytes=1, retention_days=30)
+    old = run_records("old", "u1", "solar", STATE, "Report")
+    for record in old:
+        record["created_at"] = (datetime.now(timezone.utc) - timedelta(days=31)).isoformat()
+    archive.append_run(old)
+    # the current segment is never removed, however old
+    assert [run["research_id"] for run in archive.find_runs()] == ["old"]
+
+    archive.append_run(run_records("new", "u1", "solar", STATE, "Report"))
+    assert [run["research_id"] for run in archive.find_runs()] == ["new"]
+    assert archive.find_runs(url="https://a.example")[0]["research_id"] == "new"
+
+
+def test_knowledge_store_drops_old_passages_beyond_its_bound():
+    store = KnowledgeStore(max_passages=10)
+    now = time.time()
+    for n in range(11):
+        store.add(f"https://{n}.example", "Solar", f"solar passage number {n}", now - 100 + n)
+    # compacted to 90% of the bound, keeping the newest
+    assert len(store.passages) == 9
+    assert {p["url"] for p in store.passages} == {f"https://{n}.example" for n in range(2, 11)}
+    assert all(p["url"] != "https://0.example" for _, p in store.search("solar passage", k=20))
+
+    # dropped passages may be indexed again, kept ones are still deduplicated
+    store.add("https://1.example", "Solar", "solar passage number 1", now)
+    store.add("https://10.example", "Solar", "solar passage number 10", now)
+    assert len(store.passages) == 10
+
+
+def test_knowledge_store_drops_expired_passages():
+    store = KnowledgeStore(max_passages=3, max_age_seconds=60)
+    now = time.time()
+    store.add("https://old.example", "Solar", "an old solar passage", now - 120)
+    for n in range(3):
+        store.add(f"https://{n}.example", "Solar", f"solar passage {n}", now)
+    assert sorted(p["url"] for p in store.passages) == ["https://1.example", "https://2.example"]
+
+
+def test_export(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    archive = ResearchArchive(str(tmp_path / "archive"))
+    archive.append_run(run_records("r1", "u1", "solar", STATE, "Report"))
+    archive.append_run(run_records("r2", "u2", "wind", {}, "Other report"))
+
+    path = str(tmp_path / "solar.parquet")
+    assert archive.export(path, batch_size=2, topic="solar") == 4
+    table = pq.read_table(path)
+    assert table.column("type").to_pylist() == ["run", "query", "summary", "source"]
+    assert table.column("position").to_pylist() == [None, 0, 0, 0]
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCHMARKS = Path(__file__).resolve().parent.parent / "benchmarks"
+
+
+# smallest runs of the offline benchmarks, so their stubs keep up with the code they replace
+@pytest.mark.parametrize("script, args", [
+    ("state_memory.py", ["--jobs", "2", "--loops", "1", "--summary-kb", "2", "--source-kb", "1"]),
+    ("search_client.py", ["--queries", "4", "--concurrency", "2", "--delay-ms", "0"]),
+])
+def test_benchmark_runs(script, args):
+    result = subprocess.run(
+        [sys.executable, str(BENCHMARKS / script), *args],
+        capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip()
@@ -0,0 +1,52 @@
+import json
+import random
+
+import pytest
+
+from agent.json_stream import JsonArrayStream
+
+PAGES = [
+    {"slug": "intro", "content": {"type": "doc", "content": [{"text": "a } brace and a \"quote\" {"}]}},
+    {"slug": "market", "children": [{"slug": "nested"}]},
+    {"slug": "outlook", "content": "\\ backslash"},
+]
+
+
+def feed(stream, text, seed):
+    rng = random.Random(seed)
+    items, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 12)
+        items += stream.feed(text[pos:pos + size])
+        pos += size
+    return items
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_elements_are_yielded_as_they_close(seed):
+    text = "Here is the wiki:\n" + json.dumps({"title": "{not pages}", "pages": PAGES}, indent=1) + "\nDone"
+    stream = JsonArrayStream("pages")
+    items = feed(stream, text, seed)
+    assert [json.loads(item) for item in items] == PAGES
+    assert stream.complete
+    assert stream.text == text
+
+
+def test_bare_array():
+    stream = JsonArrayStream("pages")
+    assert [json.loads(item) for item in feed(stream, json.dumps(PAGES), 0)] == PAGES
+    assert stream.complete
+
+
+def test_other_arrays_are_not_split():
+    stream = JsonArrayStream("pages")
+    items = stream.feed(json.dumps({"tags": [{"a": 1}], "pages": [{"b": 2}]}))
+    assert items == ['{"b": 2}']
+
+
+def test_cut_off_output():
+    text = json.dumps({"pages": PAGES})
+    stream = JsonArrayStream("pages")
+    items = stream.feed(text[:text.index('{"slug": "outlook"') + 5])
+    assert len(items) == 2
+    assert not stream.complete
@@ -0,0 +1,69 @@
+import pytest
+
+from core.ledger import build_ledger, call_cost, calls_cost, model_price
+
+SONNET = "anthropic.claude-3-7-sonnet-20250219-v1:0"
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+
+
+def test_model_price():
+    assert model_price(f"eu.{SONNET}")["input"] == 3.0
+    assert model_price(f"global.{SONNET}") == model_price(SONNET)
+    override = {SONNET: {"input": 1.0, "output": 2.0}}
+    assert model_price(f"us.{SONNET}", override) == {"input": 1.0, "output": 2.0}
+    assert model_price("custom-model") is None
+
+
+def test_call_cost_prices_cached_tokens_at_their_rates():
+    call = {
+        "model": f"eu.{SONNET}", "input_tokens": 1_000_000, "output_tokens": 100_000,
+        "cache_read_tokens": 500_000, "cache_write_tokens": 100_000,
+    }
+    # 400k uncached at 3.0, 500k read at 0.3, 100k written at 3.75, 100k out at 15.0
+    assert call_cost(call) == pytest.approx(1.2 + 0.15 + 0.375 + 1.5)
+
+
+def test_cache_reads_default_to_the_input_price():
+    call = {"model": HAIKU, "input_tokens": 1_000_000, "cache_read_tokens": 1_000_000}
+    assert call_cost(call) == pytest.approx(0.25)
+
+
+def test_calls_cost():
+    calls = [
+        {"model": HAIKU, "input_tokens": 1_000_000, "output_tokens": 0},
+        {"model": "custom-model", "input_tokens": 1_000_000, "output_tokens": 1_000_000},
+    ]
+    assert call_cost(calls[1]) is None
+    assert calls_cost(calls, searches=3, search_cost=0.01) == pytest.approx(0.28)
+
+
+def test_build_ledger():
+    model_calls = [
+        {"node": "generate_query", "model": SONNET, "input_tokens": 1_000_000, "output_tokens": 0, "latency_s": 1.5},
+        {"node": "web_research", "model": HAIKU, "input_tokens": 0, "output_tokens": 1_000_000, "latency_s": 2.0},
+        {"node": "web_research", "model": "custom-model", "input_tokens": 10, "output_tokens": 5, "latency_s": 0.5},
+    ]
+    search_calls = [
+        {"node": "web_research", "paid": True},
+        {"node": "web_research", "paid": False},
+    ]
+    ledger = build_ledger(
+        "r1", model_calls, search_calls, {"generate_query": 2.0, "web_research": 4.12345},
+        run_seconds=5.0, search_cost=0.008, user_id="u1",
+    )
+
+    assert ledger["user_id"] == "u1"
+    totals = ledger["totals"]
+    assert (totals["calls"], totals["input_tokens"], totals["output_tokens"]) == (3, 1_000_010, 1_000_005)
+    assert totals["search_calls"] == 2
+    assert totals["cost"] == pytest.approx(3.0 + 1.25 + 0.008)
+    assert totals["model_s"] == 4.0
+    assert totals["wall_s"] == 5.0
+
+    web = ledger["nodes"]["web_research"]
+    assert (web["calls"], web["search_calls"], web["wall_s"]) == (2, 2, 4.123)
+    assert web["cost"] == pytest.approx(1.258)
+    assert ledger["nodes"]["generate_query"]["cost"] == pytest.approx(3.0)
+    assert ledger["models"][HAIKU]["output_tokens"] == 1_000_000
+    assert ledger["models"]["custom-model"]["cost"] == 0.0
+    assert ledger["unpriced_models"] == ["custom-model"]
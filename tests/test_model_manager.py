@@ -0,0 +1,59 @@
+import threading
+import time
+
+from core.metrics import metrics
+from core.model_manager import BEDROCK, ModelManager
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        self.closed = True
+
+
+class SlowStreamClient:
+    """ConverseStream client whose stream takes a while to open."""
+
+    def __init__(self):
+        self.streams = []
+        self.lock = threading.Lock()
+
+    def converse_stream(self, modelId, **kwargs):
+        time.sleep(0.2)
+        stream = FakeStream([
+            {"contentBlockDelta": {"delta": {"text": "hello"}}},
+            {"metadata": {"usage": {"inputTokens": 3, "outputTokens": 1}}},
+        ])
+        with self.lock:
+            self.streams.append(stream)
+        return {"stream": stream}
+
+
+def test_streams_are_opened_without_hedging(monkeypatch):
+    client = SlowStreamClient()
+    monkeypatch.setattr(ModelManager, "configure_boto_client", lambda self, *args, **kwargs: client)
+    manager = ModelManager({"configurable": {
+        "hedge_requests": True,
+        "hedge_default_delay": 0.01,
+        "hedge_min_delay": 0.01,
+    }})
+    model = manager.route("wiki", provider=BEDROCK).model
+    latency = metrics.histogram(f"llm.latency.{model}").count
+    stream_open = metrics.histogram(f"llm.stream_open.{model}").count
+
+    events = list(manager.converse_stream(node="wiki", messages=[{"role": "user", "content": [{"text": "hi"}]}]))
+
+    assert len(events) == 2
+    # a hedged second open would land once it has taken as long as the first
+    time.sleep(0.3)
+    assert len(client.streams) == 1 and client.streams[0].closed
+    # the time to first byte is kept apart from whole calls, which hedging is timed by
+    assert metrics.histogram(f"llm.stream_open.{model}").count == stream_open + 1
+    assert metrics.histogram(f"llm.latency.{model}").count == latency
+    assert manager.calls[-1]["input_tokens"] == 3
@@ -0,0 +1,54 @@
+from agent.passages import PassageIndex, build_run_passages, select_section_context, split_passages
+from agent.utils import estimate_tokens
+
+PASSAGES = [
+    "Solar panel prices fell sharply as module manufacturing scaled up.",
+    "Wind turbines keep growing taller offshore.",
+    "Battery storage pairs well with solar farms in sunny regions.",
+    "Grid interconnection queues delay new wind and solar projects.",
+]
+
+
+def test_split_passages():
+    text = "First paragraph.\n\n  \n" + "word " * 50 + "\n\nLast."
+    passages = split_passages(text, max_chars=60)
+    assert passages[0] == "First paragraph."
+    assert passages[-1] == "Last."
+    assert all(len(p) <= 60 for p in passages)
+    assert " ".join(passages[1:-1]).split() == ["word"] * 50
+
+
+def test_search_ranks_by_bm25():
+    index = PassageIndex(PASSAGES)
+    hits = index.search("solar prices", 3)
+    assert hits[0][0] == 0
+    assert {passage_id for passage_id, _ in hits} == {0, 2, 3}
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert index.search("hydrogen", 3) == []
+    assert PassageIndex([]).search("solar", 3) == []
+
+
+def test_build_run_passages_labels_sources():
+    passages = build_run_passages(
+        ["Summary one.\n\nSummary two."],
+        [{"url": "https://a.example", "title": "A", "content": "Source text."}, {"url": "https://b.example"}],
+    )
+    assert passages == ["Summary one.", "Summary two.", "[A](https://a.example) Source text."]
+
+
+def test_sections_share_the_budget_and_never_repeat_passages():
+    index = PassageIndex(PASSAGES)
+    sections = [("Solar", "solar"), ("Wind", "wind"), ("Also solar", "solar panel")]
+    context = select_section_context(index, "energy", sections, top_k=2, token_budget=10_000)
+    for passage in PASSAGES:
+        assert context.count(passage) <= 1
+    assert "### Evidence for Solar" in context
+    assert "### Evidence for Wind" in context
+
+    # room for about two passages: each section gets its best one before either gets a second
+    budget = max(estimate_tokens(p) for p in PASSAGES) * 2
+    context = select_section_context(index, "energy", sections[:2], top_k=2, token_budget=budget)
+    included = [p for p in PASSAGES if p in context]
+    assert len(included) == 2
+    assert sum(estimate_tokens(p) for p in included) <= budget
+    assert "### Evidence for Solar" in context and "### Evidence for Wind" in context
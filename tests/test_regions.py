@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import regions
+from core.regions import CLOSED, HALF_OPEN, OPEN, RegionRouter, inference_profile_id
+from core.resilience import FATAL, THROTTLED, TRANSIENT
+
+
+@pytest.mark.parametrize("model_id, region, cross_region, expected", [
+    ("eu.anthropic.claude", "us-east-1", False, "us.anthropic.claude"),
+    ("us.anthropic.claude", "ap-southeast-2", False, "apac.anthropic.claude"),
+    ("anthropic.claude", "eu-west-1", False, "anthropic.claude"),
+    ("anthropic.claude", "eu-west-1", True, "eu.anthropic.claude"),
+    ("global.anthropic.claude", "eu-west-1", True, "global.anthropic.claude"),
+    ("eu.anthropic.claude", "sa-east-1", False, "eu.anthropic.claude"),
+])
+def test_inference_profile_id(model_id, region, cross_region, expected):
+    assert inference_profile_id(model_id, region, cross_region) == expected
+
+
+def test_circuit_opens_after_consecutive_failures():
+    router = RegionRouter(["a", "b"], failure_threshold=3, cooldown=60)
+    router.record_failure("a", TRANSIENT)
+    router.record_failure("a", TRANSIENT)
+    assert router.health["a"].state == CLOSED
+    router.record_failure("a", TRANSIENT)
+    assert router.health["a"].state == OPEN
+    assert router.candidates() == ["b", "a"]
+
+
+def test_throttles_count_double_and_fatal_errors_not_at_all():
+    router = RegionRouter(["a", "b"], failure_threshold=2, cooldown=60)
+    router.record_failure("a", FATAL)
+    assert router.health["a"].consecutive_failures == 0
+    router.record_failure("a", THROTTLED)
+    assert router.health["a"].state == OPEN
+
+
+def test_faster_regions_are_preferred():
+    router = RegionRouter(["slow", "fast"])
+    router.record_success("slow", 2.0)
+    router.record_success("fast", 0.1)
+    firsts = [router.candidates()[0] for _ in range(500)]
+    assert firsts.count("fast") > firsts.count("slow") * 5
+
+
+def test_half_open_region_takes_a_single_probe():
+    router = RegionRouter(["a", "b"], failure_threshold=1, cooldown=0.01)
+    router.record_failure("a", TRANSIENT)
+    time.sleep(0.02)
+
+    # ranking the regions does not claim the probe, only sending a call does
+    assert "a" in {router.candidates()[0] for _ in range(100)}
+    router.start_call("a")
+    assert router.health["a"].state == HALF_OPEN
+    assert all(router.candidates() == ["b", "a"] for _ in range(100))
+
+    router.record_success("a", 0.1)
+    assert router.health["a"].state == CLOSED
+    assert router.health["a"].probe_started is None
+
+
+def test_drawing_a_half_open_region_does_not_claim_its_probe(monkeypatch):
+    router = RegionRouter(["a", "b"], failure_threshold=1, cooldown=60)
+    router.record_failure("a", TRANSIENT)
+    router.health["a"].opened_at -= 60
+    monkeypatch.setattr(regions.random, "choices", lambda population, weights: ["a"])
+
+    # a caller that already tried "a" skips it, so the probe must stay free
+    assert router.candidates()[0] == "a"
+    assert router.health["a"].probe_started is None
+    assert router.health["a"].available(time.monotonic())
+
+
+def test_failed_probe_reopens_the_circuit():
+    router = RegionRouter(["a"], failure_threshold=1, cooldown=0.01)
+    router.record_failure("a", TRANSIENT)
+    time.sleep(0.02)
+    router.start_call("a")
+    router.record_failure("a", TRANSIENT)
+    assert router.health["a"].state == OPEN
+
+
+class StubBedrock(BaseHTTPRequestHandler):
+    """Converse endpoint per region under /{region}/; throttled regions answer 429."""
+
+    throttled = set()
+    calls = []
+
+    def do_POST(self):
+        region = self.path.split("/")[1]
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.calls.append(region)
+        if region in self.throttled:
+            body, status = {"message": "Too many requests"}, 429
+            headers = {"x-amzn-ErrorType": "ThrottlingException"}
+        else:
+            body, status, headers = {
+                "output": {"message": {"role": "assistant", "content": [{"text": f"from {region}"}]}},
+                "stopReason": "end_turn",
+                "usage": {"inputTokens": 3, "outputTokens": 2, "totalTokens": 5},
+                "metrics": {"latencyMs": 1},
+            }, 200, {}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_bedrock(monkeypatch):
+    StubBedrock.throttled = set()
+    StubBedrock.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBedrock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    # routers are process-wide, each test starts with healthy regions
+    monkeypatch.setattr(regions, "_routers", {})
+    yield f"http://127.0.0.1:{server.server_address[1]}/{{region}}"
+    server.shutdown()
+
+
+def test_converse_fails_over_from_a_throttled_region(stub_bedrock, monkeypatch):
+    from core.model_manager import ModelManager
+
+    StubBedrock.throttled = {"eu-west-1"}
+    # always start with the best ranked region, the throttled one while both are unknown
+    monkeypatch.setattr(regions.random, "choices", lambda population, weights: population[:1])
+    manager = ModelManager({"configurable": {
+        "aws_regions": ["eu-west-1", "eu-west-2"],
+        "bedrock_endpoint_url": stub_bedrock,
+        "region_failure_threshold": 1,
+        "max_retries": 1,
+    }})
+
+    for _ in range(5):
+        response = manager.converse(node="wiki", messages=[{"role": "user", "content": [{"text": "hi"}]}])
+        assert response["output"]["message"]["content"][0]["text"] == "from eu-west-2"
+
+    # once its circuit opened the throttled region is only tried again after the cool-down
+    assert StubBedrock.calls.count("eu-west-1") == 1
+    assert StubBedrock.calls.count("eu-west-2") == 5
+    assert manager.region_router().health["eu-west-1"].state == OPEN
+    assert manager.calls[-1]["input_tokens"] == 3
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from agent.repair import RepairError, extract_json, repair_structured, slugify, unique_slug
+from agent.tools_and_schemas import Reflection, SearchQueryList
+from agent.wiki import InvestigationOutputPages
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Here you go:\n{"a": [1, 2,],}\nHope this helps', {"a": [1, 2]}),
+    ("{'a': True, 'b': None}".replace("'", '"'), {"a": True, "b": None}),
+    ('Use {this}:\n```json\n{"a": 1}\n```\nor {that}', {"a": 1}),
+])
+def test_extract_json(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_extract_json_keeps_fenced_code_inside_strings():
+    value = {"content": "Example:\n```json\n{\"inner\": true}\n```\n", "n": 2}
+    assert extract_json(json.dumps(value)) == value
+    assert extract_json("Result: " + json.dumps(value)) == value
+
+
+def test_extract_json_without_json():
+    with pytest.raises(RepairError):
+        extract_json("no structured output here")
+
+
+def test_slugs():
+    assert slugify("1.2- Market Overview!") == "market-overview"
+    assert slugify("???") == "page"
+    taken = {"intro"}
+    assert unique_slug("intro", taken) == "intro-2"
+    assert unique_slug("intro", taken) == "intro-3"
+
+
+def test_valid_output_is_not_repaired():
+    result = repair_structured('{"query": ["solar"], "rationale": "r"}', SearchQueryList)
+    assert result == SearchQueryList(query=["solar"], rationale="r")
+
+
+def test_fields_are_coerced_to_the_schema():
+    result = repair_structured(
+        {"Reflection": {"is_sufficient": "no", "knowledge_gap": ["a", "b"], "follow_up_queries": '["x", "y"]'}},
+        Reflection,
+    )
+    assert result == Reflection(is_sufficient=False, knowledge_gap="a\nb", follow_up_queries=["x", "y"])
+
+
+def test_single_query_becomes_a_list():
+    result = repair_structured({"query": "solar", "rationale": "r", "extra": 1}, SearchQueryList)
+    assert result.query == ["solar"]
+
+
+def test_wiki_pages_are_repaired():
+    result = repair_structured(
+        [
+            {"title": "Intro Page", "slug": "Intro Page", "content": []},
+            {"title": "Intro", "slug": "intro-page", "children": {"title": "c", "content": "x"}},
+        ],
+        InvestigationOutputPages,
+    )
+    assert [page.slug for page in result.pages] == ["intro-page", "intro-page-2"]
+    assert result.pages[1].children[0].slug == "c"
+
+
+def test_unrepairable_output_raises():
+    with pytest.raises(RepairError):
+        repair_structured("I could not find anything", Reflection)
@@ -0,0 +1,143 @@
+import time
+import threading
+
+import pytest
+
+from core.cancellation import CancelToken, JobCancelled
+from core.regions import RegionRouter
+from core.resilience import (
+    FATAL,
+    THROTTLED,
+    TIMEOUT,
+    TRANSIENT,
+    RetryPolicy,
+    call_with_retries,
+    classify_error,
+    hedged_call,
+)
+
+# no backoff sleeps: full jitter over a zero delay is zero
+NO_DELAY = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+
+
+class ClientError(Exception):
+    """Shaped like botocore's ClientError."""
+
+    def __init__(self, code: str = "", status: int = 400):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class ReadTimeoutError(Exception):
+    pass
+
+
+class Flaky:
+    """Fails with ``errors`` in turn, then returns "ok"; records the region of each call."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.regions = []
+
+    def __call__(self, region=None):
+        self.regions.append(region)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.mark.parametrize("error, expected", [
+    (ClientError("ThrottlingException"), THROTTLED),
+    (ClientError("", status=429), THROTTLED),
+    (ClientError("ServiceUnavailableException", status=503), TRANSIENT),
+    (ClientError("", status=502), TRANSIENT),
+    (ReadTimeoutError(), TIMEOUT),
+    (ClientError("ValidationException"), FATAL),
+    (ValueError("bad prompt"), FATAL),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_classify_error_unwraps_the_cause():
+    try:
+        try:
+            raise ClientError("ThrottlingException")
+        except ClientError as e:
+            raise RuntimeError("wrapped by LangChain") from e
+    except RuntimeError as wrapped:
+        assert classify_error(wrapped) == THROTTLED
+
+
+def test_backoff_is_capped_and_longer_for_throttles():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0, throttle_multiplier=4.0)
+    for attempt in range(1, 8):
+        assert 0 <= policy.backoff(TRANSIENT, attempt) <= min(10.0, 2 ** (attempt - 1))
+        assert 0 <= policy.backoff(THROTTLED, attempt) <= min(10.0, 4.0 * 2 ** (attempt - 1))
+
+
+def test_transient_errors_are_retried():
+    fn = Flaky(ClientError("InternalServerException", 500), ReadTimeoutError())
+    assert call_with_retries(fn, NO_DELAY, "model") == "ok"
+    assert len(fn.regions) == 3
+
+
+def test_fatal_errors_are_not_retried():
+    fn = Flaky(ClientError("ValidationException"))
+    with pytest.raises(ClientError):
+        call_with_retries(fn, NO_DELAY, "model")
+    assert len(fn.regions) == 1
+
+
+def test_gives_up_after_max_attempts():
+    fn = Flaky(*[ClientError("ThrottlingException")] * 5)
+    with pytest.raises(ClientError):
+        call_with_retries(fn, NO_DELAY, "model")
+    assert len(fn.regions) == 3
+
+
+def test_fails_over_to_the_next_region():
+    router = RegionRouter(["eu-west-1", "eu-west-2"], failure_threshold=1, cooldown=60)
+    fn = Flaky(ClientError("ThrottlingException"))
+    assert call_with_retries(fn, RetryPolicy(max_attempts=1), "model", router=router) == "ok"
+    first, second = fn.regions
+    assert first != second
+    assert router.health[first].state == "open"
+    assert router.health[second].state == "closed"
+
+
+def test_hedged_call_returns_the_faster_backup():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "primary"
+
+    started = time.monotonic()
+    assert hedged_call(slow, 0.05, lambda: "backup") == "backup"
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+def test_hedged_call_raises_once_both_calls_failed():
+    def slow_failure():
+        time.sleep(0.1)
+        raise ClientError("InternalServerException", 500)
+
+    def failure():
+        raise ReadTimeoutError()
+
+    with pytest.raises(ReadTimeoutError):
+        hedged_call(slow_failure, 0.01, failure)
+
+
+def test_cancelling_stops_the_backoff():
+    token = CancelToken()
+    policy = RetryPolicy(max_attempts=3)
+    policy.backoff = lambda error_class, attempt: 30.0
+    fn = Flaky(ClientError("InternalServerException", 500))
+    threading.Timer(0.05, token.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(JobCancelled):
+        call_with_retries(fn, policy, "model", cancel_token=token)
+    assert time.monotonic() - started < 5
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from services.scheduler import BATCH, INTERACTIVE, AdmissionRejected, FairScheduler
+
+
+def make_scheduler(**kwargs):
+    options = dict(
+        max_running=1, interactive_reserved=0, tenant_max_running=10,
+        tenant_max_queued=10, tenant_token_budget=0, weights={},
+    )
+    options.update(kwargs)
+    return FairScheduler(**options)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def run_jobs(scheduler, jobs):
+    """Queue ``(user_id, research_id, lane)`` jobs in order and return the order they were granted."""
+    granted = []
+
+    async def job(user_id, research_id, lane):
+        await scheduler.acquire(user_id, research_id, lane)
+        granted.append(research_id)
+
+    tasks = [asyncio.create_task(job(*spec)) for spec in jobs]
+    await settle()
+    lanes = {research_id: (user_id, lane) for user_id, research_id, lane in jobs}
+    released = 0
+    while released < len(granted):
+        user_id, lane = lanes[granted[released]]
+        scheduler.release(user_id, lane)
+        released += 1
+        await settle()
+    await asyncio.gather(*tasks)
+    return granted
+
+
+def test_noisy_tenant_takes_its_share_only():
+    scheduler = make_scheduler()
+    jobs = [("a", f"a{n}", INTERACTIVE) for n in range(4)] + [("b", f"b{n}", INTERACTIVE) for n in range(2)]
+    assert asyncio.run(run_jobs(scheduler, jobs)) == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_weights_scale_the_share():
+    scheduler = make_scheduler(weights={"b": 2})
+    jobs = [("a", f"a{n}", INTERACTIVE) for n in range(3)] + [("b", f"b{n}", INTERACTIVE) for n in range(4)]
+    assert asyncio.run(run_jobs(scheduler, jobs)) == ["a0", "b0", "b1", "b2", "a1", "b3", "a2"]
+
+
+def test_interactive_jobs_go_before_batch():
+    scheduler = make_scheduler()
+    jobs = [("a", "batch0", BATCH), ("a", "batch1", BATCH), ("b", "live", INTERACTIVE)]
+    assert asyncio.run(run_jobs(scheduler, jobs)) == ["batch0", "live", "batch1"]
+
+
+def test_tenant_running_cap_and_interactive_reservation():
+    async def scenario():
+        scheduler = make_scheduler(max_running=3, interactive_reserved=1, tenant_max_running=1)
+        tasks = [
+            asyncio.create_task(scheduler.acquire("a", "a0", BATCH)),
+            asyncio.create_task(scheduler.acquire("a", "a1", BATCH)),
+            asyncio.create_task(scheduler.acquire("b", "b0", BATCH)),
+            asyncio.create_task(scheduler.acquire("c", "c0", BATCH)),
+        ]
+        await settle()
+        # a is capped at one job, and batch jobs leave the reserved slot free
+        assert [task.done() for task in tasks] == [True, False, True, False]
+        assert scheduler.status()["running"] == {INTERACTIVE: 0, BATCH: 2}
+
+        live = asyncio.create_task(scheduler.acquire("d", "d0", INTERACTIVE))
+        await settle()
+        assert live.done()
+
+        scheduler.release("a", BATCH)
+        await settle()
+        # with the interactive job running, the batch lane is still full
+        assert [task.done() for task in tasks] == [True, False, True, False]
+
+        scheduler.release("d", INTERACTIVE)
+        await settle()
+        # c queued before a's second job got its turn
+        assert [task.done() for task in tasks] == [True, False, True, True]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_admission_rejections_are_all_or_none():
+    scheduler = make_scheduler(tenant_max_queued=2)
+    scheduler.admit([("a", "a0")])
+    with pytest.raises(AdmissionRejected) as error:
+        scheduler.admit([("b", "b0"), ("a", "a1"), ("a", "a2")])
+    assert (error.value.user_id, error.value.reason) == ("a", "queue_full")
+    # b's job was not admitted either
+    assert scheduler._tenant("b").pending == set()
+
+    scheduler.withdraw("a", "a0")
+    scheduler.admit([("a", "a1"), ("a", "a2")])
+
+
+def test_token_budget():
+    async def scenario():
+        scheduler = make_scheduler(tenant_token_budget=100)
+        await scheduler.acquire("a", "a0")
+        scheduler.release("a", tokens=100)
+        with pytest.raises(AdmissionRejected) as error:
+            scheduler.admit([("a", "a1")])
+        assert error.value.reason == "token_budget"
+        scheduler.admit([("b", "b0")])
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_jobs_free_their_place():
+    async def scenario():
+        scheduler = make_scheduler()
+        await scheduler.acquire("a", "a0")
+        queued = asyncio.create_task(scheduler.acquire("b", "b0"))
+        await settle()
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert scheduler.status()["queued"][INTERACTIVE] == 0
+        assert scheduler._tenant("b").pending == set()
+
+        # granted just as it was cancelled: the slot goes to the next job
+        granted = asyncio.create_task(scheduler.acquire("b", "b1"))
+        waiting = asyncio.create_task(scheduler.acquire("c", "c0"))
+        await settle()
+        scheduler.release("a")
+        granted.cancel()
+        await settle()
+        assert granted.cancelled()
+        assert waiting.done()
+        assert scheduler.status()["running"][INTERACTIVE] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DOTENV = """\
+RESEARCH_BUCKET=from-dotenv
+ARCHIVE_MAX_BYTES=5
+TENANT_MAX_RUNNING_JOBS=2
+STORAGE_BACKEND=local
+LOCAL_STORAGE_DIR=from-dotenv
+"""
+
+CHECK = """
+import json
+import {entry_point}
+from services import archive, scheduler, storage
+
+backend = storage.get_storage_backend()
+print(json.dumps({{
+    "bucket": getattr({entry_point}, "RESEARCH_BUCKET", None),
+    "archive_max_bytes": archive.ARCHIVE_MAX_BYTES,
+    "tenant_max_running": scheduler.scheduler.tenant_max_running,
+    "storage": type(backend).__name__,
+    "storage_dir": str(getattr(backend, "root", "")),
+}}))
+"""
+
+
+@pytest.mark.parametrize("entry_point, requires", [("main", "fastapi"), ("agentcore", "bedrock_agentcore")])
+def test_entry_points_load_dotenv_before_reading_settings(tmp_path, entry_point, requires):
+    if importlib.util.find_spec(requires) is None:
+        pytest.skip(f"{requires} is not installed")
+    (tmp_path / ".env").write_text(DOTENV)
+    names = {line.split("=")[0] for line in DOTENV.splitlines()}
+    env = {name: value for name, value in os.environ.items() if name not in names}
+    env["PYTHONPATH"] = str(ROOT)
+
+    # run from the directory holding .env, as a deployment would
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK.format(entry_point=entry_point)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    settings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    if entry_point == "agentcore":
+        assert settings["bucket"] == "from-dotenv"
+    assert settings["archive_max_bytes"] == 5
+    assert settings["tenant_max_running"] == 2
+    assert settings["storage"] == "LocalStorageBackend"
+    assert settings["storage_dir"] == "from-dotenv"
@@ -0,0 +1,46 @@
+import pytest
+
+from agent.repair import RepairError
+from agent.wiki import InvestigationDto, InvestigationOutputPage, InvestigationOutputPages, WikiService
+
+REPORT = "## Solar\n\nSolar got cheaper.\n\n## Notes\n\nNothing to convert.\n\n## Wind\n\nTurbines grew."
+
+
+class StubWiki(WikiService):
+    """Converts a section to one page named after its heading, or to none for a Notes section."""
+
+    def __init__(self):
+        super().__init__()
+        self.converted = []
+
+    def _convert_section(self, investigation, report_content, number=1, total=1, emit=None):
+        title = report_content.splitlines()[0].lstrip("# ")
+        self.converted.append(title)
+        if title == "Notes":
+            return None
+        page = InvestigationOutputPage(
+            title=title, slug=title.lower(), content={"type": "doc", "content": []},
+        )
+        emit(page)
+        return InvestigationOutputPages(pages=[page])
+
+
+def test_unchanged_sections_are_reused_even_without_pages():
+    first = StubWiki().generate_investigation_output(InvestigationDto(title="Energy"), REPORT)
+    assert [page.slug for page in first.pages] == ["solar", "wind"]
+    assert len(first.empty_sections) == 1
+
+    # the stored wiki.json round trip keeps the empty section
+    previous = InvestigationOutputPages.model_validate_json(first.model_dump_json())
+    service = StubWiki()
+    second = service.generate_investigation_output(
+        InvestigationDto(title="Energy"), REPORT.replace("Turbines grew.", "Turbines grew taller."), previous,
+    )
+    assert service.converted == ["Wind"]
+    assert [page.slug for page in second.pages] == ["solar", "wind"]
+    assert second.empty_sections == first.empty_sections
+
+
+def test_no_pages_at_all_raises_repair_error():
+    with pytest.raises(RepairError):
+        StubWiki().generate_investigation_output(InvestigationDto(title="Energy"), "## Notes\n\nNothing.")